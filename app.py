@@ -1,33 +1,58 @@
 import streamlit as st
 import os
 import sys
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+import time
+import json
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import all necessary components
-from models.llm import get_chatgroq_model
+# (LangChain, FAISS, the embedding model and the API clients are imported on first use, see warm_up_steps)
+from utils import startup
 from config import config
-from utils.rag_utils import setup_rag_pipeline, query_rag_pipeline
-from utils.search_utils import perform_web_search
+from utils.admission import Overloaded
+from utils.cache_utils import TTLCache
+from utils.trace_utils import start_trace, registry, write_prometheus
 
+ERROR_RESPONSE = "Sorry, I encountered an error. Please try again."
 
-def get_chat_response(chat_model, messages, system_prompt):
-    """Get response from the chat model"""
+def stream_chat_response(answer_stream):
+    """
+    Streams the answer into the current container as the text arrives.
+    Records time-to-first-token and total generation time in st.session_state.generation_timings.
+    Returns (response_text, completed); completed is False if the stream failed.
+    """
+    placeholder = st.empty()
+    response = ""
+    start = time.perf_counter()
+    first_token_time = None
     try:
-        formatted_messages = [SystemMessage(content=system_prompt)]
-        for msg in messages:
-            if msg["role"] == "user":
-                formatted_messages.append(HumanMessage(content=msg["content"]))
-            else:
-                formatted_messages.append(AIMessage(content=msg["content"]))
-        
-        response = chat_model.invoke(formatted_messages)
-        return response.content
-    
+        for piece in answer_stream:
+            if first_token_time is None:
+                first_token_time = time.perf_counter() - start
+            response += piece
+            placeholder.markdown(response + "▌")
+        completed = bool(response)
+        if not completed:
+            response = ERROR_RESPONSE
+    except Overloaded as e:
+        # Too many questions are waiting for the model right now
+        completed = False
+        response = str(e)
     except Exception as e:
         st.error(f"Error communicating with the AI model: {e}")
-        return "Sorry, I encountered an error. Please try again."
+        completed = False
+        # Keep whatever was already shown, but make it clear the answer is incomplete
+        response = f"{response}\n\n_(The answer was interrupted. Please try again.)_" if response else ERROR_RESPONSE
+
+    placeholder.markdown(response)
+    total_time = time.perf_counter() - start
+    st.session_state.generation_timings = {"time_to_first_token": first_token_time, "total": total_time}
+    if first_token_time is not None:
+        st.caption(f"First token in {first_token_time:.2f}s · generated in {total_time:.2f}s")
+    ttft_text = f"{first_token_time:.2f}s" if first_token_time is not None else "n/a"
+    print(f"Generation: first token {ttft_text}, total {total_time:.2f}s")
+    return response, completed
 
 def instructions_page():
     """Instructions and setup page"""
@@ -109,21 +134,48 @@ def instructions_page():
     Ready to start chatting? Navigate to the **Chat** page using the sidebar! 
     """)
 
-def chat_page(response_mode: str):
-    """Main chat interface page"""
-    st.title("🤖 MyCampusBot")
+def render_debug_panel(last_trace, tenant_stats=None, startup_report=None):
+    """Sidebar breakdown of where the time went in the last chat turn, plus the metrics exports"""
+    st.subheader("Pipeline Debug")
+    if not last_trace:
+        st.caption("Ask a question to see its per-stage timings.")
+    else:
+        source = last_trace["attributes"].get("source", "n/a")
+        st.caption(f"Last turn: {last_trace['duration_ms']:.0f} ms total · source: {source}")
+        rows = []
+        for stage in last_trace["spans"]:
+            details = ", ".join(f"{key}={value}" for key, value in stage["attributes"].items() if value is not None)
+            rows.append({
+                "stage": f"↳ {stage['name']}" if stage["parent"] else stage["name"],
+                "ms": stage["duration_ms"],
+                "details": details,
+            })
+        st.dataframe(rows, hide_index=True, use_container_width=True)
 
-    @st.cache_resource(show_spinner="Loading campus knowledge...")
-    def load_retriever():
-        return setup_rag_pipeline()
+    if tenant_stats:
+        st.caption(f"Loaded indexes: {tenant_stats['resident_mb']:.1f} of {tenant_stats['memory_budget_mb']} MB")
+        rows = [{"tenant": tenant, "loaded": stats["loaded"], "MB": stats["resident_mb"], "load ms": stats["load_ms"],
+                 "hit rate": stats["hit_rate"], "evictions": stats["evictions"]}
+                for tenant, stats in tenant_stats["tenants"].items()]
+        st.dataframe(rows, hide_index=True, use_container_width=True)
 
-    retriever = load_retriever()
-    
-    # This is the general instruction for the AI's personality.
-    system_prompt = "You are a helpful and friendly Student Helpdesk assistant for the Global University of Innovation. Your main role is to answer student queries accurately based on the context provided to you."
+    if startup_report:
+        with st.expander("Startup"):
+            st.json(startup_report)
+
+    st.download_button("Metrics (Prometheus)", registry.to_prometheus(), file_name="metrics.prom", use_container_width=True)
+    st.download_button("Metrics (JSON)", json.dumps(registry.snapshot()), file_name="metrics.json", use_container_width=True)
+
+def get_retrieval_store():
+    """This session's retrieved context per question, reused when a question is asked again in another mode"""
+    if "retrieval_store" not in st.session_state:
+        st.session_state.retrieval_store = TTLCache(config.RETRIEVAL_STORE_MAX_ENTRIES, config.RETRIEVAL_STORE_TTL_SEC)
+    return st.session_state.retrieval_store
+
+def chat_page(response_mode: str, tenant: str):
+    """Main chat interface page"""
+    st.title("🤖 MyCampusBot")
 
-    chat_model = get_chatgroq_model()
-    
     if "messages" not in st.session_state:
         st.session_state.messages = []
     
@@ -142,46 +194,70 @@ def chat_page(response_mode: str):
     # This block automatically generates a response if the last message is from the user
     # It also handles re-generating a response when the response_mode is changed
     if st.session_state.messages and st.session_state.messages[-1]["role"] == "user":
-        with st.chat_message("assistant"):
+        last_user_prompt = st.session_state.messages[-1]["content"]
+        # The tenant registry is process-wide and shared with the HTTP API (server.py); a campus
+        # index is loaded on its first question (usually already by the warm-up) and may be
+        # unloaded again when memory runs short
+        chat_core = startup.timed_import("utils.chat_core")
+        with st.spinner("Loading campus knowledge..."):
+            core = chat_core.get_chat_core(tenant)
+        # Every stage of this turn is recorded as one trace (see utils/trace_utils.py)
+        with st.chat_message("assistant"), start_trace("chat_turn", log_path=config.TRACE_LOG_PATH, mode=response_mode, tenant=tenant) as trace:
+            # Repeated (or near-identical) questions are answered straight from the cache,
+            # everything else goes through retrieval with the web search as fallback
             with st.spinner("Thinking..."):
-                last_user_prompt = st.session_state.messages[-1]["content"]
+                turn = core.prepare(last_user_prompt, response_mode, retrieval_store=get_retrieval_store())
+            trace.set(source=turn["source_type"], chunks=turn.get("chunks"))
 
-                # --- RAG + Web Search Fallback Logic ---
-                relevant_docs = query_rag_pipeline(retriever, last_user_prompt)
-                
-                if relevant_docs:
+            if turn["answer"] is not None:
+                response = turn["answer"]
+                st.markdown(response)
+                st.caption("⚡ Answered from the fact table" if turn["source_type"] == "fact index" else "⚡ Answered from cache")
+            else:
+                if turn["source_type"] == "campus documents":
                     st.info("Found relevant information in campus documents...")
-                    context = "\n\n".join([doc.page_content for doc in relevant_docs])
-                    source_type = "campus documents"
                 else:
                     st.info("Couldn't find an answer in campus documents, searching the web...")
-                    context = perform_web_search(last_user_prompt)
-                    source_type = "web search results"
-                # --- End of Fallback Logic ---
-
-                # --- Response Mode Logic ---
-                if response_mode == "Concise":
-                    style_note = "Provide a concise summary of the answer, not exceeding 3 sentences."
-                else: # Detailed
-                    style_note = "Provide a comprehensive, detailed answer. Use bullet points for lists if it improves clarity."
-                # --- End of Response Mode Logic ---
-
-                # Create the final, fully detailed prompt for the LLM
-                final_prompt = f"""Based on the following context from {source_type}, {style_note}
-
-                Context:
-                {context}
-
-                User Question:
-                {last_user_prompt}
-                """
-                
-                # We don't include the full history for this turn to keep the context clean
-                response = get_chat_response(chat_model, [{"role": "user", "content": final_prompt}], system_prompt)
-                st.markdown(response)
+                # The answer is streamed into the chat bubble as the tokens arrive
+                response, completed = stream_chat_response(core.stream_answer(turn))
+                if turn["sources"]:
+                    st.caption("Sources: " + " · ".join(turn["sources"]))
+                if completed and config.SPECULATIVE_MODE_ANSWERS:
+                    # Have the other style ready before the user switches to it
+                    for other_mode in chat_core.RESPONSE_MODES:
+                        if other_mode != response_mode:
+                            core.speculate(last_user_prompt, other_mode, retrieval_store=get_retrieval_store())
 
         # Add the assistant's response to the message history
         st.session_state.messages.append({"role": "assistant", "content": response})
+        st.session_state.last_trace = trace.to_dict()
+        if config.METRICS_TEXTFILE_PATH:
+            write_prometheus(config.METRICS_TEXTFILE_PATH)
+        if startup.mark("first_answer"):
+            print(f"Startup: {startup.startup_report()}")
+            if config.STARTUP_REPORT_PATH:
+                startup.write_startup_report(config.STARTUP_REPORT_PATH)
+
+    with st.sidebar:
+        # Rendered last, so the chat history is on screen before anything waits on the imports
+        tenants = startup.timed_import("utils.chat_core").get_tenant_registry()
+        # Stats of a campus that is not loaded yet are not worth waiting for
+        core = tenants.peek(tenant)
+        if core is not None:
+            cache_stats = core.answer_cache.stats()
+            st.caption(f"Answer cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+        if st.toggle("Show pipeline debug panel", value=config.DEBUG_PANEL):
+            render_debug_panel(st.session_state.get("last_trace"), tenants.stats(), startup.startup_report())
+
+def warm_up_steps():
+    """Background warm-up: heavy imports, the embedding model, then the default campus index."""
+    def chat_core():
+        return startup.timed_import("utils.chat_core")
+    return [
+        ("import_chat_core", chat_core),
+        ("embedding_model", lambda: chat_core().warm_embedding_model()),
+        ("default_tenant", lambda: chat_core().get_chat_core()),
+    ]
 
 def main():
     """Main function to run the Streamlit app"""
@@ -191,6 +267,9 @@ def main():
         layout="wide",
         initial_sidebar_state="expanded"
     )
+    # Once per process: the model and index load while the first page is rendered
+    if config.BACKGROUND_WARMUP:
+        startup.start_warmup(warm_up_steps())
     
     with st.sidebar:
         st.title("Navigation")
@@ -198,6 +277,19 @@ def main():
         
         st.divider()
         st.title("Settings")
+        tenant = config.DEFAULT_TENANT
+        if len(config.TENANTS) > 1:
+            tenant = st.selectbox(
+                "Campus",
+                list(config.TENANTS),
+                index=list(config.TENANTS).index(config.DEFAULT_TENANT),
+                format_func=lambda key: config.TENANTS[key]["name"],
+            )
+        # A conversation belongs to one campus, so switching starts a new one
+        if st.session_state.get("tenant", tenant) != tenant:
+            st.session_state.messages = []
+            st.session_state.pop("retrieval_store", None)
+        st.session_state.tenant = tenant
         response_mode = st.radio(
             "Response Mode", 
             ("Detailed", "Concise"),
@@ -226,7 +318,7 @@ def main():
     if page == "Instructions":
         instructions_page()
     elif page == "Chat":
-        chat_page(response_mode=response_mode)
+        chat_page(response_mode=response_mode, tenant=tenant)
 
 if __name__ == "__main__":
     main()
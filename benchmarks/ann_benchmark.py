@@ -0,0 +1,212 @@
+"""
+Compares the vector index types (flat, HNSW, IVF-PQ) on synthetic corpora.
+
+For every corpus size and index type it measures build time, query latency,
+recall@k against exact search, size on disk, and the memory a fresh process
+needs to open the index memory-mapped and answer queries through the
+on-disk docstore (see utils/ann_index.py).
+
+    python benchmarks/ann_benchmark.py --sizes 10000 100000
+    python benchmarks/ann_benchmark.py --sizes 1000000 --types hnsw ivfpq
+
+The vectors are clustered, normalized and 384-dimensional like the MiniLM
+embeddings the app uses, so no model download is needed.
+Results are printed and written as JSON to benchmarks/results/.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import faiss
+from langchain_core.documents import Document
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import config
+from utils.ann_index import INDEX_TYPES, STORE_FILES, create_index, save_store, load_store, index_kind, apply_search_params
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DIMENSION = 384
+
+
+def synthetic_vectors(n_vectors, n_queries, dim=DIMENSION, seed=0):
+    """Clustered unit vectors, plus queries that are noisy copies of random corpus vectors."""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(8, n_vectors // 500)
+    centroids = rng.standard_normal((n_clusters, dim), dtype=np.float32)
+    vectors = centroids[rng.integers(0, n_clusters, n_vectors)]
+    vectors += 0.6 * rng.standard_normal((n_vectors, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    queries = vectors[rng.integers(0, n_vectors, n_queries)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape, dtype=np.float32) / np.sqrt(dim)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, queries.astype(np.float32)
+
+def current_rss_mb():
+    """Resident set size of this process (Linux), falling back to the peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def percentiles_ms(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+def recall_at_k(found, truth, k):
+    """Share of the exact top-k neighbours that the index returned."""
+    hits = sum(len(set(row[:k]) & set(expected[:k])) for row, expected in zip(found, truth))
+    return round(hits / (len(truth) * k), 4)
+
+def store_size_mb(store_dir):
+    return round(sum(os.path.getsize(os.path.join(store_dir, name)) for name in STORE_FILES) / (1024 * 1024), 2)
+
+
+def measure_mmap_load(store_dir, queries_path, k):
+    """
+    Runs in a fresh process: opens the saved store memory-mapped and answers every
+    query through the LangChain wrapper, so the docstore reads are included.
+    """
+    queries = np.load(queries_path)
+    baseline = current_rss_mb()
+    start = time.perf_counter()
+    vector_store = load_store(store_dir, None, use_mmap=True, search_params=config.INDEX_SEARCH_PARAMS)
+    load_sec = time.perf_counter() - start
+    after_load = current_rss_mb()
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        vector_store.similarity_search_with_score_by_vector(query.tolist(), k=k)
+        latencies.append(time.perf_counter() - start)
+
+    after_queries = current_rss_mb()
+    return {
+        "load_ms": round(load_sec * 1000, 3),
+        "rss_after_load_mb": round(after_load - baseline, 1) if baseline is not None else None,
+        "rss_after_queries_mb": round(after_queries - baseline, 1) if baseline is not None else None,
+        "query_with_docstore": percentiles_ms(latencies),
+    }
+
+def benchmark_index(index_type, vectors, queries, truth, params, k, work_dir):
+    """Builds, searches and saves one index; returns its measurements."""
+    start = time.perf_counter()
+    index = create_index(len(vectors), lambda rows: vectors[rows], index_type, params)
+    build_sec = time.perf_counter() - start
+    built_type = index_kind(index)
+    apply_search_params(index, config.INDEX_SEARCH_PARAMS)
+
+    latencies, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, rows = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found.append(rows[0].tolist())
+
+    store_dir = os.path.join(work_dir, index_type)
+    docs = (Document(page_content=f"Synthetic chunk {i}.", metadata={"source": "synthetic.txt"})
+            for i in range(len(vectors)))
+    ids = [f"{i:064x}" for i in range(len(vectors))]
+    save_store(store_dir, index, docs, ids)
+    disk_mb = store_size_mb(store_dir)
+    del index
+
+    queries_path = os.path.join(work_dir, "queries.npy")
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--measure-load", store_dir, queries_path, "--k", str(k)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    mmap_report = json.loads(output.strip().splitlines()[-1])
+    shutil.rmtree(store_dir)
+
+    return {
+        "index": built_type,
+        "params": params if built_type == index_type else {},
+        "build_sec": round(build_sec, 3),
+        "search": percentiles_ms(latencies),
+        f"recall@{k}": recall_at_k(found, truth, k),
+        "disk_mb": disk_mb,
+        **mmap_report,
+    }
+
+
+def run(args):
+    report = {"dimension": DIMENSION, "k": args.k, "queries": args.queries,
+              "search_params": config.INDEX_SEARCH_PARAMS, "sizes": {}}
+    for size in args.sizes:
+        print(f"\n[ANN] {size} vectors")
+        vectors, queries = synthetic_vectors(size, args.queries)
+        exact = faiss.IndexFlatL2(DIMENSION)
+        exact.add(vectors)
+        _, truth = exact.search(queries, args.k)
+        truth = truth.tolist()
+        del exact
+
+        work_dir = tempfile.mkdtemp(prefix="ann-bench-")
+        np.save(os.path.join(work_dir, "queries.npy"), queries)
+        try:
+            results = {}
+            for index_type in args.types:
+                params = dict(config.INDEX_PARAMS[index_type])
+                results[index_type] = benchmark_index(index_type, vectors, queries, truth, params, args.k, work_dir)
+                print(f"  {index_type:<6} {json.dumps(results[index_type])}")
+            report["sizes"][str(size)] = results
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+def print_report(report):
+    k = report["k"]
+    print(f"\n{'size':>9}  {'index':<6} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {f'recall@{k}':>9} "
+          f"{'disk MB':>8} {'RSS MB':>8}")
+    for size, results in report["sizes"].items():
+        for index_type, result in results.items():
+            label = index_type if result["index"] == index_type else f"{index_type}*"
+            print(f"{size:>9}  {label:<6} {result['build_sec']:>8.2f} {result['search']['p50_ms']:>8.3f} "
+                  f"{result['search']['p95_ms']:>8.3f} {result[f'recall@{k}']:>9.4f} {result['disk_mb']:>8.2f} "
+                  f"{result['rss_after_queries_mb']:>8.1f}")
+    if any(result["index"] != index_type for results in report["sizes"].values() for index_type, result in results.items()):
+        print("* too few vectors to train IVF-PQ, a flat index was built instead")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the flat, HNSW and IVF-PQ vector indexes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000],
+                        help="Corpus sizes in chunks (1000000 needs about 3 GB of RAM to build).")
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", help="Where to write the JSON report (default: benchmarks/results/<timestamp>.json).")
+    parser.add_argument("--measure-load", nargs=2, metavar=("STORE_DIR", "QUERIES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure_load:
+        print(json.dumps(measure_mmap_load(*args.measure_load, args.k)))
+        sys.exit(0)
+
+    report = run(args)
+    print_report(report)
+
+    output = args.output or os.path.join(BENCHMARK_DIR, "results", f"ann-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {output}")
@@ -0,0 +1,368 @@
+"""
+Offline latency and retrieval-quality benchmark for the RAG pipeline.
+
+Runs load -> split -> embed -> index build -> search -> query expansion ->
+generation over the data/ corpus with the local embedding model and
+deterministic stand-ins for Groq and Tavily (see benchmarks/stubs.py),
+so no API keys or network access are needed.
+
+    python benchmarks/run_benchmarks.py --chunk-size 500 --threshold 0.35
+    python benchmarks/run_benchmarks.py --index-type hnsw --index-params '{"m": 48}'
+
+The index is built, saved and opened memory-mapped through utils/ann_index.py
+like the app's, so latency and memory match the configured index type.
+
+Results are printed and written as JSON to benchmarks/results/.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import config
+from models.embeddings import load_base_model, embedding_model_id, embed_array, CachedEmbeddings
+from utils.ann_index import INDEX_TYPES, create_index, save_store, load_store, index_kind
+from utils.index_store import list_source_files, load_source_file
+from utils.dedup_utils import dedup_chunks
+from utils.bm25_index import BM25Index
+from utils.fact_index import extract_facts, FactIndex
+from utils.rag_utils import AdaptiveRetriever
+from utils import search_utils
+from utils.context_utils import build_context, build_prompt, estimate_tokens, RESPONSE_MODES
+from benchmarks.stubs import StubChatModel, make_stub_search_backend
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+
+class StageTimer:
+    """Collects wall-clock samples per pipeline stage."""
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        yield
+        self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        """p50/p95/mean/max in milliseconds for every stage."""
+        report = {}
+        for stage, samples in self.samples.items():
+            ms = np.asarray(samples) * 1000
+            report[stage] = {
+                "count": len(samples),
+                "total_ms": round(float(ms.sum()), 3),
+                "mean_ms": round(float(ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "max_ms": round(float(ms.max()), 3),
+            }
+        return report
+
+
+def load_questions(path):
+    """
+    Reads the labelled question set: [{"question": ..., "sources": [file names], "answer": [substrings]}, ...].
+    "answer" is optional and lists text a correct direct (fact table) answer must contain.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def first_relevant_rank(docs, sources):
+    """1-based rank of the first document coming from one of the expected files, or None."""
+    for rank, doc in enumerate(docs, start=1):
+        if os.path.basename(doc.metadata.get("source", "")) in sources:
+            return rank
+    return None
+
+def quality_metrics(ranks, k):
+    """recall@k and MRR over the first-relevant ranks of all questions."""
+    hits = [rank for rank in ranks if rank is not None and rank <= k]
+    return {
+        f"recall@{k}": round(len(hits) / len(ranks), 4) if ranks else 0.0,
+        "mrr": round(sum(1.0 / rank for rank in hits) / len(ranks), 4) if ranks else 0.0,
+    }
+
+def peak_rss_mb():
+    """Peak resident set size of this process, where the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def build_corpus(data_dir, text_splitter, timer):
+    """Loads and splits every source file, timing each file. Returns deduplicated chunks and IDs."""
+    all_chunks = []
+    for rel_path in list_source_files(data_dir):
+        with timer.time("load"):
+            documents = load_source_file(os.path.join(data_dir, rel_path))
+        with timer.time("split"):
+            all_chunks.extend(text_splitter.split_documents(documents))
+    chunks, chunk_ids, dropped = dedup_chunks(all_chunks)
+    return chunks, chunk_ids, dropped
+
+def build_index(chunks, chunk_ids, embedding_model, index_dir, index_type, index_params, timer):
+    """
+    Embeds the chunks in batches into the vector cache, then builds the ANN index from it,
+    saves it with the on-disk docstore and opens it like the app does (utils/ann_index.py),
+    timing each step. Returns (FAISS vector store, BM25 lexical index).
+    """
+    texts = [chunk.page_content for chunk in chunks]
+    for start in range(0, len(texts), config.EMBEDDING_BATCH_SIZE):
+        with timer.time("embed"):
+            embed_array(embedding_model, texts[start:start + config.EMBEDDING_BATCH_SIZE])
+
+    with timer.time("index_build"):
+        index = create_index(len(texts), lambda rows: embed_array(embedding_model, [texts[i] for i in rows]),
+                             index_type, index_params)
+        save_store(index_dir, index, chunks, chunk_ids)
+        lexical_index = BM25Index()
+        for chunk_id, text in zip(chunk_ids, texts):
+            lexical_index.add(chunk_id, text)
+    del index
+
+    with timer.time("index_load"):
+        vector_store = load_store(index_dir, embedding_model, config.INDEX_MMAP, config.INDEX_SEARCH_PARAMS)
+    return vector_store, lexical_index
+
+def benchmark_queries(questions, retriever, search_only, llm, args, timer):
+    """Times search, expansion, full retrieval and generation per question; returns per-question results."""
+    results = []
+    for run in range(args.runs):
+        for item in questions:
+            question = item["question"]
+
+            with timer.time("search"):
+                search_docs = search_only.invoke(question)
+            with timer.time("query_expansion"):
+                retriever.expand(question)
+            with timer.time("retrieval"):
+                docs = retriever.invoke(question)
+
+            with timer.time("context_build"):
+                context, _, context_stats = build_context(
+                    docs, retriever.vector_store.embedding_function,
+                    token_budget=args.token_budget, mmr_lambda=args.mmr_lambda,
+                )
+            prompt = build_prompt(question, context, "campus documents", args.mode)
+            start = time.perf_counter()
+            first_token = None
+            for chunk in llm.stream(prompt):
+                if first_token is None and chunk.content:
+                    first_token = time.perf_counter() - start
+            timer.add("generation", time.perf_counter() - start)
+            if first_token is not None:
+                timer.add("time_to_first_token", first_token)
+
+            if run == 0:
+                results.append({
+                    "question": question,
+                    "expected_sources": item["sources"],
+                    "search_rank": first_relevant_rank(search_docs[:args.k], item["sources"]),
+                    "retrieval_rank": first_relevant_rank(docs[:args.k], item["sources"]),
+                    "retrieved_sources": [os.path.basename(doc.metadata.get("source", "")) for doc in docs[:args.k]],
+                    "context_tokens": estimate_tokens(context),
+                    "naive_context_tokens": estimate_tokens("\n\n".join(doc.page_content for doc in docs)),
+                    "context_chunks_used": context_stats["chunks_used"],
+                })
+    return results
+
+def benchmark_fact_lookup(questions, data_dir, timer):
+    """
+    Times fact extraction and the fact fast path. A hit is correct when it cites an expected
+    file and contains every expected answer substring; hits on questions without expected
+    answers count as wrong, since their answer cannot be checked.
+    """
+    with timer.time("fact_extract"):
+        documents = [doc for rel_path in list_source_files(data_dir)
+                     for doc in load_source_file(os.path.join(data_dir, rel_path))]
+        fact_index = FactIndex(extract_facts(documents), config.FACT_PROGRAM_ALIASES)
+    hits, correct, wrong = 0, 0, []
+    for item in questions:
+        with timer.time("fact_lookup"):
+            result = fact_index.answer(item["question"])
+        if result is None:
+            continue
+        hits += 1
+        cited = any(os.path.basename(source.split(",")[0]) in item["sources"] for source in result[1])
+        expected = item.get("answer")
+        if cited and expected and all(part in result[0] for part in expected):
+            correct += 1
+        else:
+            wrong.append(item["question"])
+    return {"facts": len(fact_index), "hits": hits, "correct": correct, "wrong": wrong}
+
+def benchmark_web_search(questions, args, timer):
+    """Times the web-search path through the stub backend (uncached, then cached)."""
+    search_utils.set_search_backend(make_stub_search_backend(args.search_latency))
+    try:
+        for item in questions:
+            with timer.time("web_search"):
+                search_utils.perform_web_search(item["question"])
+            with timer.time("web_search_cached"):
+                search_utils.perform_web_search(item["question"])
+    finally:
+        search_utils.set_search_backend(None)
+
+
+def run(args):
+    questions = load_questions(args.questions)
+    timer = StageTimer()
+    tracemalloc.start()
+
+    with timer.time("model_load"):
+        base_model = load_base_model(args.backend)
+    # Cold, throwaway vector cache: chunks are really encoded, and the context builder
+    # reuses their vectors the way it does in the app
+    cache_dir = tempfile.mkdtemp(prefix="rag-bench-")
+    embedding_model = CachedEmbeddings(base_model, embedding_model_id(args.backend), os.path.join(cache_dir, "cache.sqlite"))
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, add_start_index=True
+    )
+    chunks, chunk_ids, dropped = build_corpus(args.data, text_splitter, timer)
+    index_params = dict(config.INDEX_PARAMS[args.index_type], **(args.index_params or {}))
+    vector_store, lexical_index = build_index(chunks, chunk_ids, embedding_model, os.path.join(cache_dir, "index"),
+                                              args.index_type, index_params, timer)
+
+    llm = StubChatModel(latency_sec=args.llm_latency, tokens_per_sec=args.tokens_per_sec)
+    retriever_args = dict(
+        vector_store=vector_store,
+        lexical_index=lexical_index if args.hybrid else None,
+        llm=llm,
+        k=args.k,
+        score_threshold=args.threshold,
+        expander=args.expander,
+        strong_score=config.EXPANSION_STRONG_SCORE,
+        min_hits=config.EXPANSION_MIN_HITS,
+        lexical_min_coverage=config.LEXICAL_MIN_COVERAGE,
+        rrf_k=config.RRF_K,
+        pool_size=args.pool_size,
+    )
+    retriever = AdaptiveRetriever(expansion=args.expansion, **retriever_args)
+    search_only = AdaptiveRetriever(expansion="never", **retriever_args)
+
+    per_question = benchmark_queries(questions, retriever, search_only, llm, args, timer)
+    facts = benchmark_fact_lookup(questions, args.data, timer)
+    benchmark_web_search(questions, args, timer)
+
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "settings": {
+            "data": args.data,
+            "embedding_model": embedding_model_id(args.backend),
+            "chunk_size": args.chunk_size,
+            "chunk_overlap": args.chunk_overlap,
+            # IVF-PQ falls back to flat on corpora too small to train it
+            "index_type": index_kind(vector_store.index),
+            "index_params": index_params,
+            "search_params": config.INDEX_SEARCH_PARAMS,
+            "k": args.k,
+            "pool_size": args.pool_size,
+            "score_threshold": args.threshold,
+            "expansion": args.expansion,
+            "expander": args.expander,
+            "hybrid": args.hybrid,
+            "mode": args.mode,
+            "token_budget": args.token_budget,
+            "mmr_lambda": args.mmr_lambda,
+            "runs": args.runs,
+        },
+        "corpus": {"chunks": len(chunks), "duplicate_chunks": dropped, "questions": len(questions)},
+        "prompt": {
+            "mean_context_tokens": round(float(np.mean([r["context_tokens"] for r in per_question])), 1),
+            "mean_naive_context_tokens": round(float(np.mean([r["naive_context_tokens"] for r in per_question])), 1),
+        },
+        "facts": facts,
+        "latency": timer.summary(),
+        "memory": {"peak_python_mb": round(peak_traced / (1024 * 1024), 1), "peak_rss_mb": peak_rss_mb()},
+        "quality": {
+            "search": quality_metrics([r["search_rank"] for r in per_question], args.k),
+            "retrieval": quality_metrics([r["retrieval_rank"] for r in per_question], args.k),
+        },
+        "questions": per_question,
+    }
+
+def print_report(report):
+    print(f"\nCorpus: {report['corpus']['chunks']} chunks ({report['corpus']['duplicate_chunks']} duplicates dropped)")
+    print(f"Index: {report['settings']['index_type']} {report['settings']['index_params']}")
+    print(f"{'stage':<22}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'mean ms':>11}")
+    for stage, stats in report["latency"].items():
+        print(f"{stage:<22}{stats['count']:>7}{stats['p50_ms']:>11.2f}{stats['p95_ms']:>11.2f}{stats['mean_ms']:>11.2f}")
+    print(f"\nPrompt context: {report['prompt']['mean_context_tokens']} tokens on average "
+          f"(all retrieved chunks: {report['prompt']['mean_naive_context_tokens']})")
+    print(f"Fact fast path: {report['facts']['hits']}/{report['corpus']['questions']} questions answered "
+          f"({report['facts']['correct']} correct, {report['facts']['facts']} facts)")
+    for question in report["facts"]["wrong"]:
+        print(f"  wrong direct answer: {question}")
+    print(f"Peak memory: {report['memory']['peak_python_mb']} MB traced, {report['memory']['peak_rss_mb']} MB RSS")
+    for name, metrics in report["quality"].items():
+        print(f"{name:<10} " + ", ".join(f"{key}: {value:.3f}" for key, value in metrics.items()))
+    misses = [r["question"] for r in report["questions"] if r["retrieval_rank"] is None]
+    if misses:
+        print("\nNo relevant chunk retrieved for:")
+        for question in misses:
+            print(f"  - {question}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the RAG pipeline offline with stub LLM and search backends.")
+    parser.add_argument("--data", default=os.path.join(ROOT_DIR, config.DATA_DIR), help="Folder with the source documents.")
+    parser.add_argument("--questions", default=os.path.join(BENCHMARK_DIR, "questions.json"), help="Labelled question set.")
+    parser.add_argument("--backend", default=config.EMBEDDING_BACKEND, choices=["torch", "int8", "onnx"])
+    parser.add_argument("--chunk-size", type=int, default=config.CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=config.CHUNK_OVERLAP)
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=config.INDEX_TYPE)
+    parser.add_argument("--index-params", type=json.loads,
+                        help="JSON build parameters over the type's INDEX_PARAMS, e.g. '{\"m\": 48}'.")
+    parser.add_argument("--k", type=int, default=config.RETRIEVAL_K)
+    parser.add_argument("--pool-size", type=int, default=config.RETRIEVAL_POOL_SIZE,
+                        help="Fused chunks passed to the context builder.")
+    parser.add_argument("--threshold", type=float, default=config.SCORE_THRESHOLD)
+    parser.add_argument("--expansion", default=config.QUERY_EXPANSION, choices=["adaptive", "always", "never"])
+    parser.add_argument("--expander", default=config.QUERY_EXPANDER, choices=["llm", "local"])
+    parser.add_argument("--no-hybrid", dest="hybrid", action="store_false", help="Disable the BM25 lexical index.")
+    parser.add_argument("--mode", default="Concise", choices=list(RESPONSE_MODES))
+    parser.add_argument("--token-budget", type=int, help="Prompt-context budget (default: the mode's CONTEXT_TOKEN_BUDGET).")
+    parser.add_argument("--mmr-lambda", type=float, default=config.CONTEXT_MMR_LAMBDA)
+    parser.add_argument("--runs", type=int, default=3, help="How many times each question is run.")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds before the first token.")
+    parser.add_argument("--tokens-per-sec", type=float, default=None, help="Simulated streaming speed.")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Simulated seconds per web search.")
+    parser.add_argument("--output", help="Where to write the JSON report (default: benchmarks/results/<timestamp>.json).")
+    args = parser.parse_args()
+    if args.token_budget is None:
+        args.token_budget = config.CONTEXT_TOKEN_BUDGET[args.mode]
+
+    report = run(args)
+    print_report(report)
+
+    output = args.output or os.path.join(BENCHMARK_DIR, "results", f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {output}")
@@ -0,0 +1,120 @@
+"""
+Cold-start benchmark: import time per module and time to first answer.
+
+Every measurement runs in a fresh Python process, so nothing is already
+imported or loaded. The first answer goes through the real embedding model
+and the persisted index, with the Groq and Tavily clients replaced by the
+local stubs from benchmarks/stubs.py (no API keys needed).
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --max-app-import-ms 800   # fails (exit 1) above the budget
+
+Results are printed and written as JSON to benchmarks/results/.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+
+# What each entry point imports up front; app must stay light, the others are loaded lazily
+MODULES = [
+    "app",
+    "server",
+    "utils.chat_core",
+    "utils.rag_utils",
+    "utils.search_utils",
+    "utils.index_store",
+    "models.embeddings",
+    "models.llm",
+]
+
+IMPORT_PROBE = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+print((time.perf_counter() - start) * 1000)
+"""
+
+FIRST_ANSWER_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from utils import chat_core, search_utils
+from benchmarks.stubs import StubChatModel, make_stub_search_backend
+imported = time.perf_counter()
+chat_core.get_chatgroq_model = lambda: StubChatModel()
+search_utils.set_search_backend(make_stub_search_backend())
+core = chat_core.get_chat_core()
+loaded = time.perf_counter()
+turn = core.answer({question!r}, "Concise")
+answered = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "load_ms": (loaded - imported) * 1000,
+    "answer_ms": (answered - loaded) * 1000,
+    "first_answer_ms": (answered - start) * 1000,
+    "source": turn["source_type"],
+}}))
+"""
+
+
+def run_probe(code):
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT_DIR)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "probe failed")
+    return result.stdout.strip().splitlines()[-1]
+
+def measure_imports(modules, runs):
+    """Median cold import time of every module, in ms."""
+    report = {}
+    for module in modules:
+        try:
+            samples = [float(run_probe(IMPORT_PROBE.format(root=ROOT_DIR, module=module))) for _ in range(runs)]
+            report[module] = {"median_ms": round(float(np.median(samples)), 1), "max_ms": round(max(samples), 1)}
+        except RuntimeError as e:
+            report[module] = {"error": str(e)}
+        print(f"  {module:<22} {report[module]}")
+    return report
+
+def measure_first_answer(question):
+    """Time from process start to the first complete (stubbed) answer, split into import/load/answer."""
+    try:
+        result = json.loads(run_probe(FIRST_ANSWER_PROBE.format(root=ROOT_DIR, question=question)))
+        return {key: round(value, 1) if isinstance(value, float) else value for key, value in result.items()}
+    except RuntimeError as e:
+        return {"error": str(e)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold import times and time to first answer.")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per module.")
+    parser.add_argument("--question", default="What is the tuition fee for B.Sc. Computer Science?")
+    parser.add_argument("--skip-first-answer", action="store_true", help="Only measure imports (no model or index needed).")
+    parser.add_argument("--max-app-import-ms", type=float, help="Exit with status 1 if importing app.py takes longer.")
+    parser.add_argument("--output", help="Where to write the JSON report (default: benchmarks/results/<timestamp>.json).")
+    args = parser.parse_args()
+
+    print("[Startup] Cold import times")
+    report = {"imports": measure_imports(MODULES, args.runs)}
+    if not args.skip_first_answer:
+        print("[Startup] Time to first answer")
+        report["first_answer"] = measure_first_answer(args.question)
+        print(f"  {report['first_answer']}")
+
+    output = args.output or os.path.join(BENCHMARK_DIR, "results", f"startup-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {output}")
+
+    app_import = report["imports"]["app"].get("median_ms")
+    if args.max_app_import_ms is not None and (app_import is None or app_import > args.max_app_import_ms):
+        print(f"app.py import took {app_import} ms, over the {args.max_app_import_ms} ms budget.")
+        sys.exit(1)
@@ -0,0 +1,68 @@
+import re
+import time
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+# Stand-in results for off-campus questions; the content is irrelevant, only the shape matters
+STUB_SEARCH_RESULTS = [
+    {"url": "https://example.org/1", "content": "Stub web result one for benchmarking the web search path."},
+    {"url": "https://example.org/2", "content": "Stub web result two for benchmarking the web search path."},
+    {"url": "https://example.org/3", "content": "Stub web result three for benchmarking the web search path."},
+]
+
+
+def _prompt_text(messages):
+    """Text of the last message, whether a plain string or a list of LangChain messages was passed."""
+    if isinstance(messages, str):
+        return messages
+    last = messages[-1]
+    return last.content if hasattr(last, "content") else str(last)
+
+
+class StubChatModel:
+    """
+    Deterministic local stand-in for the Groq chat model.
+    Query-expansion prompts get three keyword paraphrases; answer prompts get the
+    first sentences of their context back. `latency_sec` is added before the first
+    token and `tokens_per_sec` paces streaming, to simulate a hosted model.
+    """
+
+    def __init__(self, latency_sec=0.0, tokens_per_sec=None):
+        self.latency_sec = latency_sec
+        self.tokens_per_sec = tokens_per_sec
+
+    def _respond(self, prompt):
+        if "generate 3 different versions" in prompt:
+            question = prompt.rsplit("Original question:", 1)[-1].strip()
+            words = re.findall(r"\w+", question.lower())
+            return "\n".join([
+                f"1. {' '.join(words)}",
+                f"2. Information about {' '.join(words)}",
+                f"3. What does the university say about {' '.join(words[-3:])}?",
+            ])
+
+        context = prompt.split("Context:", 1)[-1].split("User Question:", 1)[0]
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", " ".join(context.split())) if s.strip()]
+        limit = 3 if "concise" in prompt.lower() else 8
+        return " ".join(sentences[:limit]) or "I could not find this in the provided context."
+
+    def invoke(self, messages):
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+        return AIMessage(content=self._respond(_prompt_text(messages)))
+
+    def stream(self, messages):
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+        for token in re.findall(r"\S+\s*", self._respond(_prompt_text(messages))):
+            if self.tokens_per_sec:
+                time.sleep(1.0 / self.tokens_per_sec)
+            yield AIMessageChunk(content=token)
+
+
+def make_stub_search_backend(latency_sec=0.0):
+    """Returns a search backend for `set_search_backend` that answers with fixed results."""
+    def stub_search(query):
+        if latency_sec:
+            time.sleep(latency_sec)
+        return [dict(result) for result in STUB_SEARCH_RESULTS]
+    return stub_search
@@ -0,0 +1,75 @@
+"""
+Builds (or incrementally updates) the vector index for the data folder.
+
+    python build_index.py                          # index type from config/config.py
+    python build_index.py --index-type hnsw --hnsw-m 48
+    python build_index.py --index-type ivfpq --nlist 4096 --pq-m 48 --rebuild
+    python build_index.py --tenant engineering     # folders of a tenant in config.TENANTS
+
+Chunks already in the embedding cache are not re-embedded, so switching the
+index type or its parameters only costs the index build itself. This is the
+only place full rebuilds happen; the app just updates a flat index in place.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from config import config
+from utils.ann_index import INDEX_TYPES, STORE_FILES
+from utils.index_store import MANIFEST_FILE, LEXICAL_INDEX_FILE
+from utils.fact_index import FACTS_FILE
+from utils.rag_utils import load_index
+
+
+def directory_report(index_dir):
+    """Size on disk of every index file, in MB."""
+    report = {}
+    for name in STORE_FILES + (LEXICAL_INDEX_FILE, FACTS_FILE):
+        path = os.path.join(index_dir, name)
+        if os.path.exists(path):
+            report[name] = round(os.path.getsize(path) / (1024 * 1024), 2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the campus document index.")
+    parser.add_argument("--tenant", choices=list(config.TENANTS), help="Use this tenant's data and index folders.")
+    parser.add_argument("--data", default=config.DATA_DIR)
+    parser.add_argument("--index-dir", default=config.INDEX_DIR)
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=config.INDEX_TYPE)
+    parser.add_argument("--hnsw-m", type=int, help="HNSW graph degree.")
+    parser.add_argument("--ef-construction", type=int, help="HNSW build-time candidate list size.")
+    parser.add_argument("--nlist", type=int, help="IVF lists (default: about 4 * sqrt(chunks)).")
+    parser.add_argument("--pq-m", type=int, help="PQ sub-quantizers; must divide the embedding size.")
+    parser.add_argument("--pq-nbits", type=int, help="Bits per PQ code.")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the existing index and rebuild everything.")
+    args = parser.parse_args()
+    if args.tenant:
+        args.data = config.TENANTS[args.tenant]["data_dir"]
+        args.index_dir = config.TENANTS[args.tenant]["index_dir"]
+
+    overrides = {
+        "m": args.hnsw_m, "ef_construction": args.ef_construction,
+        "nlist": args.nlist, "pq_m": args.pq_m, "pq_nbits": args.pq_nbits,
+    }
+    customized = args.index_type != config.INDEX_TYPE or any(value is not None for value in overrides.values())
+    config.INDEX_TYPE = args.index_type
+    params = dict(config.INDEX_PARAMS[args.index_type])
+    params.update({key: value for key, value in overrides.items() if value is not None and key in params})
+    config.INDEX_PARAMS[args.index_type] = params
+
+    if args.rebuild:
+        manifest_path = os.path.join(args.index_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+    start = time.perf_counter()
+    vector_store, _ = load_index(args.data, args.index_dir)
+    print(f"\n{args.index_type} index with {vector_store.index.ntotal} chunks ready in {time.perf_counter() - start:.1f}s")
+    print(f"Parameters: {params}")
+    if customized:
+        print("Note: set the same INDEX_TYPE and INDEX_PARAMS in config/config.py, or the app will not load this index.")
+    for name, size in directory_report(args.index_dir).items():
+        print(f"  {name:<28}{size:>10.2f} MB")
@@ -0,0 +1,146 @@
+# --- RAG Index Settings ---
+# Folder holding the scraped campus documents
+DATA_DIR = "data"
+# Folder where the FAISS index and its manifest are persisted between runs
+INDEX_DIR = "index_store"
+# Text splitter settings (changing these forces a full index rebuild)
+CHUNK_SIZE = 750
+CHUNK_OVERLAP = 150
+# Changeset written into the data folder by `scraper.py` and consumed by the indexer
+CHANGESET_FILE = ".changeset.json"
+
+# --- Streaming Ingest (`scraper.py --index`) ---
+# Crawled sources (pages, modals, PDFs) that may wait for the embedding stage before the crawl is held back
+INGEST_QUEUE_MAX_SOURCES = 8
+# Also save every crawled source as a text file in DATA_DIR; the streamed index does not need them
+WRITE_TEXT_FILES = True
+
+# --- Vector Index ---
+# "flat" (exact), "hnsw" (graph index: fast and accurate, more memory) or "ivfpq" (compressed, for very large corpora)
+INDEX_TYPE = "flat"
+# Build parameters per index type (changing them rebuilds the index from the embedding cache)
+INDEX_PARAMS = {
+    "flat": {},
+    "hnsw": {"m": 32, "ef_construction": 200},
+    # nlist None picks about 4 * sqrt(number of chunks); pq_m must divide the embedding size (384)
+    "ivfpq": {"nlist": None, "pq_m": 48, "pq_nbits": 8},
+}
+# Query-time parameters: visiting more candidates improves recall but slows searches down
+INDEX_SEARCH_PARAMS = {"ef_search": 64, "nprobe": 16}
+# Open the saved index and docstore memory-mapped instead of reading them into RAM
+INDEX_MMAP = True
+
+# --- Tenants ---
+# Campuses or departments served by one deployment, each with its own documents and index
+TENANTS = {
+    "default": {"name": "Global University of Innovation", "data_dir": DATA_DIR, "index_dir": INDEX_DIR},
+}
+# Tenant used when a request does not name one
+DEFAULT_TENANT = "default"
+# Indexes are loaded on a tenant's first question; beyond this many MB the least recently used are unloaded
+TENANT_MEMORY_BUDGET_MB = 1024
+# How often (in seconds) a loaded tenant checks whether its index was rebuilt by another process and reloads
+INDEX_RELOAD_CHECK_SEC = 5
+
+# --- Startup ---
+# Load the embedding model and the default index in the background while the first page renders
+BACKGROUND_WARMUP = True
+# Import times, warm-up steps and time to first answer, written after the first answer
+STARTUP_REPORT_PATH = "logs/startup.json"
+
+# --- Mode Switching ---
+# Retrieved context kept per chat session, so re-asking or switching the response mode skips retrieval
+RETRIEVAL_STORE_MAX_ENTRIES = 20
+RETRIEVAL_STORE_TTL_SEC = 30 * 60
+# After an answer, generate the other response mode's answer in the background. Every such answer is
+# an extra Groq call, so it is off by default and only runs when the rate limit has headroom
+SPECULATIVE_MODE_ANSWERS = False
+# Calls of the per-minute budget that must stay free for real questions after a speculative one starts
+SPECULATION_SPARE_RPM = 10
+# How long a mode switch waits for that background answer before generating its own
+SPECULATION_WAIT_SEC = 20
+
+# --- Structured Facts ---
+# Answer clear fee, eligibility and calendar questions straight from the fact table, without the LLM
+FACT_FAST_PATH = True
+# Other names students use for each program (the program's own name is always recognized)
+FACT_PROGRAM_ALIASES = {
+    "B.Sc. Computer Science": ["cs", "cse", "bsc cs", "computer science"],
+    "BBA": ["business administration", "ba", "management"],
+    "B.Sc. Biosciences": ["bio", "biotech", "biotechnology", "bioscience"],
+}
+
+# --- Semantic Answer Cache ---
+# Minimum cosine similarity between two questions for a cached answer to be reused
+ANSWER_CACHE_THRESHOLD = 0.92
+ANSWER_CACHE_MAX_ENTRIES = 1000
+# Cached answers expire after this many seconds
+ANSWER_CACHE_TTL_SEC = 6 * 3600
+
+# --- Retrieval ---
+RETRIEVAL_K = 5
+# At most this many fused chunks are passed on to the context builder's MMR selection
+RETRIEVAL_POOL_SIZE = 8
+# Minimum relevance score (0-1) for a chunk to count as a hit
+SCORE_THRESHOLD = 0.3
+# "adaptive" expands the query only when results are weak, "always" on every query, "never" disables it
+QUERY_EXPANSION = "adaptive"
+# "llm" generates paraphrases with the chat model, "local" rewrites the query without any LLM call
+QUERY_EXPANDER = "llm"
+# Results count as weak when the best score is below this or there are fewer hits than EXPANSION_MIN_HITS
+EXPANSION_STRONG_SCORE = 0.5
+EXPANSION_MIN_HITS = 2
+# Combine FAISS with a BM25 lexical index over the same chunks (exact codes, amounts, dates)
+HYBRID_SEARCH = True
+# Fraction of the query's terms a chunk must contain to count as a lexical hit
+LEXICAL_MIN_COVERAGE = 0.5
+# Reciprocal-rank fusion constant; larger values flatten the weight of top ranks
+RRF_K = 60
+
+# --- Prompt Context ---
+# Approximate prompt-context size per response mode; retrieved chunks beyond it are left out
+CONTEXT_TOKEN_BUDGET = {"Concise": 450, "Detailed": 1200}
+# Maximal marginal relevance trade-off: 1.0 keeps the retriever's order, lower values favour diverse chunks
+CONTEXT_MMR_LAMBDA = 0.7
+
+# --- Web Search ---
+# Cached web results per normalized query
+WEB_SEARCH_CACHE_MAX_ENTRIES = 500
+WEB_SEARCH_CACHE_TTL_SEC = 3600
+# Start the web search alongside local retrieval for questions that look off-campus
+SPECULATIVE_WEB_SEARCH = True
+# A question looks off-campus when fewer than this fraction of its terms occur in the campus documents
+LIKELY_MISS_MAX_COVERAGE = 0.5
+
+# --- Embeddings ---
+# "torch" (float32), "int8" (dynamically quantized) or "onnx" (ONNX Runtime, needs sentence-transformers[onnx])
+EMBEDDING_BACKEND = "torch"
+EMBEDDING_BATCH_SIZE = 64
+# Persistent cache of chunk vectors keyed by (model, text hash)
+EMBEDDING_CACHE_PATH = "index_store/embedding_cache.sqlite"
+# Compare a non-float backend with the float model on startup and fall back if they disagree
+EMBEDDING_PARITY_CHECK = True
+EMBEDDING_PARITY_MIN_SIMILARITY = 0.98
+
+# --- Tracing & Metrics ---
+# Each chat turn is appended here as one JSON line with its per-stage spans (None disables)
+TRACE_LOG_PATH = "logs/traces.jsonl"
+# Metrics in Prometheus text format, rewritten after every turn (for a node_exporter textfile collector)
+METRICS_TEXTFILE_PATH = "logs/metrics.prom"
+# Show the per-stage breakdown of the last turn in the sidebar by default
+DEBUG_PANEL = False
+
+# --- Serving ---
+# Concurrent question embeddings are collected for up to this long and encoded as one batch
+EMBEDDING_BATCH_WINDOW_MS = 5
+EMBEDDING_MAX_QUERY_BATCH = 32
+# Admission control for Groq calls (answers and LLM query expansion)
+LLM_MAX_CONCURRENT = 4
+LLM_MAX_QUEUE = 16
+LLM_QUEUE_TIMEOUT_SEC = 15
+# Stay under the Groq rate limit for llama-3.1-8b-instant (0 disables the limit)
+LLM_REQUESTS_PER_MINUTE = 30
+# HTTP API started with `python server.py`
+API_HOST = "127.0.0.1"
+API_PORT = 8000
+API_MAX_QUESTION_CHARS = 1000
@@ -1,17 +1,247 @@
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import os
+import sys
+import sqlite3
+import time
+import queue
+import hashlib
+import threading
+from concurrent.futures import Future
+from functools import lru_cache
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import config
+from utils.trace_utils import registry
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Campus-style sentences used to compare a quantized backend against the float model
+PARITY_SAMPLE_TEXTS = [
+    "What is the tuition fee for B.Sc. Computer Science?",
+    "Tuition Fee: 45,000 per semester. Examination Fee: 2,000 per semester.",
+    "When does the odd semester 2025 academic year commence?",
+    "Candidates must have passed 10+2 with Mathematics as a compulsory subject.",
+    "The library is open from 8 AM to 8 PM on all working days.",
+    "Department of Biosciences offers research-oriented programs in biotechnology.",
+]
+
+
+def embedding_model_id(backend=None):
+    """Identifies the vectors a backend produces; stored with the index and the embedding cache."""
+    backend = backend or config.EMBEDDING_BACKEND
+    return EMBEDDING_MODEL_NAME if backend == "torch" else f"{EMBEDDING_MODEL_NAME}:{backend}"
+
+def load_base_model(backend="torch"):
+    """
+    Loads MiniLM on CPU with the requested backend:
+    "torch" (float32), "int8" (dynamically quantized Linear layers) or "onnx" (ONNX Runtime).
+    """
+    # Deferred until a model is actually loaded (it pulls in sentence-transformers and torch)
+    from langchain_community.embeddings import HuggingFaceEmbeddings
 
-def get_embedding_model():
-    """Initializes and returns the embedding model."""
-    model_name = "sentence-transformers/all-MiniLM-L6-v2"
     model_kwargs = {'device': 'cpu'}
+    if backend == "onnx":
+        # Needs sentence-transformers>=3.2 with the onnx extra (optimum + onnxruntime)
+        model_kwargs['backend'] = "onnx"
 
     # Set normalize_embeddings to True to get reliable 0-1 scores
-    encode_kwargs = {'normalize_embeddings': True} 
+    encode_kwargs = {'normalize_embeddings': True, 'batch_size': config.EMBEDDING_BATCH_SIZE}
 
     embeddings = HuggingFaceEmbeddings(
-        model_name=model_name,
+        model_name=EMBEDDING_MODEL_NAME,
         model_kwargs=model_kwargs,
-        encode_kwargs=encode_kwargs 
+        encode_kwargs=encode_kwargs
     )
 
-    return embeddings
\ No newline at end of file
+    if backend == "int8":
+        import torch
+        embeddings.client = torch.quantization.quantize_dynamic(embeddings.client, {torch.nn.Linear}, dtype=torch.qint8)
+    elif backend not in ("torch", "onnx"):
+        raise ValueError(f"Unknown embedding backend '{backend}'.")
+    return embeddings
+
+def check_backend_parity(candidate, reference, texts=PARITY_SAMPLE_TEXTS):
+    """Returns the lowest cosine similarity between the candidate's and the reference's vectors."""
+    candidate_vectors = np.asarray(candidate.embed_documents(texts))
+    reference_vectors = np.asarray(reference.embed_documents(texts))
+    # Both are normalized, so the row-wise dot product is the cosine similarity
+    return float(np.min(np.sum(candidate_vectors * reference_vectors, axis=1)))
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model with batched encoding and a persistent vector cache.
+    Document vectors are stored in SQLite keyed by (model id, SHA-256 of the text),
+    so re-indexing unchanged chunks never runs the model again. Queries are not cached.
+    """
+
+    def __init__(self, base, model_id, cache_path, batch_size=64):
+        self.base = base
+        self.model_id = model_id
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(cache_path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (model TEXT, hash TEXT, vector BLOB, PRIMARY KEY (model, hash))"
+        )
+        self.db.commit()
+
+    @staticmethod
+    def text_hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, hashes):
+        found = {}
+        with self.lock:
+            # SQLite limits the number of bound parameters, so look up in slices
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                rows = self.db.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [self.model_id, *batch],
+                ).fetchall()
+                found.update((h, np.frombuffer(blob, dtype=np.float32)) for h, blob in rows)
+        return found
+
+    def _store(self, items):
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(self.model_id, h, np.asarray(vector, dtype=np.float32).tobytes()) for h, vector in items],
+            )
+            self.db.commit()
+
+    def embed_array(self, texts):
+        """Like `embed_documents`, but returns one float32 matrix (row i for texts[i]) instead of Python lists."""
+        hashes = [self.text_hash(text) for text in texts]
+        vectors = self._lookup(sorted(set(hashes)))
+
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in vectors:
+                missing.setdefault(h, text)
+        missing_hashes = list(missing)
+        for start in range(0, len(missing_hashes), self.batch_size):
+            batch = missing_hashes[start:start + self.batch_size]
+            batch_vectors = np.asarray(self.base.embed_documents([missing[h] for h in batch]), dtype=np.float32)
+            self._store(zip(batch, batch_vectors))
+            vectors.update(zip(batch, batch_vectors))
+
+        if missing:
+            print(f"  [Embeddings] Encoded {len(missing)} of {len(texts)} texts, the rest came from the cache.")
+        if not hashes:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([vectors[h] for h in hashes])
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.base.embed_query(text)
+
+    def embed_queries(self, texts):
+        """Embeds several queries in one model call (not cached, like `embed_query`)."""
+        return self.base.embed_documents(texts)
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """
+    Collects `embed_query` calls from concurrent requests into micro-batches.
+    A background thread takes the first waiting query, gathers whatever else arrives
+    within `window_ms` (up to `max_batch` queries) and encodes them in one model call.
+    Document embedding is passed straight through; it is already batched.
+    """
+
+    def __init__(self, inner, window_ms=5, max_batch=32):
+        self.inner = inner
+        self.model_id = getattr(inner, "model_id", None)
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.pending = queue.Queue()
+        self.worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self.worker.start()
+
+    def _encode(self, texts):
+        embed_queries = getattr(self.inner, "embed_queries", None)
+        if embed_queries is not None:
+            return embed_queries(texts)
+        return [self.inner.embed_query(text) for text in texts]
+
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            registry.inc("rag_embedding_query_batches_total")
+            registry.inc("rag_embedding_queries_total", len(batch))
+            try:
+                vectors = self._encode([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def embed_query(self, text):
+        future = Future()
+        self.pending.put((text, future))
+        return future.result()
+
+    def embed_documents(self, texts):
+        return self.inner.embed_documents(texts)
+
+    def embed_array(self, texts):
+        return embed_array(self.inner, texts)
+
+
+def embed_array(embedding_model, texts):
+    """Document vectors as one float32 matrix, without per-vector Python lists if the model supports it."""
+    embed = getattr(embedding_model, "embed_array", None)
+    if embed is not None:
+        return embed(texts)
+    return np.asarray(embedding_model.embed_documents(texts), dtype=np.float32)
+
+
+@lru_cache(maxsize=None)
+def get_embedding_model():
+    """Initializes and returns the embedding model, shared by the index and the answer cache."""
+    backend = config.EMBEDDING_BACKEND
+    base = load_base_model(backend)
+
+    if backend != "torch" and config.EMBEDDING_PARITY_CHECK:
+        reference = load_base_model("torch")
+        similarity = check_backend_parity(base, reference)
+        if similarity < config.EMBEDDING_PARITY_MIN_SIMILARITY:
+            print(f"  [Embeddings] '{backend}' backend failed the parity check ({similarity:.4f}), using float model.")
+            backend, base = "torch", reference
+        else:
+            print(f"  [Embeddings] '{backend}' backend parity with float model: {similarity:.4f}")
+
+    return CachedEmbeddings(base, embedding_model_id(backend), config.EMBEDDING_CACHE_PATH, config.EMBEDDING_BATCH_SIZE)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare an embedding backend with the float MiniLM model.")
+    parser.add_argument("backend", choices=["int8", "onnx"])
+    args = parser.parse_args()
+
+    reference = load_base_model("torch")
+    candidate = load_base_model(args.backend)
+    print(f"Lowest cosine similarity vs. float: {check_backend_parity(candidate, reference):.4f}")
+    for name, model in (("torch", reference), (args.backend, candidate)):
+        start = time.perf_counter()
+        model.embed_documents(PARITY_SAMPLE_TEXTS * 20)
+        print(f"{name}: {time.perf_counter() - start:.3f}s for {len(PARITY_SAMPLE_TEXTS) * 20} texts")
@@ -1,11 +1,12 @@
 import os
 import sys
-from langchain_groq import ChatGroq
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from config import config
-import streamlit as st
 def get_chatgroq_model():
     """Initialize and return the Groq chat model"""
+    # Imported here so that only callers who actually talk to Groq pay for langchain_groq
+    import streamlit as st
+    from langchain_groq import ChatGroq
     try:
         # Initialize the Groq chat model with the API key
         groq_model = ChatGroq(
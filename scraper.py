@@ -1,53 +1,264 @@
 import os
-import time
+import queue
+import argparse
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 from PyPDF2 import PdfReader
+from langchain_core.documents import Document
+from utils.dedup_utils import content_hash
+from utils.crawl_state import CrawlState, file_fingerprint, text_hash
+from config import config
 
 # --- Configuration ---
 # The absolute path to your local college website folder
-DUMMY_SITE_DIR = r"C:\Users\Sirisha G\Desktop\NeoStats\AI_UseCase\college-website" 
+DUMMY_SITE_DIR = r"C:\Users\Sirisha G\Desktop\NeoStats\AI_UseCase\college-website"
 # It's best to start at the homepage to discover all links naturally
 START_FILE = "index.html"
 # The directory where all extracted text will be saved
 DATA_DIR = "data"
-# Wait time for JavaScript to execute
-WAIT_SEC = 1
+# Maximum time to wait for a page or modal to reach the expected state
+WAIT_TIMEOUT_SEC = 10
+# Number of concurrent page workers (and at most this many headless browsers)
+MAX_WORKERS = 3
+# Pages containing any of these elements need a real browser to render their content
+JS_CONTENT_SELECTORS = (".department-card",)
+# Fingerprints of every crawled page, modal and PDF, kept between runs
+CRAWL_STATE_FILE = os.path.join(DATA_DIR, ".crawl_state.json")
+# Data files changed by the crawl, consumed by the indexer on its next sync
+CHANGESET_FILE = os.path.join(DATA_DIR, config.CHANGESET_FILE)
 
 # A set to keep track of visited files to avoid scraping the same page twice
 visited_files = set()
+# PDFs are often linked from several pages and modals; extract each one only once
+pdf_jobs = {}
+pdf_lock = threading.Lock()
+# Normalized content hash -> (rank, output file, PDF path) of the PDF whose file holds that text,
+# so identical PDFs are saved only once
+saved_pdf_hashes = {}
+duplicate_pdf_count = 0
+# Finished extractions and unchanged PDFs, saved one at a time by the PDF feeder thread
+pdf_events = queue.Queue()
+# Set from the command line; when True, unchanged pages and PDFs are skipped
+INCREMENTAL = False
+crawl_state = None
+pdf_executor = None
+# With --index, every crawled source is also streamed into the vector index
+ingest = None
+
+
+class DriverPool:
+    """
+    A bounded pool of headless Chrome drivers shared by the page workers.
+    Drivers are started lazily, so a crawl that only hits static pages never launches a browser.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.idle = queue.Queue()
+        self.drivers = []
+        # Drivers started or being started; reserved under the lock, launched outside it
+        self.started = 0
+        self.lock = threading.Lock()
+
+    def _start_driver(self):
+        chrome_options = Options()
+        chrome_options.add_argument("--headless=new")
+        return webdriver.Chrome(options=chrome_options)
+
+    @contextmanager
+    def driver(self):
+        """Borrows a driver, blocking until one is free if the pool is exhausted."""
+        driver = None
+        with self.lock:
+            reserved = self.idle.empty() and self.started < self.size
+            if reserved:
+                self.started += 1
+        if reserved:
+            # Launching Chrome takes seconds; other workers keep borrowing idle drivers meanwhile
+            try:
+                driver = self._start_driver()
+            except Exception:
+                with self.lock:
+                    self.started -= 1
+                raise
+            with self.lock:
+                self.drivers.append(driver)
+        else:
+            driver = self.idle.get()
+        try:
+            yield driver
+        finally:
+            self.idle.put(driver)
+
+    def close(self):
+        for driver in self.drivers:
+            driver.quit()
+
 
 def local_file_to_url(file_path):
     """Converts a local file path to a file:/// URL for the browser."""
     abspath = os.path.abspath(file_path)
     return "file:///" + abspath.replace("\\", "/")
 
+def page_fingerprint(file_path, soup):
+    """
+    Fingerprints a page together with the local scripts it loads,
+    since the department modals are rendered from script.js.
+    """
+    fingerprint = file_fingerprint(file_path)
+    combined = fingerprint["hash"]
+    for script in soup.find_all('script', src=True):
+        script_path = os.path.abspath(os.path.join(os.path.dirname(file_path), script['src']))
+        if os.path.exists(script_path):
+            combined += file_fingerprint(script_path)["hash"]
+    fingerprint["hash"] = text_hash(combined)
+    return fingerprint
+
+def needs_browser(soup):
+    """True if the page has content that only appears after JavaScript runs."""
+    return any(soup.select_one(selector) for selector in JS_CONTENT_SELECTORS)
+
+def save_source(filename, documents, text=None):
+    """
+    Stores one crawled source: as a text file in the data folder (unless text files
+    are turned off) and, with --index, in the streaming index pipeline, which blocks
+    while the indexer is behind. Returns True if the text file changed.
+    """
+    if text is None:
+        text = "\n".join(doc.page_content for doc in documents)
+    changed = crawl_state.write_output(filename, text)
+    if ingest is not None:
+        ingest.put(filename, documents)
+    return changed
+
+def source_metadata(filename, url, section, **extra):
+    """Metadata of a crawled document; `source` is the data file path the loaders would report."""
+    return dict(source=os.path.join(DATA_DIR, filename), url=url, section=section, **extra)
+
+def parse_pdf(pdf_path):
+    """Extracts the text of every page of a local PDF file. Runs in a worker process."""
+    reader = PdfReader(pdf_path)
+    return [page.extract_text() or "" for page in reader.pages]
+
 def extract_pdf_text(pdf_path):
-    """Extracts all text from a local PDF file."""
+    """Queues a PDF for text extraction in the process pool, once per crawl."""
+    global duplicate_pdf_count
+    with pdf_lock:
+        if pdf_path in pdf_jobs:
+            duplicate_pdf_count += 1
+            return
+        pdf_jobs[pdf_path] = None
     if not os.path.exists(pdf_path):
         print(f"  [PDF Error] File not found: {pdf_path}")
-        return ""
-    try:
-        reader = PdfReader(pdf_path)
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        
-        # Save the extracted PDF text to its own file
-        if text:
-            pdf_filename = os.path.splitext(os.path.basename(pdf_path))[0]
-            output_filename = os.path.join(DATA_DIR, f"pdf_{pdf_filename}.txt")
-            with open(output_filename, "w", encoding="utf-8") as f:
-                f.write(text)
-            print(f"  > Extracted and saved text from PDF: {os.path.basename(pdf_path)}")
-        return text.strip()
-    except Exception as e:
-        print(f"  [PDF Error] Could not read {pdf_path}: {e}")
-        return ""
+        return
+
+    fingerprint = file_fingerprint(pdf_path, crawl_state.get(pdf_path))
+    if INCREMENTAL and crawl_state.is_unchanged(pdf_path, fingerprint):
+        crawl_state.keep(pdf_path)
+        pdf_events.put((pdf_path, fingerprint, None))
+        print(f"  > Unchanged PDF, skipped: {os.path.basename(pdf_path)}")
+        return
+
+    future = pdf_executor.submit(parse_pdf, pdf_path)
+    with pdf_lock:
+        pdf_jobs[pdf_path] = (fingerprint, future)
+    future.add_done_callback(lambda done: pdf_events.put((pdf_path, fingerprint, done)))
+
+def claim_pdf_text(digest, pdf_path, output_filename, unchanged):
+    """
+    Decides which of the PDFs with the same text keeps its data file, independent of
+    the order they finish in: an unchanged PDF wins over a re-parsed one, then the
+    smallest path. Returns (owns, displaced) where displaced is the former owner.
+    Only the PDF feeder thread calls this.
+    """
+    global duplicate_pdf_count
+    rank = (not unchanged, pdf_path)
+    owner = saved_pdf_hashes.get(digest)
+    if owner is not None and owner[0] <= rank:
+        duplicate_pdf_count += 1
+        return False, owner
+    saved_pdf_hashes[digest] = (rank, output_filename, pdf_path)
+    if owner is not None:
+        duplicate_pdf_count += 1
+    return True, owner
+
+def release_pdf_text(owner):
+    """Takes the data file away from a PDF that lost its text to a duplicate."""
+    _, output_filename, pdf_path = owner
+    print(f"  > {os.path.basename(pdf_path)} is now a duplicate, dropping {output_filename}")
+    crawl_state.drop_outputs(pdf_path)
+    # PDFs with the same file name share an output, which then still belongs to the new owner
+    if ingest is not None and all(other[1] != output_filename for other in saved_pdf_hashes.values()):
+        ingest.drop(output_filename)
+
+def keep_pdf_text(pdf_path):
+    """Claims the text of an unchanged PDF for the data file it already has."""
+    record = crawl_state.get(pdf_path)
+    if not record.get("content_hash") or not record.get("outputs"):
+        return
+    owns, other = claim_pdf_text(record["content_hash"], pdf_path, record["outputs"][0], unchanged=True)
+    if not owns:
+        release_pdf_text((None, record["outputs"][0], pdf_path))
+    elif other is not None:
+        release_pdf_text(other)
+
+def save_pdf_text(pdf_path, fingerprint, pages):
+    """Saves the extracted PDF text to its own file, unless a duplicate PDF owns the same content."""
+    outputs, digest = [], None
+    text = "".join(page + "\n" for page in pages if page)
+    if text:
+        pdf_filename = os.path.splitext(os.path.basename(pdf_path))[0]
+        output_filename = f"pdf_{pdf_filename}.txt"
+        digest = content_hash(text)
+        owns, other = claim_pdf_text(digest, pdf_path, output_filename, unchanged=False)
+        if not owns:
+            print(f"  > Skipped {os.path.basename(pdf_path)}: same content as {other[1]}")
+        else:
+            if other is not None:
+                release_pdf_text(other)
+            outputs.append(output_filename)
+            title = os.path.basename(pdf_path)
+            documents = [
+                Document(page_content=page, metadata=source_metadata(output_filename, local_file_to_url(pdf_path), title, page=number))
+                for number, page in enumerate(pages) if page
+            ]
+            if save_source(output_filename, documents, text):
+                print(f"  > Extracted and saved text from PDF: {os.path.basename(pdf_path)}")
+    crawl_state.record(pdf_path, "pdf", fingerprint, outputs, content_hash=digest)
+
+def feed_pdfs():
+    """
+    Saves each PDF (and streams it into the index) as soon as its extraction finishes,
+    while the crawl goes on. Runs in its own thread until finish_pdf_jobs() stops it.
+    """
+    while True:
+        event = pdf_events.get()
+        if event is None:
+            return
+        pdf_path, fingerprint, future = event
+        if future is None:
+            keep_pdf_text(pdf_path)
+            continue
+        try:
+            save_pdf_text(pdf_path, fingerprint, future.result())
+        except Exception as e:
+            print(f"  [PDF Error] Could not read {pdf_path}: {e}")
+            # Keep the previous record so a transient error does not delete its data file
+            if crawl_state.get(pdf_path):
+                crawl_state.keep(pdf_path)
+
+def finish_pdf_jobs(pdf_feeder):
+    """Stops the PDF feeder once it has saved everything; call after the process pool shut down."""
+    # The pool runs the done-callbacks before its shutdown returns, so every result is queued by now
+    pdf_events.put(None)
+    pdf_feeder.join()
 
 def scrape_page_content(soup, file_path):
     """Extracts the main visible text content from a BeautifulSoup object."""
@@ -57,16 +268,25 @@ def scrape_page_content(soup, file_path):
         page_text = content_container.get_text(separator='\n', strip=True)
         if page_text:
             filename = os.path.splitext(os.path.basename(file_path))[0] + ".txt"
-            with open(os.path.join(DATA_DIR, filename), 'w', encoding='utf-8') as f:
-                f.write(page_text)
-            print(f"  > Saved main page content to {filename}")
+            title = soup.title.get_text(strip=True) if soup.title else os.path.basename(file_path)
+            metadata = source_metadata(filename, local_file_to_url(file_path), title)
+            if save_source(filename, [Document(page_content=page_text, metadata=metadata)]):
+                print(f"  > Saved main page content to {filename}")
+            return [filename]
+    return []
 
-def scrape_department_modals(driver,base_dir):
-    """Finds and clicks department cards to scrape the JS-loaded modal content."""
+def scrape_department_modals(driver, file_path):
+    """
+    Finds and clicks department cards to scrape the JS-loaded modal content.
+    Returns (modal_keys, pdf_paths) for the crawl state.
+    """
+    base_dir = os.path.dirname(file_path)
+    modal_keys, pdf_paths = [], []
+    wait_for = WebDriverWait(driver, WAIT_TIMEOUT_SEC)
     try:
         cards = driver.find_elements(By.CSS_SELECTOR, ".department-card")
         if not cards:
-            return # No department cards on this page
+            return modal_keys, pdf_paths # No department cards on this page
 
         print(f"  > Found {len(cards)} department cards. Extracting modal details...")
         for i in range(len(cards)):
@@ -74,101 +294,170 @@ def scrape_department_modals(driver,base_dir):
             card = driver.find_elements(By.CSS_SELECTOR, ".department-card")[i]
             btn = card.find_element(By.CSS_SELECTOR, ".view-details")
             btn.click()
-            time.sleep(WAIT_SEC) # Wait for modal to appear
-
-            modal = driver.find_element(By.ID, "deptModal")
+            # The modal is filled before it is shown, so visible means ready
+            modal = wait_for.until(EC.visibility_of_element_located((By.ID, "deptModal")))
             modal_soup = BeautifulSoup(modal.get_attribute("outerHTML"), "html.parser")
-            
+
             dept_title = modal_soup.find("h2").get_text(strip=True)
             modal_text = modal_soup.get_text(separator='\n', strip=True)
 
             # Save modal content to a department-specific file
-            filename = os.path.join(DATA_DIR, f"department_{dept_title.replace(' ', '_')}.txt")
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(modal_text)
-            print(f"    - Saved modal text for '{dept_title}'")
+            filename = f"department_{dept_title.replace(' ', '_')}.txt"
+            metadata = source_metadata(filename, local_file_to_url(file_path), dept_title)
+            if save_source(filename, [Document(page_content=modal_text, metadata=metadata)]):
+                print(f"    - Saved modal text for '{dept_title}'")
+            modal_key = f"{os.path.abspath(file_path)}#{dept_title}"
+            crawl_state.record(modal_key, "modal", {"hash": text_hash(modal_text)}, [filename])
+            modal_keys.append(modal_key)
 
             for link in modal_soup.select('a[href$=".pdf"]'):
                 href = link['href']
                 # Construct the full path to the PDF
                 pdf_path = os.path.abspath(os.path.join(base_dir, href))
+                pdf_paths.append(pdf_path)
                 extract_pdf_text(pdf_path)
 
-            # Close the modal before proceeding to the next card
+            # Close the modal and wait until it is gone before opening the next one
             close_btn = driver.find_element(By.ID, "deptModalClose")
             close_btn.click()
-            time.sleep(0.5)
+            wait_for.until(EC.invisibility_of_element_located((By.ID, "deptModal")))
 
     except Exception as e:
         print(f"  > No department modals found or an error occurred: {e}")
+    return modal_keys, pdf_paths
 
-def scrape_all_content(file_path, driver):
-    """Main function to scrape a single local file."""
+def find_page_links(soup, file_path):
+    """Returns (html_paths, pdf_paths) for all local files linked from a page."""
+    base_dir = os.path.dirname(file_path)
+    html_paths, pdf_paths = [], []
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        if href.endswith('.pdf'):
+            # Build the full, absolute path to the local PDF file
+            pdf_paths.append(os.path.abspath(os.path.join(base_dir, href)))
+        elif href.endswith('.html'):
+            next_file_path = os.path.abspath(os.path.join(base_dir, href))
+            if os.path.exists(next_file_path):
+                html_paths.append(next_file_path)
+    return html_paths, pdf_paths
+
+def render_page(file_path, driver_pool):
+    """Loads a page in a pooled browser. Returns (soup, modal_keys, modal_pdfs)."""
+    with driver_pool.driver() as driver:
+        driver.get(local_file_to_url(file_path))
+        WebDriverWait(driver, WAIT_TIMEOUT_SEC).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+        soup = BeautifulSoup(driver.page_source, "html.parser")
+        modal_keys, modal_pdfs = scrape_department_modals(driver, file_path)
+    return soup, modal_keys, modal_pdfs
+
+def scrape_all_content(file_path, driver_pool):
+    """Main function to scrape a single local file. Returns the local pages it links to."""
     abs_path = os.path.abspath(file_path)
-    if abs_path in visited_files:
-        return []
-    
     print(f"\nScraping: {file_path}")
-    visited_files.add(abs_path)
 
     try:
-        url = local_file_to_url(file_path)
-        driver.get(url)
-        time.sleep(WAIT_SEC) # Wait for the page and any initial JS to render
+        with open(abs_path, "r", encoding="utf-8") as f:
+            static_soup = BeautifulSoup(f.read(), "html.parser")
+        fingerprint = page_fingerprint(abs_path, static_soup)
 
-        soup = BeautifulSoup(driver.page_source, "html.parser")
+        # Incremental mode: an unchanged page is not re-rendered, but its PDFs are still checked
+        if INCREMENTAL and crawl_state.is_unchanged(abs_path, fingerprint):
+            record = crawl_state.get(abs_path)
+            crawl_state.keep(abs_path)
+            print(f"  > {os.path.basename(file_path)} unchanged since last crawl, skipped rendering.")
+            for pdf_path in record.get("pdfs", []):
+                extract_pdf_text(pdf_path)
+            return record.get("links", [])
 
-        # 1. Scrape the main, static text content from the page
-        scrape_page_content(soup, file_path)
+        # Static fast path: pages without JS-driven content are parsed straight from disk
+        if needs_browser(static_soup):
+            soup, modal_keys, modal_pdfs = render_page(file_path, driver_pool)
+        else:
+            soup, modal_keys, modal_pdfs = static_soup, [], []
 
-        # 2. Scrape the dynamic, JavaScript-loaded department modals (if any exist)
-        scrape_department_modals(driver, os.path.dirname(file_path))
+        # 1. Scrape the main, static text content from the page
+        outputs = scrape_page_content(soup, file_path)
 
-        # 3. Find and extract text from all linked PDFs on the page
-        for link in soup.select('a[href$=".pdf"]'):
-            href = link['href']
-            # Build the full, absolute path to the local PDF file
-            pdf_path = os.path.abspath(os.path.join(os.path.dirname(file_path), href))
+        # 2. Find and extract text from all linked PDFs on the page
+        new_files_to_scrape, page_pdfs = find_page_links(soup, file_path)
+        for pdf_path in page_pdfs:
             extract_pdf_text(pdf_path)
 
-        # 4. Find all other local HTML files linked from this page to scrape next
-        new_files_to_scrape = []
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            if href.endswith('.html'):
-                next_file_path = os.path.abspath(os.path.join(os.path.dirname(file_path), href))
-                if os.path.exists(next_file_path):
-                    new_files_to_scrape.append(next_file_path)
+        # 3. Remember what this page produced so the next incremental crawl can skip it
+        crawl_state.record(
+            abs_path, "page", fingerprint, outputs,
+            modals=modal_keys, pdfs=sorted(set(page_pdfs + modal_pdfs)), links=new_files_to_scrape,
+        )
         return new_files_to_scrape
 
     except Exception as e:
         print(f"An error occurred while scraping {file_path}: {e}")
+        # Keep the previous record so a transient error does not delete its data files
+        if crawl_state.get(abs_path):
+            crawl_state.keep(abs_path)
         return []
 
+def crawl(start_path, driver_pool, workers):
+    """Crawls all pages reachable from `start_path` using a shared frontier and a pool of page workers."""
+    start_path = os.path.abspath(start_path)
+    visited_files.add(start_path)
+    with ThreadPoolExecutor(max_workers=workers) as page_executor:
+        pending = {page_executor.submit(scrape_all_content, start_path, driver_pool)}
+        # Loop until all discoverable pages have been scraped
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for f in future.result():
+                    if os.path.abspath(f) not in visited_files:
+                        visited_files.add(os.path.abspath(f))
+                        pending.add(page_executor.submit(scrape_all_content, f, driver_pool))
+
 # --- Main Script Execution ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape the local college website into the data folder.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip pages and PDFs that have not changed since the last crawl.")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Number of concurrent page workers and headless browsers.")
+    parser.add_argument("--index", action="store_true",
+                        help="Stream crawled documents into the vector index while crawling.")
+    parser.add_argument("--no-text-files", dest="text_files", action="store_false", default=config.WRITE_TEXT_FILES,
+                        help="Do not save crawled text to the data folder (requires --index).")
+    args = parser.parse_args()
+    if not args.text_files and not args.index:
+        parser.error("--no-text-files needs --index, otherwise the crawl would not be stored anywhere.")
+    INCREMENTAL = args.incremental
+
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
-
-    # Setup Selenium to run a headless Chrome browser
-    chrome_options = Options()
-    chrome_options.add_argument("--headless=new")
-    driver = webdriver.Chrome(options=chrome_options)
+    crawl_state = CrawlState(CRAWL_STATE_FILE, DATA_DIR, write_files=args.text_files)
+    driver_pool = DriverPool(args.workers)
+    if args.index:
+        # Imported only here: the index stack (embedding model, FAISS) is not needed for a plain crawl
+        from utils.rag_utils import start_ingest
+        ingest = start_ingest(DATA_DIR, config.INDEX_DIR)
 
     try:
-        start_path = os.path.join(DUMMY_SITE_DIR, START_FILE)
-        files_to_scrape = [start_path]
-
-        # Loop until all discoverable pages have been scraped
-        while files_to_scrape:
-            current_file = files_to_scrape.pop(0)
-            newly_found_files = scrape_all_content(current_file, driver)
-            for f in newly_found_files:
-                if os.path.abspath(f) not in visited_files:
-                    files_to_scrape.append(f)
+        # PDF parsing is CPU-bound, so it runs in separate processes, off the browser workers
+        pdf_feeder = threading.Thread(target=feed_pdfs, name="pdf-feeder", daemon=True)
+        pdf_feeder.start()
+        with ProcessPoolExecutor() as pdf_executor:
+            crawl(os.path.join(DUMMY_SITE_DIR, START_FILE), driver_pool, args.workers)
+        finish_pdf_jobs(pdf_feeder)
 
         print(f"\nLocal scraping complete. Visited {len(visited_files)} files.")
+        print(f"Skipped {duplicate_pdf_count} duplicate PDF extractions.")
+
+        changes = crawl_state.finish(CHANGESET_FILE)
+        print(f"Changeset: {len(changes['changed'])} changed, {len(changes['deleted'])} deleted data files.")
+
+        if ingest is not None:
+            # Embedding already overlapped the crawl; this writes the index and consumes the changeset
+            vector_store, _ = ingest.finish(config.INDEX_SEARCH_PARAMS, config.INDEX_MMAP)
+            print(f"Index in {config.INDEX_DIR} is up to date ({vector_store.index.ntotal} chunks).")
 
     finally:
-        # Ensure the browser is always closed properly
-        driver.quit()
\ No newline at end of file
+        # Ensure the browsers are always closed properly
+        driver_pool.close()
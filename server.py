@@ -0,0 +1,173 @@
+"""
+Headless HTTP API for MyCampusBot, for the college portal and the WhatsApp gateway.
+
+    python server.py --port 8000
+
+POST /ask      {"question": "...", "mode": "Concise" | "Detailed", "stream": false, "tenant": "default"}
+               Returns {"answer", "source", "sources", "cached", "trace_id"}.
+               With "stream": true the reply is newline-delimited JSON: {"delta": "..."}
+               lines followed by a final {"done": true, ...} line.
+               Answers 429 with Retry-After when the LLM quota is saturated, 404 for an unknown tenant.
+GET  /health   Readiness, admission and per-tenant index/cache stats.
+GET  /metrics  Metrics in Prometheus text format.
+
+Each tenant (config.TENANTS) is served by the same `ChatCore` the Streamlit app uses;
+tenant indexes are loaded on their first question and evicted under TENANT_MEMORY_BUDGET_MB.
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import contextvars
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+import uvicorn
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from config import config
+from utils.chat_core import get_tenant_registry, RESPONSE_MODES
+from utils.admission import Overloaded
+from utils.trace_utils import start_trace, registry
+from utils.tenant_registry import UnknownTenant
+
+
+def answer_events(core, question, mode, tenant):
+    """
+    Generates the reply as events: {"delta": text} pieces, then one {"done": True, ...} summary.
+    The whole request is recorded as one trace.
+    """
+    with start_trace("api_ask", log_path=config.TRACE_LOG_PATH, mode=mode, tenant=tenant) as trace:
+        turn = core.prepare(question, mode)
+        trace.set(source=turn["source_type"], chunks=turn.get("chunks"))
+        cached = turn["source_type"] == "answer cache"
+        # Cached and fact-table answers are complete already
+        if turn["answer"] is not None:
+            yield {"delta": turn["answer"]}
+        else:
+            for piece in core.stream_answer(turn):
+                yield {"delta": piece}
+        yield {"done": True, "source": turn["source_type"], "sources": turn["sources"],
+               "cached": cached, "trace_id": trace.trace_id}
+
+
+class ContextIterator:
+    """
+    Drives a generator from worker threads inside one fixed contextvars context,
+    so spans opened in one step can be closed in the next, whichever thread runs it.
+    """
+
+    def __init__(self, generator):
+        self.generator = generator
+        self.context = contextvars.copy_context()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.context.run(next, self.generator)
+
+    def close(self):
+        self.context.run(self.generator.close)
+
+
+async def ask(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "Request body must be JSON."}, status_code=400)
+    if not isinstance(body, dict):
+        return JSONResponse({"error": "Request body must be a JSON object."}, status_code=400)
+
+    question = str(body.get("question", "")).strip()
+    mode = body.get("mode", "Concise")
+    tenant = body.get("tenant") or config.DEFAULT_TENANT
+    if not question:
+        return JSONResponse({"error": "'question' is required."}, status_code=400)
+    if len(question) > config.API_MAX_QUESTION_CHARS:
+        return JSONResponse({"error": f"'question' is longer than {config.API_MAX_QUESTION_CHARS} characters."}, status_code=413)
+    if mode not in RESPONSE_MODES:
+        return JSONResponse({"error": f"'mode' must be one of {', '.join(RESPONSE_MODES)}."}, status_code=400)
+
+    try:
+        # A tenant that is not resident is loaded here; concurrent requests for it share the load
+        core = await asyncio.to_thread(request.app.state.tenants.get, tenant)
+    except UnknownTenant:
+        return JSONResponse({"error": f"Unknown tenant '{tenant}'."}, status_code=404)
+    except Exception as e:
+        print(f"Error loading tenant '{tenant}': {e}")
+        return JSONResponse({"error": "Sorry, I encountered an error. Please try again."}, status_code=500)
+
+    events = ContextIterator(answer_events(core, question, mode, tenant))
+    try:
+        # Run up to the first piece of the answer, so retrieval and admission errors surface before replying
+        head = [await asyncio.to_thread(next, events)]
+    except Overloaded as e:
+        return JSONResponse({"error": str(e)}, status_code=429, headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        print(f"Error answering API request: {e}")
+        return JSONResponse({"error": "Sorry, I encountered an error. Please try again."}, status_code=500)
+
+    if body.get("stream"):
+        def ndjson():
+            try:
+                for event in head:
+                    yield json.dumps(event) + "\n"
+                for event in events:
+                    yield json.dumps(event) + "\n"
+            except Exception as e:
+                print(f"Error while streaming API response: {e}")
+                yield json.dumps({"error": "The answer was interrupted. Please try again."}) + "\n"
+            finally:
+                events.close()
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    try:
+        rest = await asyncio.to_thread(list, events)
+    except Exception as e:
+        print(f"Error answering API request: {e}")
+        return JSONResponse({"error": "Sorry, I encountered an error. Please try again."}, status_code=500)
+    events = head + rest
+    summary = events.pop()
+    answer = "".join(event["delta"] for event in events)
+    return JSONResponse({"answer": answer, **{key: value for key, value in summary.items() if key != "done"}})
+
+async def health(request):
+    tenants = request.app.state.tenants
+    report = tenants.stats()
+    admission = None
+    for tenant, tenant_stats in report["tenants"].items():
+        core = tenants.peek(tenant)
+        if core is not None:
+            tenant_stats["index_version"] = core.index_version
+            tenant_stats["answer_cache"] = core.answer_cache.stats()
+            # The admission controller is shared by all tenants
+            admission = core.admission.stats()
+    return JSONResponse({"status": "ok", "admission": admission, **report})
+
+async def metrics(request):
+    return PlainTextResponse(registry.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def create_app(tenants=None):
+    """Builds the API around a TenantRegistry of ChatCores (the process-wide one if not given)."""
+    app = Starlette(routes=[
+        Route("/ask", ask, methods=["POST"]),
+        Route("/health", health, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+    ])
+    app.state.tenants = tenants or get_tenant_registry()
+    # Load the default tenant and the model clients before the first request is accepted
+    if config.DEFAULT_TENANT in app.state.tenants.tenants:
+        app.state.tenants.get(config.DEFAULT_TENANT)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve MyCampusBot over HTTP.")
+    parser.add_argument("--host", default=config.API_HOST)
+    parser.add_argument("--port", type=int, default=config.API_PORT)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(), host=args.host, port=args.port)
@@ -0,0 +1,84 @@
+"""Tests for the LLM admission controller: concurrency, queueing, rate limit and shedding."""
+import os
+import sys
+import time
+import threading
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from utils.admission import AdmissionController, Overloaded
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_concurrency_limit_rejects_non_blocking_callers():
+    admission = AdmissionController(max_concurrent=2, requests_per_minute=0)
+    admission.acquire()
+    admission.acquire()
+    with pytest.raises(Overloaded, match="no free slot"):
+        admission.acquire(block=False)
+    admission.release()
+    admission.acquire(block=False)
+    assert admission.stats() == {"active": 2, "waiting": 0, "started_last_minute": 3, "rejected": 1}
+
+def test_queued_caller_gets_the_released_slot():
+    admission = AdmissionController(max_concurrent=1, requests_per_minute=0)
+    admission.acquire()
+    admitted = threading.Event()
+
+    def caller():
+        with admission.slot():
+            admitted.set()
+
+    thread = threading.Thread(target=caller)
+    thread.start()
+    wait_until(lambda: admission.stats()["waiting"] == 1)
+    assert not admitted.is_set()
+    admission.release()
+    thread.join(timeout=2)
+    assert admitted.is_set()
+    assert admission.stats()["active"] == 0
+
+def test_full_queue_is_shed_immediately():
+    admission = AdmissionController(max_concurrent=1, max_queue=0, requests_per_minute=0)
+    admission.acquire()
+    start = time.monotonic()
+    with pytest.raises(Overloaded, match="queue full"):
+        admission.acquire()
+    assert time.monotonic() - start < 0.5
+
+def test_queue_timeout():
+    admission = AdmissionController(max_concurrent=1, requests_per_minute=0, queue_timeout=0.1)
+    admission.acquire()
+    with pytest.raises(Overloaded, match="queue timeout"):
+        admission.acquire()
+    assert admission.stats()["waiting"] == 0
+
+def test_rate_limit_counts_calls_per_minute():
+    admission = AdmissionController(max_concurrent=4, requests_per_minute=2)
+    for _ in range(2):
+        with admission.slot():
+            pass
+    with pytest.raises(Overloaded) as excinfo:
+        admission.acquire(block=False)
+    # The oldest call frees up the budget in about a minute
+    assert 55 <= excinfo.value.retry_after <= 60
+
+def test_optional_work_needs_headroom():
+    admission = AdmissionController(max_concurrent=3, requests_per_minute=10)
+    # Leaves 8 calls of the minute's budget and a slot free
+    admission.acquire(spare=8)
+    with pytest.raises(Overloaded, match="No spare"):
+        admission.acquire(spare=9)
+    admission.acquire()
+    # Taking the last free slot is left to real questions
+    with pytest.raises(Overloaded, match="No spare"):
+        admission.acquire(spare=0)
+    # Optional work is never counted as rejected
+    assert admission.stats()["rejected"] == 0
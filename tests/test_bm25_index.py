@@ -0,0 +1,84 @@
+"""Tests for the BM25 lexical index and reciprocal-rank fusion."""
+import os
+import sys
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from utils.bm25_index import BM25Index, tokenize, query_terms, reciprocal_rank_fusion
+
+CHUNKS = {
+    "fees": "B.Sc. Computer Science: tuition fee ₹1,04,000 per year for 2024-2025.",
+    "library": "The library lends up to four books for fourteen days.",
+    "exams": "Semester examinations start on October 24, 2025. Hall tickets are issued a week before.",
+}
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    for chunk_id, text in CHUNKS.items():
+        index.add(chunk_id, text)
+    return index
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Thousands separators are dropped so amounts match however they are written
+    ("₹1,04,000", ["104000"]),
+    # Compound tokens are indexed whole and by their parts
+    ("2024-2025", ["2024-2025", "2024", "2025"]),
+    ("B.Sc.", ["b.sc", "b", "sc"]),
+])
+def test_tokenize(text, expected):
+    assert tokenize(text) == expected
+
+def test_query_terms_drop_stopwords():
+    assert query_terms("What is the fee for the library?") == ["fee", "library"]
+
+@pytest.mark.parametrize("query, expected", [
+    ("tuition fee 104000", "fees"),
+    ("2024", "fees"),
+    ("library books", "library"),
+    ("When do hall tickets come out?", "exams"),
+])
+def test_search_finds_exact_terms(index, query, expected):
+    assert index.search(query, k=1)[0][0] == expected
+
+def test_coverage_counts_matched_query_terms(index):
+    (chunk_id, _, coverage), = index.search("library parking", k=1)
+    assert chunk_id == "library" and coverage == 0.5
+    assert index.vocabulary_coverage("library parking") == 0.5
+
+def test_no_terms_no_hits(index):
+    assert index.search("what is the", k=3) == []
+    assert index.search("hostel", k=3) == []
+
+def test_remove_and_replace(index):
+    index.remove("library")
+    assert len(index) == 2
+    assert index.search("library", k=3) == []
+    assert "library" not in index.postings
+
+    index.add("exams", "Supplementary examinations are held in June.")
+    assert index.search("hall tickets", k=3) == []
+    assert index.search("supplementary", k=1)[0][0] == "exams"
+    assert index.total_length == sum(index.doc_lengths.values())
+
+def test_save_and_load_round_trip(index, tmp_path):
+    path = str(tmp_path / "bm25.json")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.search("tuition fee", k=3) == index.search("tuition fee", k=3)
+    # Removing works on a loaded index, whose per-chunk terms are rebuilt from the postings
+    loaded.remove("fees")
+    assert loaded.search("tuition", k=3) == []
+
+
+def test_rrf_rewards_agreement_between_lists():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "d"]], rrf_k=60)
+    assert [item_id for item_id, _ in fused] == ["b", "c", "a", "d"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+def test_rrf_of_one_list_keeps_its_order():
+    assert [item_id for item_id, _ in reciprocal_rank_fusion([["x", "y", "z"]])] == ["x", "y", "z"]
+    assert reciprocal_rank_fusion([[], []]) == []
@@ -0,0 +1,49 @@
+"""Regression tests for the fact fast path over the documents in data/."""
+import os
+import sys
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from config import config
+from utils.index_store import list_source_files, load_source_file
+from utils.fact_index import extract_facts, FactIndex
+
+
+@pytest.fixture(scope="module")
+def fact_index():
+    data_dir = os.path.join(ROOT_DIR, config.DATA_DIR)
+    documents = [doc for rel_path in list_source_files(data_dir)
+                 for doc in load_source_file(os.path.join(data_dir, rel_path))]
+    return FactIndex(extract_facts(documents), config.FACT_PROGRAM_ALIASES)
+
+
+@pytest.mark.parametrize("question", [
+    # "Semester Examination Starts" shares two words but is not the start of the semester
+    "When does the semester start?",
+    "When does the odd semester start?",
+    # Several holidays, not just Independence Day
+    "When is the holiday?",
+    # The table holds the 2024-2025 fees only
+    "what is the cs fee for 2026?",
+    # Application and admission fees are not in the table
+    "what is the fee to apply for cs",
+    "what is the admission fee for cs",
+    "What is the hostel fee for BBA?",
+])
+def test_falls_back_to_the_llm(fact_index, question):
+    assert fact_index.answer(question) is None
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What is the tuition fee for B.Sc. Computer Science?", "₹45,000"),
+    ("What is the exam fee for BBA?", "₹1,800"),
+    ("what is the cs fee for 2024-25", "₹45,000"),
+    ("When does the academic year commence?", "June 16, 2025"),
+    ("When do the semester examinations start?", "October 24, 2025"),
+    ("When is the convocation?", "September 27"),
+    ("Is October 2 a holiday?", "Gandhi Jayanthi"),
+])
+def test_answers_clear_fact_questions(fact_index, question, expected):
+    answer = fact_index.answer(question)
+    assert answer is not None and expected in answer[0]
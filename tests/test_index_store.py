@@ -0,0 +1,101 @@
+"""Tests for the incremental index sync: changed, deleted and duplicate files."""
+import os
+import sys
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from utils.index_store import sync_index, index_settings, load_manifest, RebuildRequired
+
+FILES = {
+    "fees.txt": "The tuition fee for B.Sc. Computer Science is 45,000 rupees per year.",
+    "library.txt": "The central library is open from 8 AM to 8 PM on weekdays.",
+    # Same text as fees.txt, e.g. a PDF and its extracted text
+    "fees_copy.txt": "The tuition fee for B.Sc. Computer Science is 45,000 rupees per year.",
+}
+
+
+class UnitEmbedding(DeterministicFakeEmbedding):
+    """Fake embedding with unit-length vectors, like the MiniLM model the index expects."""
+
+    def embed_documents(self, texts):
+        return [list(np.asarray(v) / np.linalg.norm(v)) for v in super().embed_documents(texts)]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    data_dir, index_dir = tmp_path / "data", tmp_path / "index"
+    data_dir.mkdir()
+    for name, text in FILES.items():
+        (data_dir / name).write_text(text, encoding="utf-8")
+    return str(data_dir), str(index_dir)
+
+def sync(data_dir, index_dir, allow_rebuild=True):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=20, add_start_index=True)
+    settings = index_settings("fake", 200, 20)
+    return sync_index(data_dir, index_dir, UnitEmbedding(size=32), splitter, settings,
+                      use_mmap=False, allow_rebuild=allow_rebuild)
+
+def top_source(vector_store, text):
+    doc = vector_store.similarity_search(text, k=1)[0]
+    return os.path.basename(doc.metadata["source"])
+
+def stored_chunk_ids(index_dir):
+    return {chunk_id for entry in load_manifest(index_dir)["files"].values() for chunk_id in entry["chunk_ids"]}
+
+
+def test_duplicate_file_is_indexed_once(dirs):
+    data_dir, index_dir = dirs
+    vector_store, _ = sync(data_dir, index_dir)
+    files = load_manifest(index_dir)["files"]
+    assert files["fees_copy.txt"]["duplicate_of"] == "fees.txt"
+    assert files["fees_copy.txt"]["chunk_ids"] == []
+    assert vector_store.index.ntotal == len(stored_chunk_ids(index_dir)) == 2
+
+def test_changed_file_is_updated_in_place(dirs):
+    data_dir, index_dir = dirs
+    sync(data_dir, index_dir)
+    old_ids = set(load_manifest(index_dir)["files"]["library.txt"]["chunk_ids"])
+    new_text = "The central library is open around the clock during exam weeks."
+    with open(os.path.join(data_dir, "library.txt"), "w", encoding="utf-8") as f:
+        f.write(new_text)
+
+    vector_store, lexical_index = sync(data_dir, index_dir, allow_rebuild=False)
+    new_ids = set(load_manifest(index_dir)["files"]["library.txt"]["chunk_ids"])
+    assert new_ids and not new_ids & old_ids
+    assert vector_store.index.ntotal == len(stored_chunk_ids(index_dir)) == 2
+    assert vector_store.similarity_search(new_text, k=1)[0].page_content == new_text
+    assert all(chunk_id not in vector_store.index_to_docstore_id.values() for chunk_id in old_ids)
+    assert [chunk_id for chunk_id, _, _ in lexical_index.search("clock exam weeks", 1)] == sorted(new_ids)
+
+def test_deleted_owner_hands_over_to_its_duplicate(dirs):
+    data_dir, index_dir = dirs
+    sync(data_dir, index_dir)
+    os.remove(os.path.join(data_dir, "fees.txt"))
+
+    vector_store, _ = sync(data_dir, index_dir)
+    files = load_manifest(index_dir)["files"]
+    assert sorted(files) == ["fees_copy.txt", "library.txt"]
+    assert "duplicate_of" not in files["fees_copy.txt"] and files["fees_copy.txt"]["chunk_ids"]
+    assert top_source(vector_store, FILES["fees_copy.txt"]) == "fees_copy.txt"
+
+def test_deleted_file_leaves_the_index(dirs):
+    data_dir, index_dir = dirs
+    sync(data_dir, index_dir)
+    os.remove(os.path.join(data_dir, "library.txt"))
+
+    vector_store, lexical_index = sync(data_dir, index_dir)
+    assert "library.txt" not in load_manifest(index_dir)["files"]
+    assert vector_store.index.ntotal == 1
+    assert lexical_index.search("central library weekdays", 5) == []
+
+def test_app_needs_a_built_index(dirs):
+    data_dir, index_dir = dirs
+    with pytest.raises(RebuildRequired):
+        sync(data_dir, index_dir, allow_rebuild=False)
@@ -0,0 +1,115 @@
+"""Tests for the per-campus registry: lazy loading, LRU eviction and stale reloads."""
+import os
+import sys
+import time
+import threading
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from utils.tenant_registry import TenantRegistry, UnknownTenant
+
+TENANTS = ("main", "engineering", "medical")
+
+
+class Loader:
+    """Counts loads per tenant; every load returns a fresh value."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.loads = []
+        self.lock = threading.Lock()
+
+    def __call__(self, tenant):
+        time.sleep(self.delay)
+        with self.lock:
+            self.loads.append(tenant)
+            return f"{tenant}-{self.loads.count(tenant)}"
+
+
+def make_registry(loader, memory_budget_mb=25, **kwargs):
+    # Every tenant takes 10 MB, so two of them fit the default budget
+    return TenantRegistry(TENANTS, loader, lambda tenant, value: 10.0, memory_budget_mb, **kwargs)
+
+
+def test_loads_lazily_and_once():
+    loader = Loader()
+    tenants = make_registry(loader)
+    assert loader.loads == []
+    assert tenants.get("main") == "main-1"
+    assert tenants.get("main") == "main-1"
+    assert loader.loads == ["main"]
+    stats = tenants.stats()["tenants"]["main"]
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+def test_unknown_tenant():
+    with pytest.raises(UnknownTenant):
+        make_registry(Loader()).get("law")
+
+def test_concurrent_first_requests_share_one_load():
+    loader = Loader(delay=0.1)
+    tenants = make_registry(loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(tenants.get("main"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loader.loads == ["main"]
+    assert results == ["main-1"] * 5
+
+def test_evicts_the_least_recently_used_tenant():
+    loader = Loader()
+    tenants = make_registry(loader)
+    tenants.get("main")
+    tenants.get("engineering")
+    tenants.get("main")             # engineering is now the least recently used
+    tenants.get("medical")
+    assert tenants.peek("engineering") is None
+    assert tenants.peek("main") == "main-1"
+    assert tenants.resident_mb() == 20.0
+    assert tenants.stats()["tenants"]["engineering"]["evictions"] == 1
+
+    # An evicted tenant is loaded again on its next request
+    assert tenants.get("engineering") == "engineering-2"
+    assert tenants.peek("main") is None
+
+def test_a_tenant_larger_than_the_budget_stays_loaded():
+    tenants = make_registry(Loader(), memory_budget_mb=5)
+    tenants.get("main")
+    tenants.get("engineering")
+    assert tenants.peek("main") is None
+    assert tenants.peek("engineering") == "engineering-1"
+
+def test_failed_load_is_retried():
+    attempts = []
+
+    def flaky(tenant):
+        attempts.append(tenant)
+        if len(attempts) == 1:
+            raise OSError("index missing")
+        return "loaded"
+
+    tenants = make_registry(flaky)
+    with pytest.raises(OSError):
+        tenants.get("main")
+    assert tenants.get("main") == "loaded"
+
+def test_stale_tenant_is_reloaded():
+    loader = Loader()
+    versions = {"main": 1}
+    tenants = make_registry(loader, stale_check_sec=0,
+                            is_stale=lambda tenant, value: not value.endswith(str(versions[tenant])))
+    assert tenants.get("main") == "main-1"
+    assert tenants.get("main") == "main-1"
+    versions["main"] = 2            # e.g. build_index.py rebuilt the campus index
+    assert tenants.get("main") == "main-2"
+    assert loader.loads == ["main", "main"]
+
+def test_staleness_is_checked_at_most_every_interval():
+    checks = []
+    tenants = make_registry(Loader(), stale_check_sec=60,
+                            is_stale=lambda tenant, value: checks.append(tenant) or True)
+    tenants.get("main")
+    tenants.get("main")
+    assert checks == []
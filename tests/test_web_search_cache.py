@@ -0,0 +1,83 @@
+"""Tests for the TTL cache in front of the web search."""
+import os
+import sys
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from config import config
+import utils.cache_utils as cache_utils
+from utils.cache_utils import TTLCache
+from utils.search_utils import perform_web_search, set_search_backend, SEARCH_ERROR_RESPONSE
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_utils.time, "time", clock)
+    return clock
+
+@pytest.fixture
+def searches():
+    """Replaces Tavily with a stub that records every query it is sent."""
+    queries = []
+
+    def backend(query):
+        queries.append(query)
+        if "fail" in query:
+            raise ConnectionError("network down")
+        return [{"content": f"result for {query}"}]
+
+    set_search_backend(backend)
+    yield queries
+    set_search_backend(None)
+
+
+def test_ttl_cache_expires_entries(clock):
+    cache = TTLCache(max_entries=4, ttl_seconds=60)
+    cache.set("q", "answer")
+    clock.now += 60
+    assert cache.get("q") == "answer"
+    clock.now += 1
+    assert cache.get("q") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 0}
+
+def test_ttl_cache_evicts_least_recently_used(clock):
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+def test_repeated_query_skips_the_network(searches, clock):
+    first = perform_web_search("Who won the 2024 Nobel Prize in Physics?")
+    # Normalized queries share one entry
+    second = perform_web_search("  who won the 2024 nobel prize in physics  ")
+    assert first == second
+    assert len(searches) == 1
+
+def test_cached_results_expire(searches, clock):
+    perform_web_search("weather in Chennai")
+    clock.now += config.WEB_SEARCH_CACHE_TTL_SEC + 1
+    perform_web_search("weather in Chennai")
+    assert len(searches) == 2
+
+def test_failed_search_is_not_cached(searches, clock):
+    assert perform_web_search("fail: latest news") == SEARCH_ERROR_RESPONSE
+    assert perform_web_search("fail: latest news") == SEARCH_ERROR_RESPONSE
+    assert len(searches) == 2
+
+def test_new_backend_clears_the_cache(searches, clock):
+    perform_web_search("bus timings")
+    set_search_backend(lambda query: [{"content": "other backend"}])
+    assert perform_web_search("bus timings") == "other backend"
@@ -0,0 +1,112 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from utils.trace_utils import registry
+
+
+class Overloaded(Exception):
+    """Raised when an LLM call is turned away; `retry_after` is a hint in seconds."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Guards the Groq quota: at most `max_concurrent` LLM calls run at once and at most
+    `requests_per_minute` start in any 60-second window. Up to `max_queue` callers wait
+    (for at most `queue_timeout` seconds) for a slot; anyone beyond that is rejected
+    straight away with `Overloaded` instead of piling up behind the quota.
+    """
+
+    def __init__(self, max_concurrent=4, max_queue=16, requests_per_minute=30, queue_timeout=15):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.requests_per_minute = requests_per_minute
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.started = deque()   # start times of the calls in the last minute
+        self.rejected = 0
+        self.condition = threading.Condition()
+
+    def _wait_time(self, now):
+        """0 if a call can start now, otherwise how long until the next slot might free up."""
+        while self.started and now - self.started[0] >= 60:
+            self.started.popleft()
+        if self.requests_per_minute and len(self.started) >= self.requests_per_minute:
+            return 60 - (now - self.started[0])
+        if self.active >= self.max_concurrent:
+            # Released by another caller; poll occasionally in case of a missed notify
+            return 1.0
+        return 0
+
+    def _reject(self, reason, retry_after):
+        self.rejected += 1
+        registry.inc("rag_admission_total", result="rejected", reason=reason)
+        raise Overloaded(f"The assistant is busy ({reason}), please try again shortly.", retry_after=max(1, round(retry_after)))
+
+    def _has_headroom(self, now, spare):
+        """True if a call can start now and still leave `spare` calls of the minute's budget and a slot free."""
+        if self._wait_time(now) or self.waiting or self.active + 1 >= self.max_concurrent:
+            return False
+        return not self.requests_per_minute or len(self.started) + 1 + spare <= self.requests_per_minute
+
+    def acquire(self, block=True, spare=None):
+        """
+        Takes a slot for one LLM call, waiting in the queue if allowed. Raises Overloaded.
+        With `spare` (optional work such as speculative answers) the call never waits and
+        only starts if nobody is queued and `spare` calls of the minute's budget plus one
+        concurrent slot stay free for real questions.
+        """
+        start = time.perf_counter()
+        with self.condition:
+            if spare is not None and not self._has_headroom(time.monotonic(), spare):
+                registry.inc("rag_admission_total", result="skipped", reason="no headroom")
+                raise Overloaded("No spare LLM capacity for optional work.")
+            wait = self._wait_time(time.monotonic())
+            if wait:
+                if not block:
+                    self._reject("no free slot", wait)
+                if self.waiting >= self.max_queue:
+                    self._reject("queue full", wait)
+                self.waiting += 1
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while wait:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject("queue timeout", wait)
+                        self.condition.wait(min(wait, remaining))
+                        wait = self._wait_time(time.monotonic())
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self.started.append(time.monotonic())
+        registry.inc("rag_admission_total", result="admitted", reason="")
+        registry.observe("rag_admission_wait_seconds", time.perf_counter() - start)
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    @contextmanager
+    def slot(self, block=True):
+        """Holds a slot for the duration of the block."""
+        self.acquire(block=block)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self.condition:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "started_last_minute": len(self.started),
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,279 @@
+import os
+import json
+import mmap
+import math
+from collections.abc import Mapping
+import numpy as np
+import faiss
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+INDEX_FILE = "index.faiss"
+# One JSON record per chunk, in FAISS row order
+DOCSTORE_FILE = "docstore.jsonl"
+# Byte offset of every record (n + 1 entries, the last one is the file size)
+OFFSETS_FILE = "docstore_offsets.npy"
+# Chunk ID of every FAISS row, plus a sorted copy for ID lookups by binary search
+IDS_FILE = "docstore_ids.npy"
+SORTED_IDS_FILE = "docstore_sorted_ids.npy"
+SORTED_ROWS_FILE = "docstore_sorted_rows.npy"
+# Chunk IDs are SHA-256 hex digests
+ID_LENGTH = 64
+STORE_FILES = (INDEX_FILE, DOCSTORE_FILE, OFFSETS_FILE, IDS_FILE, SORTED_IDS_FILE, SORTED_ROWS_FILE)
+# Vectors are stored as the embedding model returns them; query vectors must not be re-normalized either
+NORMALIZE_L2 = False
+
+# k-means wants about this many training points per centroid
+TRAINING_POINTS_PER_CENTROID = 39
+MAX_TRAINING_POINTS = 200_000
+# Vectors fetched and added to the index per step while building or updating it
+ADD_BATCH_SIZE = 4096
+
+
+def ivf_nlist(n_vectors, nlist=None):
+    """Number of IVF lists: the configured value, or about 4 * sqrt(n) by default."""
+    return nlist or max(1, int(4 * math.sqrt(n_vectors)))
+
+def _batches(rows, size=ADD_BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def create_index(n_vectors, vectors_of, index_type="flat", params=None):
+    """
+    Builds a FAISS index over n (normalized) vectors without holding them all at once.
+    `vectors_of(rows)` returns the float32 vectors of the given rows (0..n-1), which
+    are fetched and added in batches; row numbers are the index's labels.
+    "flat" is exact; "hnsw" is a graph index (params: m, ef_construction);
+    "ivfpq" clusters and compresses the vectors (params: nlist, pq_m, pq_nbits).
+    Flat and HNSW are wrapped in an IndexIDMap; IVF stores the labels itself.
+    IVF-PQ falls back to flat when there are too few vectors to train it.
+    """
+    params = params or {}
+    dim = np.asarray(vectors_of(np.arange(1)), dtype=np.float32).shape[1]
+
+    if index_type == "hnsw":
+        graph = faiss.IndexHNSWFlat(dim, params.get("m", 32))
+        graph.hnsw.efConstruction = params.get("ef_construction", 200)
+        index = faiss.IndexIDMap(graph)
+    elif index_type == "ivfpq":
+        nlist = ivf_nlist(n_vectors, params.get("nlist"))
+        nbits = params.get("pq_nbits", 8)
+        needed = TRAINING_POINTS_PER_CENTROID * max(nlist, 2 ** nbits)
+        if n_vectors < needed:
+            print(f"  [Index] IVF-PQ needs at least {needed} chunks to train, using a flat index for {n_vectors}.")
+            return create_index(n_vectors, vectors_of, "flat")
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, params.get("pq_m", 48), nbits)
+        sample = np.arange(n_vectors)
+        if n_vectors > MAX_TRAINING_POINTS:
+            sample = np.sort(np.random.default_rng(0).choice(n_vectors, MAX_TRAINING_POINTS, replace=False))
+        training = np.empty((len(sample), dim), dtype=np.float32)
+        for start in range(0, len(sample), ADD_BATCH_SIZE):
+            rows = sample[start:start + ADD_BATCH_SIZE]
+            training[start:start + len(rows)] = vectors_of(rows)
+        index.train(training)
+        del training
+    elif index_type == "flat":
+        index = faiss.IndexIDMap(faiss.IndexFlatL2(dim))
+    else:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}.")
+
+    for rows in _batches(np.arange(n_vectors, dtype=np.int64)):
+        index.add_with_ids(np.ascontiguousarray(vectors_of(rows), dtype=np.float32), rows)
+    return index
+
+def base_index(index):
+    """The index inside an IndexIDMap, or the index itself."""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+def index_kind(index):
+    """"flat", "hnsw" or "ivfpq", whatever the index is wrapped in."""
+    index = base_index(index)
+    if hasattr(index, "hnsw"):
+        return "hnsw"
+    if hasattr(index, "nprobe"):
+        return "ivfpq"
+    return "flat"
+
+def apply_search_params(index, params=None):
+    """Sets query-time knobs: ef_search for HNSW, nprobe for IVF."""
+    params = params or {}
+    # Keep the wrapper alive while its inner index is configured
+    wrapper, index = index, base_index(index)
+    if hasattr(index, "hnsw") and params.get("ef_search"):
+        index.hnsw.efSearch = params["ef_search"]
+    if hasattr(index, "nprobe") and params.get("nprobe"):
+        index.nprobe = params["nprobe"]
+    return wrapper
+
+
+class DiskDocstore(Docstore):
+    """
+    Read-only chunk store kept on disk: records are read straight from a
+    memory-mapped JSON-lines file through a memory-mapped offset table, so the
+    process only holds the pages it actually touches.
+    Every record has a row (its FAISS label). Rows of removed chunks stay in the
+    file until the next full rebuild but are left out of the sorted ID tables.
+    """
+
+    def __init__(self, store_dir, use_mmap=True):
+        mmap_mode = "r" if use_mmap else None
+        self.offsets = np.load(os.path.join(store_dir, OFFSETS_FILE), mmap_mode=mmap_mode)
+        self.ids = np.load(os.path.join(store_dir, IDS_FILE), mmap_mode=mmap_mode)
+        self.sorted_ids = np.load(os.path.join(store_dir, SORTED_IDS_FILE), mmap_mode=mmap_mode)
+        self.sorted_rows = np.load(os.path.join(store_dir, SORTED_ROWS_FILE), mmap_mode=mmap_mode)
+        with open(os.path.join(store_dir, DOCSTORE_FILE), "rb") as f:
+            # Slicing an mmap is safe from several threads, unlike seek + read on a shared file
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.sorted_ids)
+
+    def dead_rows(self):
+        """Rows whose chunk was removed by an in-place update."""
+        return len(self.ids) - len(self.sorted_ids)
+
+    def row(self, i):
+        """The chunk stored at FAISS row i."""
+        record = json.loads(self.data[int(self.offsets[i]):int(self.offsets[i + 1])])
+        return Document(id=record["id"], page_content=record["text"], metadata=record["metadata"])
+
+    def row_of(self, chunk_id):
+        """FAISS row of a chunk ID, or None."""
+        key = chunk_id.encode("ascii")
+        i = int(np.searchsorted(self.sorted_ids, key))
+        if i < len(self.sorted_ids) and self.sorted_ids[i] == key:
+            return int(self.sorted_rows[i])
+        return None
+
+    def search(self, search):
+        row = self.row_of(search)
+        if row is None:
+            return f"ID {search} not found."
+        return self.row(row)
+
+    def add(self, texts):
+        raise NotImplementedError("DiskDocstore is read-only; rebuild the index to change it.")
+
+    def delete(self, ids):
+        raise NotImplementedError("DiskDocstore is read-only; rebuild the index to change it.")
+
+
+class RowIds(Mapping):
+    """
+    FAISS row -> chunk ID, read from the memory-mapped ID table instead of a dict.
+    Iterating yields only the rows of chunks still in the index.
+    """
+
+    def __init__(self, ids, live_rows):
+        self.ids = ids
+        self.live_rows = live_rows
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self.ids):
+            raise KeyError(row)
+        return self.ids[row].decode("ascii")
+
+    def __iter__(self):
+        return (int(row) for row in np.sort(self.live_rows))
+
+    def __len__(self):
+        return len(self.live_rows)
+
+
+def _replace_npy(path, array):
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+def _write_records(f, docs, ids, offsets):
+    for chunk_id, doc in zip(ids, docs):
+        line = json.dumps({"id": chunk_id, "text": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False)
+        f.write(line.encode("utf-8") + b"\n")
+        offsets.append(f.tell())
+
+def _id_array(ids):
+    return np.array([chunk_id.encode("ascii") for chunk_id in ids], dtype=f"S{ID_LENGTH}")
+
+def _save_tables(store_dir, offsets, id_array, sorted_ids, sorted_rows, index):
+    _replace_npy(os.path.join(store_dir, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+    _replace_npy(os.path.join(store_dir, IDS_FILE), id_array)
+    _replace_npy(os.path.join(store_dir, SORTED_IDS_FILE), sorted_ids)
+    _replace_npy(os.path.join(store_dir, SORTED_ROWS_FILE), sorted_rows.astype(np.int64))
+
+    tmp_path = os.path.join(store_dir, INDEX_FILE + ".tmp")
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, os.path.join(store_dir, INDEX_FILE))
+
+def save_store(store_dir, index, docs, ids):
+    """Writes the FAISS index and the on-disk docstore; docs[i] and ids[i] belong to FAISS row i."""
+    os.makedirs(store_dir, exist_ok=True)
+    offsets = [0]
+    tmp_path = os.path.join(store_dir, DOCSTORE_FILE + ".tmp")
+    with open(tmp_path, "wb") as f:
+        _write_records(f, docs, ids, offsets)
+    os.replace(tmp_path, os.path.join(store_dir, DOCSTORE_FILE))
+
+    id_array = _id_array(ids)
+    order = np.argsort(id_array, kind="stable")
+    _save_tables(store_dir, offsets, id_array, id_array[order], order, index)
+
+def update_store(store_dir, remove_ids, docs, ids, vectors_of):
+    """
+    Applies chunk removals and additions to a saved flat index in place.
+    Removed chunks are dropped from the FAISS index and the sorted ID tables; their
+    records stay in the docstore file as dead rows until the next full rebuild.
+    The new chunks (docs[i] with ids[i], `vectors_of(positions)` returning their
+    float32 vectors) are appended as new rows. Returns the number of dead rows.
+    """
+    index = faiss.read_index(os.path.join(store_dir, INDEX_FILE))
+    if index_kind(index) != "flat":
+        raise ValueError(f"Only flat indexes are updated in place, not {index_kind(index)}.")
+    offsets = list(np.load(os.path.join(store_dir, OFFSETS_FILE)))
+    id_array = np.load(os.path.join(store_dir, IDS_FILE))
+    sorted_ids = np.load(os.path.join(store_dir, SORTED_IDS_FILE))
+    sorted_rows = np.load(os.path.join(store_dir, SORTED_ROWS_FILE))
+
+    # A chunk that is added while still stored (e.g. after an interrupted update) replaces its old row
+    drop = np.isin(sorted_ids, _id_array(list(remove_ids) + list(ids)))
+    if drop.any():
+        index.remove_ids(sorted_rows[drop].astype(np.int64))
+    sorted_ids, sorted_rows = sorted_ids[~drop], sorted_rows[~drop]
+
+    first_row = len(id_array)
+    with open(os.path.join(store_dir, DOCSTORE_FILE), "r+b") as f:
+        # Anything past the last recorded offset is left over from an interrupted update
+        f.seek(int(offsets[-1]))
+        f.truncate()
+        _write_records(f, docs, ids, offsets)
+    new_rows = np.arange(first_row, first_row + len(ids), dtype=np.int64)
+    for positions in _batches(np.arange(len(ids))):
+        index.add_with_ids(np.ascontiguousarray(vectors_of(positions), dtype=np.float32), new_rows[positions])
+
+    new_ids = _id_array(ids)
+    id_array = np.concatenate([id_array, new_ids])
+    sorted_ids = np.concatenate([sorted_ids, new_ids])
+    sorted_rows = np.concatenate([sorted_rows, new_rows])
+    order = np.argsort(sorted_ids, kind="stable")
+    _save_tables(store_dir, offsets, id_array, sorted_ids[order], sorted_rows[order], index)
+    return len(id_array) - len(sorted_ids)
+
+def store_exists(store_dir):
+    return all(os.path.exists(os.path.join(store_dir, name)) for name in STORE_FILES)
+
+def load_store(store_dir, embedding_model, use_mmap=True, search_params=None):
+    """
+    Opens a saved index as a LangChain FAISS vector store.
+    With `use_mmap` the index and the docstore are memory-mapped rather than read
+    into RAM, so memory use does not grow with the size of the corpus.
+    """
+    flags = 0
+    if use_mmap:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+    index = apply_search_params(faiss.read_index(os.path.join(store_dir, INDEX_FILE), flags), search_params)
+    docstore = DiskDocstore(store_dir, use_mmap)
+    return FAISS(embedding_model, index, docstore, RowIds(docstore.ids, docstore.sorted_rows), normalize_L2=NORMALIZE_L2)
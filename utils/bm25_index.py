@@ -0,0 +1,145 @@
+import os
+import re
+import json
+import math
+import unicodedata
+from collections import Counter
+
+# Words, numbers and codes; separators inside a token ("45,000", "2024-2025", "b.sc") are kept together
+TOKEN_PATTERN = re.compile(r"\w+(?:[.,/-]\w+)*")
+SPLIT_PATTERN = re.compile(r"[./-]")
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "what", "when", "where", "which", "who",
+    "how", "do", "does", "did", "can", "could", "i", "me", "my", "we", "our", "you", "your",
+    "of", "for", "to", "in", "on", "at", "and", "or", "about", "tell", "please", "there", "it",
+}
+
+
+def tokenize(text):
+    """
+    Lowercases and splits text into lexical tokens.
+    Thousands separators are dropped so "1,04,000" matches "104000", and compound
+    tokens like "2024-2025" are indexed both whole and by their parts.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text):
+        token = token.replace(",", "")
+        tokens.append(token)
+        parts = [part for part in SPLIT_PATTERN.split(token) if part]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+def query_terms(query):
+    """Distinct query tokens without stopwords."""
+    return sorted({token for token in tokenize(query) if token not in STOPWORDS})
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index of chunk IDs.
+    Chunks can be added and removed one at a time, and the postings are
+    persisted as JSON next to the FAISS index.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}      # term -> {chunk_id: term frequency}
+        self.doc_lengths = {}   # chunk_id -> number of tokens
+        self.doc_terms = {}     # chunk_id -> terms, so a chunk can be removed without a full scan
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, chunk_id, text):
+        """Indexes one chunk (replacing it if it was already indexed)."""
+        if chunk_id in self.doc_lengths:
+            self.remove(chunk_id)
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[chunk_id] = tf
+        self.doc_terms[chunk_id] = list(counts)
+        self.doc_lengths[chunk_id] = sum(counts.values())
+        self.total_length += self.doc_lengths[chunk_id]
+
+    def remove(self, chunk_id):
+        """Removes one chunk from the index, if present."""
+        if chunk_id not in self.doc_lengths:
+            return
+        for term in self.doc_terms.pop(chunk_id):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(chunk_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(chunk_id)
+
+    def search(self, query, k=5):
+        """
+        Returns up to k (chunk_id, score, coverage) tuples, best first.
+        Coverage is the fraction of the query's terms that occur in the chunk.
+        """
+        terms = query_terms(query)
+        if not terms or not self.doc_lengths:
+            return []
+
+        n_docs = len(self.doc_lengths)
+        avg_length = self.total_length / n_docs
+        scores, matched = Counter(), Counter()
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for chunk_id, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[chunk_id] / avg_length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[chunk_id] += 1
+
+        return [(chunk_id, score, matched[chunk_id] / len(terms)) for chunk_id, score in scores.most_common(k)]
+
+    def vocabulary_coverage(self, query):
+        """Fraction of the query's terms that occur anywhere in the index (1.0 for an empty query)."""
+        terms = query_terms(query)
+        if not terms:
+            return 1.0
+        return sum(1 for term in terms if term in self.postings) / len(terms)
+
+    def save(self, path):
+        """Writes the postings and chunk lengths atomically."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "postings": self.postings, "doc_lengths": self.doc_lengths}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads an index written by `save`."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.postings = data["postings"]
+        index.doc_lengths = data["doc_lengths"]
+        index.total_length = sum(index.doc_lengths.values())
+        index.doc_terms = {chunk_id: [] for chunk_id in index.doc_lengths}
+        for term, posting in index.postings.items():
+            for chunk_id in posting:
+                index.doc_terms[chunk_id].append(term)
+        return index
+
+
+def reciprocal_rank_fusion(ranked_lists, rrf_k=60):
+    """
+    Fuses several ranked lists of IDs into one ranking.
+    Each ID scores sum(1 / (rrf_k + rank)) over the lists it appears in.
+    Returns [(id, fused_score), ...] best first.
+    """
+    fused = Counter()
+    for ranked in ranked_lists:
+        for rank, item_id in enumerate(ranked, start=1):
+            fused[item_id] += 1.0 / (rrf_k + rank)
+    return fused.most_common()
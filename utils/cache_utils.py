@@ -0,0 +1,144 @@
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from utils.dedup_utils import normalize_text
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of final answers keyed by question meaning.
+    A question whose embedding is at least `threshold` cosine-similar to a stored
+    question (asked in the same response mode) gets the stored answer back.
+    Entries are evicted least-recently-used beyond `max_entries` and expire after
+    `ttl_seconds`. The whole cache is dropped when the index version changes.
+    """
+
+    def __init__(self, embedding_model, threshold=0.92, max_entries=1000, ttl_seconds=6 * 3600):
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.index_version = None
+        self.entries = OrderedDict()
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def set_index_version(self, version):
+        """Invalidates every cached answer when the document index changed."""
+        with self.lock:
+            if version != self.index_version:
+                if self.entries:
+                    print(f"  [Answer Cache] Index changed, dropping {len(self.entries)} cached answers.")
+                self.entries.clear()
+                self.index_version = version
+
+    def _embed(self, question):
+        return np.asarray(self.embedding_model.embed_query(question), dtype=np.float32)
+
+    def _drop_expired(self, now):
+        expired = [key for key, entry in self.entries.items() if now - entry["created"] > self.ttl_seconds]
+        for key in expired:
+            del self.entries[key]
+        self.evictions += len(expired)
+
+    def lookup(self, question, mode):
+        """
+        Returns (answer, query_vector) where answer is None on a miss.
+        The vector can be passed back to `store` to avoid embedding twice.
+        """
+        normalized = normalize_text(question)
+        with self.lock:
+            self._drop_expired(time.time())
+            # Exact repeats are answered without embedding the question at all
+            for key, entry in self.entries.items():
+                if entry["mode"] == mode and entry["normalized"] == normalized:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry["answer"], entry["vector"]
+
+        vector = self._embed(question)
+        with self.lock:
+            candidates = [(key, entry) for key, entry in self.entries.items() if entry["mode"] == mode]
+            if candidates:
+                # Embeddings are normalized, so the dot product is the cosine similarity
+                scores = np.stack([entry["vector"] for _, entry in candidates]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key, entry = candidates[best]
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry["answer"], vector
+            self.misses += 1
+        return None, vector
+
+    def store(self, question, mode, answer, vector=None):
+        """Caches the final answer for a question in the given response mode."""
+        if vector is None:
+            vector = self._embed(question)
+        with self.lock:
+            self.entries[self.next_id] = {
+                "normalized": normalize_text(question),
+                "mode": mode,
+                "answer": answer,
+                "vector": vector,
+                "created": time.time(),
+            }
+            self.next_id += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Hit/miss counters for monitoring."""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self.entries),
+                "evictions": self.evictions,
+            }
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl_seconds`."""
+
+    def __init__(self, max_entries=256, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value, or None if it is missing or expired."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.time() - entry[1] > self.ttl_seconds:
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
@@ -0,0 +1,293 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+from langchain_core.messages import HumanMessage, SystemMessage
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import config
+from models.llm import get_chatgroq_model
+from models.embeddings import get_embedding_model, MicroBatchingEmbeddings
+from utils.rag_utils import setup_rag_pipeline, query_rag_pipeline, is_likely_miss
+from utils.search_utils import perform_web_search, speculative_retrieve, SEARCH_ERROR_RESPONSE
+from utils.index_store import index_version, resident_size_mb
+from utils.cache_utils import SemanticAnswerCache
+from utils.dedup_utils import normalize_text
+from utils.fact_index import load_fact_index
+from utils.admission import AdmissionController, Overloaded
+from utils.context_utils import build_context, build_prompt, SYSTEM_PROMPT, SYSTEM_PROMPT_TEMPLATE, RESPONSE_MODES
+from utils.trace_utils import span
+from utils.tenant_registry import TenantRegistry
+
+# Answers for the other response mode are generated here, off the request path
+_speculation_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculative-answer")
+
+
+class ChatCore:
+    """
+    Everything needed to answer a tenant's questions, shared by the Streamlit UI and
+    the HTTP API. `prepare` runs the answer cache, retrieval and web fallback;
+    `stream_answer` generates the answer under admission control.
+    Safe to use from several threads at once.
+    """
+
+    def __init__(self, retriever, chat_model, answer_cache, admission, version=None, system_prompt=SYSTEM_PROMPT,
+                 fact_index=None):
+        self.retriever = retriever
+        self.fact_index = fact_index
+        self.chat_model = chat_model
+        self.answer_cache = answer_cache
+        self.admission = admission
+        self.index_version = version
+        self.system_prompt = system_prompt
+        # Answers cached against an older version of the campus documents are dropped
+        self.answer_cache.set_index_version(version)
+        # (normalized question, mode) -> Future of an answer being generated in the background
+        self.speculations = {}
+        self.speculations_lock = threading.Lock()
+
+    def prepare(self, question, mode, retrieval_store=None):
+        """
+        Everything before generation. Returns a turn dict; its "answer" is already set
+        when the question was answered from the cache, otherwise "messages" holds the prompt.
+        `retrieval_store` (e.g. one TTLCache per chat session) keeps the retrieved context,
+        so asking the same question again, in either mode, only re-runs generation.
+        """
+        with self.speculations_lock:
+            pending = self.speculations.get((normalize_text(question), mode))
+        if pending is not None:
+            # The answer for this mode is already being generated in the background
+            with span("speculation_wait") as stage:
+                try:
+                    pending.result(timeout=config.SPECULATION_WAIT_SEC)
+                except FutureTimeout:
+                    stage.set(timed_out=True)
+        return self._prepare(question, mode, retrieval_store)
+
+    def retrieve(self, question, retrieval_store=None):
+        """
+        Campus chunks for the question, or the web search context when there are none.
+        Returns (relevant_docs, web_context); reuses a stored result for the same
+        question and index version.
+        """
+        key = (normalize_text(question), self.index_version)
+        stored = retrieval_store.get(key) if retrieval_store is not None else None
+        with span("retrieval_store") as stage:
+            stage.set(cache_hit=stored is not None)
+        if stored is not None:
+            return stored
+
+        # --- RAG + Web Search Fallback Logic ---
+        # For questions that look off-campus, the web search starts alongside retrieval
+        web_context = None
+        if config.SPECULATIVE_WEB_SEARCH and is_likely_miss(self.retriever, question):
+            relevant_docs, web_context = speculative_retrieve(
+                lambda query: query_rag_pipeline(self.retriever, query), question
+            )
+        else:
+            relevant_docs = query_rag_pipeline(self.retriever, question)
+        if not relevant_docs and web_context is None:
+            web_context = perform_web_search(question)
+        # --- End of Fallback Logic ---
+
+        # A failed web search is not kept, so the next attempt tries again
+        if retrieval_store is not None and web_context != SEARCH_ERROR_RESPONSE:
+            retrieval_store.set(key, (relevant_docs, web_context))
+        return relevant_docs, web_context
+
+    def _prepare(self, question, mode, retrieval_store=None):
+        with span("answer_cache") as stage:
+            cached_answer, query_vector = self.answer_cache.lookup(question, mode)
+            stage.set(cache_hit=cached_answer is not None)
+        turn = {
+            "question": question,
+            "mode": mode,
+            "answer": cached_answer,
+            "query_vector": query_vector,
+            "source_type": "answer cache" if cached_answer is not None else None,
+            "sources": [],
+            "messages": None,
+        }
+        if cached_answer is not None:
+            return turn
+
+        # Clear fee, eligibility and calendar questions are answered from the fact table, without the LLM
+        if self.fact_index is not None and config.FACT_FAST_PATH:
+            with span("fact_lookup") as stage:
+                fact_answer = self.fact_index.answer(question)
+                stage.set(hit=fact_answer is not None)
+            if fact_answer is not None:
+                turn["answer"], turn["sources"] = fact_answer
+                turn["source_type"] = "fact index"
+                return turn
+
+        relevant_docs, web_context = self.retrieve(question, retrieval_store)
+        if relevant_docs:
+            # Overlapping chunks are merged and near-duplicates dropped to fit the mode's token budget
+            with span("context_build") as stage:
+                context, turn["sources"], stats = build_context(
+                    relevant_docs,
+                    self.retriever.vector_store.embedding_function,
+                    token_budget=config.CONTEXT_TOKEN_BUDGET[mode],
+                    mmr_lambda=config.CONTEXT_MMR_LAMBDA,
+                )
+                stage.set(**stats)
+            source_type = "campus documents"
+        else:
+            context = web_context
+            source_type = "web search results"
+
+        # We don't include the full history for this turn to keep the context clean
+        turn["source_type"] = source_type
+        turn["chunks"] = len(relevant_docs)
+        turn["messages"] = [
+            SystemMessage(content=self.system_prompt),
+            HumanMessage(content=build_prompt(question, context, source_type, mode)),
+        ]
+        return turn
+
+    def stream_answer(self, turn, block=True, spare=None):
+        """
+        Yields the answer text as it is generated for a prepared turn.
+        The first `next()` takes an admission slot and raises `Overloaded` if none is available
+        (`spare` marks optional work, see AdmissionController.acquire).
+        A completed answer is stored in the answer cache.
+        """
+        self.admission.acquire(block=block, spare=spare)
+        try:
+            with span("generation") as stage:
+                parts = []
+                usage = None
+                for chunk in self.chat_model.stream(turn["messages"]):
+                    # Groq reports token usage on the final chunk
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        yield chunk.content
+                stage.set(
+                    input_tokens=usage["input_tokens"] if usage else None,
+                    # Without usage metadata, each streamed chunk is roughly one token
+                    output_tokens=usage["output_tokens"] if usage else len(parts),
+                )
+        finally:
+            self.admission.release()
+
+        if parts:
+            self.answer_cache.store(turn["question"], turn["mode"], "".join(parts), turn["query_vector"])
+
+    def speculate(self, question, mode, retrieval_store=None):
+        """
+        Generates the answer for `mode` in the background and stores it in the answer cache,
+        so switching to that mode is answered instantly. Only runs when the LLM has headroom:
+        it is skipped unless SPECULATION_SPARE_RPM calls of the rate limit and a slot stay free
+        for real questions. Returns the Future, or None if already running.
+        """
+        key = (normalize_text(question), mode)
+        with self.speculations_lock:
+            if key in self.speculations:
+                return None
+
+            def generate():
+                try:
+                    turn = self._prepare(question, mode, retrieval_store)
+                    if turn["answer"] is None:
+                        for _ in self.stream_answer(turn, block=False, spare=config.SPECULATION_SPARE_RPM):
+                            pass
+                except Overloaded:
+                    print(f"Skipped speculative {mode} answer, the model is busy.")
+                except Exception as e:
+                    print(f"Speculative {mode} answer failed: {e}")
+                finally:
+                    with self.speculations_lock:
+                        self.speculations.pop(key, None)
+
+            future = self.speculations[key] = _speculation_executor.submit(generate)
+        return future
+
+    def answer(self, question, mode):
+        """Blocking convenience wrapper: returns the prepared turn with its full answer."""
+        turn = self.prepare(question, mode)
+        if turn["answer"] is None:
+            turn["answer"] = "".join(self.stream_answer(turn))
+        return turn
+
+
+_shared_clients_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _load_shared_clients():
+    # Concurrent questions are embedded in micro-batches rather than one model call each
+    embedding_model = MicroBatchingEmbeddings(
+        get_embedding_model(),
+        window_ms=config.EMBEDDING_BATCH_WINDOW_MS,
+        max_batch=config.EMBEDDING_MAX_QUERY_BATCH,
+    )
+    admission = AdmissionController(
+        max_concurrent=config.LLM_MAX_CONCURRENT,
+        max_queue=config.LLM_MAX_QUEUE,
+        requests_per_minute=config.LLM_REQUESTS_PER_MINUTE,
+        queue_timeout=config.LLM_QUEUE_TIMEOUT_SEC,
+    )
+    return embedding_model, admission, get_chatgroq_model()
+
+def get_shared_clients():
+    """The embedding model, admission controller and Groq client, loaded once and shared by all tenants."""
+    # The background warm-up and the first question may get here at the same time; only one loads the model
+    with _shared_clients_lock:
+        return _load_shared_clients()
+
+def warm_embedding_model():
+    """Loads the shared clients and runs one query through the embedding model."""
+    embedding_model, _, _ = get_shared_clients()
+    embedding_model.embed_query("When does the semester start?")
+
+def load_tenant_core(tenant):
+    """Loads one tenant's index and answer cache on top of the shared clients."""
+    settings = config.TENANTS[tenant]
+    embedding_model, admission, chat_model = get_shared_clients()
+    retriever = setup_rag_pipeline(
+        settings["data_dir"], settings["index_dir"], llm=chat_model, embedding_model=embedding_model, admission=admission
+    )
+    # Each tenant has its own answer cache, so answers never leak between campuses
+    answer_cache = SemanticAnswerCache(
+        embedding_model,
+        threshold=config.ANSWER_CACHE_THRESHOLD,
+        max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=config.ANSWER_CACHE_TTL_SEC,
+    )
+    return ChatCore(
+        retriever, chat_model, answer_cache, admission,
+        version=index_version(settings["index_dir"]),
+        system_prompt=SYSTEM_PROMPT_TEMPLATE.format(institution=settings["name"]),
+        fact_index=load_fact_index(settings["index_dir"], config.FACT_PROGRAM_ALIASES),
+    )
+
+def tenant_core_is_stale(tenant, core):
+    """
+    True if the tenant's index was rebuilt since its core was loaded, e.g. by
+    `scraper.py --index` or `build_index.py` in another process. The old core's
+    cached answers are dropped at once, so requests still holding it stop serving them.
+    """
+    version = index_version(config.TENANTS[tenant]["index_dir"])
+    if version is None or version == core.index_version:
+        return False
+    core.answer_cache.set_index_version(version)
+    return True
+
+@lru_cache(maxsize=None)
+def get_tenant_registry():
+    """The process-wide registry of tenant cores, loaded lazily and evicted under the memory budget."""
+    return TenantRegistry(
+        config.TENANTS,
+        loader=load_tenant_core,
+        size_of=lambda tenant, core: resident_size_mb(config.TENANTS[tenant]["index_dir"]),
+        memory_budget_mb=config.TENANT_MEMORY_BUDGET_MB,
+        is_stale=tenant_core_is_stale,
+        stale_check_sec=config.INDEX_RELOAD_CHECK_SEC,
+    )
+
+def get_chat_core(tenant=None):
+    """The ChatCore of a tenant (the default one if not given), loading it on first use."""
+    return get_tenant_registry().get(tenant or config.DEFAULT_TENANT)
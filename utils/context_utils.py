@@ -0,0 +1,128 @@
+import os
+import numpy as np
+
+# This is the general instruction for the AI's personality.
+SYSTEM_PROMPT_TEMPLATE = "You are a helpful and friendly Student Helpdesk assistant for the {institution}. Your main role is to answer student queries accurately based on the context provided to you."
+SYSTEM_PROMPT = SYSTEM_PROMPT_TEMPLATE.format(institution="Global University of Innovation")
+
+STYLE_NOTES = {
+    "Concise": "Provide a concise summary of the answer, not exceeding 3 sentences.",
+    "Detailed": "Provide a comprehensive, detailed answer. Use bullet points for lists if it improves clarity.",
+}
+RESPONSE_MODES = tuple(STYLE_NOTES)
+
+# Chunks at most this many characters apart (the whitespace the splitter stripped) count as adjacent
+MAX_MERGE_GAP = 2
+
+
+def build_prompt(question, context, source_type, mode):
+    """Creates the final, fully detailed prompt for the LLM"""
+    return f"""Based on the following context from {source_type}, {STYLE_NOTES[mode]}
+
+Context:
+{context}
+
+User Question:
+{question}
+"""
+
+def estimate_tokens(text):
+    """Rough token count for English prose (about 4 characters per token for Llama-style tokenizers)."""
+    return len(text) // 4 + 1
+
+def source_label(metadata):
+    """Human-readable source of a chunk, e.g. "pdf_cs_fee.txt" or "academic_calendar.pdf, page 2"."""
+    label = os.path.basename(metadata.get("source", "")) or "unknown source"
+    if "page" in metadata:
+        label += f", page {metadata['page'] + 1}"
+    return label
+
+def mmr_order(vectors, mmr_lambda=0.7):
+    """
+    Maximal marginal relevance over candidates already sorted best first.
+    Relevance is taken from that order (the retriever's fused ranking, so BM25-only
+    hits keep their place) and redundancy from the cosine similarity between chunks.
+    Returns the candidate indexes in selection order.
+    """
+    n = len(vectors)
+    if n == 0:
+        return []
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+    similarity = vectors @ vectors.T
+    relevance = 1.0 - np.arange(n) / n
+
+    selected = [0]
+    remaining = list(range(1, n))
+    while remaining:
+        redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        scores = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * redundancy
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+def merge_chunks(chunks):
+    """
+    Joins chunks of the same file (and page) whose character ranges overlap or are adjacent.
+    Each chunk is a dict with "text", "metadata" and "rank"; chunks without a
+    start_index are left as they are. Returns passages ordered by their best rank.
+    """
+    groups, passages = {}, []
+    for chunk in chunks:
+        metadata = chunk["metadata"]
+        if "start_index" not in metadata:
+            passages.append(dict(chunk))
+            continue
+        groups.setdefault((metadata.get("source"), metadata.get("page")), []).append(chunk)
+
+    for group in groups.values():
+        group.sort(key=lambda chunk: chunk["metadata"]["start_index"])
+        current = None
+        for chunk in group:
+            start = chunk["metadata"]["start_index"]
+            if current is not None and start <= current["end"] + MAX_MERGE_GAP:
+                if start > current["end"]:
+                    # Adjacent chunks: the splitter stripped the line break between them
+                    current["text"] += "\n"
+                # Append only the part of the chunk that is not already in the passage
+                current["text"] += chunk["text"][max(0, current["end"] - start):]
+                current["end"] = max(current["end"], start + len(chunk["text"]))
+                current["rank"] = min(current["rank"], chunk["rank"])
+                continue
+            current = {"text": chunk["text"], "metadata": chunk["metadata"], "rank": chunk["rank"],
+                       "end": start + len(chunk["text"])}
+            passages.append(current)
+
+    return sorted(passages, key=lambda passage: passage["rank"])
+
+def build_context(docs, embedding_model, token_budget, mmr_lambda=0.7):
+    """
+    Turns retrieved chunks into a labelled, de-duplicated prompt context.
+    Chunks are picked in MMR order while the merged result still fits in
+    `token_budget`, then overlapping windows of the same file are joined.
+    Returns (context, source_labels, stats).
+    """
+    if not docs:
+        return "", [], {"chunks_in": 0, "chunks_used": 0, "passages": 0, "tokens": 0}
+
+    # Indexed chunks are served from the embedding cache, so this is not a model call
+    vectors = embedding_model.embed_documents([doc.page_content for doc in docs])
+    candidates = [{"text": doc.page_content, "metadata": doc.metadata, "rank": rank} for rank, doc in enumerate(docs)]
+
+    selected, passages = [], []
+    for i in mmr_order(vectors, mmr_lambda):
+        trial = merge_chunks(selected + [candidates[i]])
+        tokens = sum(estimate_tokens(f"[Source: {source_label(p['metadata'])}]\n{p['text']}") for p in trial)
+        # The best chunk is always kept, even if it is larger than the budget on its own
+        if selected and tokens > token_budget:
+            continue
+        selected.append(candidates[i])
+        passages = trial
+
+    blocks = [f"[Source: {source_label(p['metadata'])}]\n{p['text'].strip()}" for p in passages]
+    context = "\n\n".join(blocks)
+    labels = list(dict.fromkeys(source_label(p["metadata"]) for p in passages))
+    stats = {"chunks_in": len(docs), "chunks_used": len(selected), "passages": len(passages),
+             "tokens": estimate_tokens(context)}
+    return context, labels, stats
@@ -0,0 +1,184 @@
+import os
+import json
+import hashlib
+import threading
+
+# Bumped when the layout of the state file changes; older state is ignored
+CRAWL_STATE_VERSION = 1
+
+
+def file_fingerprint(path, previous=None):
+    """
+    Returns {"mtime", "size", "hash"} for a file.
+    The hash is reused from `previous` when size and mtime did not change.
+    """
+    stat = os.stat(path)
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime:
+        return {"mtime": stat.st_mtime, "size": stat.st_size, "hash": previous["hash"]}
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return {"mtime": stat.st_mtime, "size": stat.st_size, "hash": digest}
+
+def text_hash(text):
+    """SHA-256 hex digest of a string."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def read_changeset(path):
+    """Reads a pending changeset, or returns None if there is none."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            changeset = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  [Changeset] Ignoring unreadable changeset: {e}")
+        return None
+    return {"changed": changeset.get("changed", []), "deleted": changeset.get("deleted", [])}
+
+def merge_changeset(path, changed, deleted):
+    """
+    Adds changes to the pending changeset at `path`.
+    A changeset the indexer has not consumed yet is merged, not overwritten,
+    so two crawls in a row never lose changes.
+    """
+    pending = read_changeset(path) or {"changed": [], "deleted": []}
+    changed, deleted = set(changed), set(deleted)
+    merged = {
+        "changed": sorted((set(pending["changed"]) - deleted) | changed),
+        "deleted": sorted((set(pending["deleted"]) - changed) | deleted),
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(merged, f, indent=2)
+    os.replace(tmp_path, path)
+    return merged
+
+
+class CrawlState:
+    """
+    Persistent record of every crawled source (page, modal or PDF).
+    Each source keeps its fingerprint and the data files it produced, so an
+    incremental crawl can skip unchanged sources and clean up after removed ones.
+    With `write_files=False` the outputs are only recorded by name (the crawler
+    streams them into the index instead).
+    """
+
+    def __init__(self, state_path, data_dir, write_files=True):
+        self.state_path = state_path
+        self.data_dir = data_dir
+        self.write_files = write_files
+        self.sources = self._load()
+        self.seen = set()
+        self.changed_outputs = set()
+        # Outputs taken away from a source during this crawl
+        self.dropped_outputs = set()
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"  [Crawl State] Ignoring unreadable state file: {e}")
+            return {}
+        if state.get("version") != CRAWL_STATE_VERSION:
+            return {}
+        return state.get("sources", {})
+
+    def get(self, key):
+        """Returns the stored record for a source, or None."""
+        with self.lock:
+            return self.sources.get(key)
+
+    def is_unchanged(self, key, fingerprint):
+        """True if the source was crawled before with the same content and its outputs still exist."""
+        record = self.get(key)
+        if not record or record.get("hash") != fingerprint["hash"]:
+            return False
+        if not self.write_files:
+            return True
+        return all(os.path.exists(os.path.join(self.data_dir, name)) for name in record.get("outputs", []))
+
+    def keep(self, key):
+        """Marks a skipped source (and the modals found on it) as still present."""
+        with self.lock:
+            record = self.sources.get(key)
+            self.seen.add(key)
+            children = list(record.get("modals", [])) if record else []
+        for child in children:
+            self.keep(child)
+
+    def record(self, key, kind, fingerprint, outputs=(), **extra):
+        """Stores the fingerprint and outputs of a freshly crawled source."""
+        with self.lock:
+            self.sources[key] = dict(fingerprint, kind=kind, outputs=sorted(outputs), **extra)
+            self.seen.add(key)
+
+    def drop_outputs(self, key):
+        """
+        Takes the data files away from a source, e.g. a PDF whose text now belongs
+        to a duplicate. Files no other source produces are deleted by finish().
+        """
+        with self.lock:
+            record = self.sources.get(key)
+            if not record:
+                return
+            self.dropped_outputs.update(record.get("outputs", []))
+            self.changed_outputs.difference_update(record.get("outputs", []))
+            self.sources[key] = dict(record, outputs=[])
+
+    def write_output(self, filename, text):
+        """
+        Writes a data file only if its content changed, so untouched files keep
+        their mtime and the indexer can skip them. Returns True if it was written.
+        Without data files every output counts as changed.
+        """
+        path = os.path.join(self.data_dir, filename)
+        if not self.write_files:
+            # An older copy would shadow the streamed text the next time the data folder is synced
+            if os.path.exists(path):
+                os.remove(path)
+            with self.lock:
+                self.changed_outputs.add(filename)
+            return True
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                if f.read() == text:
+                    return False
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        with self.lock:
+            self.changed_outputs.add(filename)
+        return True
+
+    def finish(self, changeset_path):
+        """
+        Drops sources that were not seen in this crawl, deletes the data files
+        only they produced, saves the state and merges the changeset.
+        Returns the changes made by this crawl.
+        """
+        with self.lock:
+            live = {key: record for key, record in self.sources.items() if key in self.seen}
+            live_outputs = {name for record in live.values() for name in record.get("outputs", [])}
+            removed = sorted(({
+                name for key, record in self.sources.items() if key not in self.seen
+                for name in record.get("outputs", [])
+            } | self.dropped_outputs) - live_outputs)
+            self.sources = live
+
+        for name in removed:
+            path = os.path.join(self.data_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+                print(f"  > Removed stale data file {name}")
+
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CRAWL_STATE_VERSION, "sources": self.sources}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+        changes = {"changed": sorted(self.changed_outputs), "deleted": removed}
+        merge_changeset(changeset_path, changes["changed"], changes["deleted"])
+        return changes
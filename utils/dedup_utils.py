@@ -0,0 +1,37 @@
+import re
+import hashlib
+import unicodedata
+
+# Word characters only: punctuation, bullets and layout whitespace differ
+# between PDF parsers and the scraper's extracted text
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    """Normalizes text so the same content hashes identically regardless of its source format."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return " ".join(WORD_PATTERN.findall(text))
+
+def content_hash(text):
+    """Returns the SHA-256 hex digest of the normalized text."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+def documents_hash(documents):
+    """Content hash of a whole file loaded as one or more documents (e.g. PDF pages)."""
+    return content_hash("\n".join(doc.page_content for doc in documents))
+
+def dedup_chunks(chunks):
+    """
+    Drops chunks whose normalized content was already seen.
+    Returns (unique_chunks, chunk_ids, dropped_count) where the IDs are content hashes.
+    """
+    seen = set()
+    unique_chunks, chunk_ids = [], []
+    for chunk in chunks:
+        chunk_id = content_hash(chunk.page_content)
+        if chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        unique_chunks.append(chunk)
+        chunk_ids.append(chunk_id)
+    return unique_chunks, chunk_ids, len(chunks) - len(unique_chunks)
@@ -0,0 +1,285 @@
+import os
+import re
+import json
+from utils.dedup_utils import normalize_text
+from utils.bm25_index import STOPWORDS
+from utils.context_utils import source_label
+
+FACTS_FILE = "facts.json"
+# Bullet glyphs that PDF text extraction puts in front of list items
+BULLETS = ("\uf0b7", "•", "▪")
+
+MONTHS = ("january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december")
+MONTH_PATTERN = r"(?:January|February|March|April|May|June|July|August|September|October|November|December)"
+# "June 16, 2025 (Monday)", "August 13–22, 2025", "October 18", "June 17–20"
+DATE_PATTERN = MONTH_PATTERN + r"\s+\d{1,2}(?:\s*[–-]\s*\d{1,2})?(?:,\s*\d{4})?(?:\s*\([A-Za-z]+\))?"
+
+FEE_TITLE = re.compile(r"^(?P<program>.+?)\s+Fee Structure(?:\s*\((?P<year>[^)]+)\))?", re.I)
+ELIGIBILITY_TITLE = re.compile(r"^(?P<program>.+?)\s+Eligibility Criteria", re.I)
+CALENDAR_TITLE = re.compile(r"Academic Calendar", re.I)
+# "Tuition Fee: ■45,000 per semester" (the rupee sign is extracted from the PDFs as ■)
+FEE_LINE = re.compile(r"^(?P<component>[A-Za-z][^:]{1,40}):\s*[■₹]?\s*(?P<amount>\d[\d,]*)\s*(?P<period>.*)$")
+DATE_FIRST = re.compile(rf"^(?P<date>{DATE_PATTERN}):\s*(?P<event>.+)$")
+EVENT_FIRST = re.compile(rf"^(?P<event>[^:]+):\s*(?P<date>{DATE_PATTERN}.*)$")
+
+# Question words that signal each kind of fact
+FEE_INTENT = {"fee", "fees", "cost", "costs", "tuition", "charge", "charges", "much", "pay"}
+ELIGIBILITY_INTENT = {"eligibility", "eligible", "criteria", "criterion", "requirement", "requirements",
+                      "required", "qualify", "qualification", "aggregate", "percentage"}
+CALENDAR_INTENT = {"when", "date", "dates", "day", "holiday", "holidays", "schedule", "deadline"} | set(MONTHS)
+
+# Question words for individual fee components and eligibility criteria
+COMPONENT_WORDS = {
+    "tuition": "tuition", "exam": "examination", "exams": "examination", "examination": "examination",
+    "lab": "laboratory", "labs": "laboratory", "laboratory": "laboratory", "activity": "activity",
+    "total": "total", "yearly": "total", "annual": "total", "year": "total",
+}
+# Other words a plain fee or eligibility question may contain; anything beyond these
+# (e.g. "hostel fee", "fee to apply") is something the fact table cannot answer
+GENERIC_WORDS = {"minimum", "need", "needed", "needs", "semester", "per", "structure",
+                 "amount", "program", "programme", "course", "degree", "details", "know", "want",
+                 "with", "this", "that", "all", "list", "compare", "both", "b", "sc", "bsc", "much",
+                 "total", "students", "student", "university", "gui", "fee", "fees"}
+# Admission words are plain for eligibility ("requirements to join CS") but name another fee ("admission fee")
+ADMISSION_WORDS = {"admission", "admissions", "apply", "applying", "application", "join", "joining", "get", "into"}
+# Calendar words that say nothing about which event is meant
+CALENDAR_GENERIC = {"when", "date", "dates", "day", "schedule", "held"}
+# Degree prefixes dropped to get a program's short name ("B.Sc. Biosciences" -> "biosciences")
+DEGREE_WORDS = {"b", "sc", "bsc", "m", "msc", "ba", "ma"}
+CRITERION_WORDS = {
+    "aggregate": "aggregate", "percentage": "aggregate", "marks": "aggregate",
+    "subjects": "qualifying", "subject": "qualifying", "stream": "qualifying", "passed": "qualifying",
+    "selection": "selection", "interview": "selection", "entrance": "selection", "merit": "selection",
+}
+
+
+def _clean_line(line):
+    """Strips the bullet glyphs and stray whitespace that PDF extraction leaves around a line."""
+    return re.sub(r"^[^\w(]+", "", line).strip()
+
+def _stem(word):
+    if len(word) > 6 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 5 and word.endswith("es") and word[:-2].endswith(("s", "x", "ch", "sh")):
+        return word[:-2]
+    if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def _month_day(date_text):
+    """("june", 16) for "June 16, 2025 (Monday)"; ranges give their first day."""
+    match = re.match(r"([A-Za-z]+)\s+(\d{1,2})", date_text)
+    return (match.group(1).lower(), int(match.group(2))) if match else None
+
+def _content_words(text):
+    return {_stem(word) for word in normalize_text(text).split() if word not in STOPWORDS}
+
+def _years(words):
+    """Four-digit years among the question words."""
+    return {word for word in words if len(word) == 4 and word.isdigit() and word.startswith(("19", "20"))}
+
+def _joined_lines(text):
+    """Cleaned lines, with lines that PDF extraction wrapped mid-sentence joined back together."""
+    lines, previous_bulleted = [], False
+    for raw in text.splitlines():
+        line = _clean_line(raw)
+        if not line:
+            continue
+        bulleted = raw.lstrip().startswith(BULLETS)
+        # A wrapped line continues in lowercase or after a hyphen; the tail of a wrapped bullet
+        # point is a lone word or a list (section headings have several words and no commas)
+        wrapped = lines and (line[0].islower() or lines[-1].endswith("-") or (
+            previous_bulleted and not bulleted and (len(line.split()) == 1 or "," in line)))
+        if wrapped:
+            lines[-1] = f"{lines[-1]}{'' if lines[-1].endswith('-') else ' '}{line}"
+        else:
+            lines.append(line)
+            previous_bulleted = bulleted
+    return lines
+
+def _criterion_key(sentence):
+    lowered = sentence.lower()
+    if ":" in sentence:
+        return sentence.split(":", 1)[0].strip()
+    if "passed" in lowered or "10+2" in lowered:
+        return "Qualifying examination"
+    if any(word in lowered for word in ("selection", "admission", "merit", "interview")):
+        return "Selection"
+    return "Criterion"
+
+def extract_facts(documents):
+    """
+    Pulls fee components, eligibility criteria and calendar dates out of loaded documents.
+    Each fact is a dict: kind ("fee", "eligibility" or "date"), program (or calendar
+    section), key, value, text (the source line) and source (file name, page).
+    Documents that are not fee, eligibility or calendar pages yield nothing.
+    """
+    facts = []
+    program = year = None
+    kind = None
+    for doc in documents:
+        source = source_label(doc.metadata)
+        for line in _joined_lines(doc.page_content):
+            title = FEE_TITLE.match(line)
+            if title:
+                kind, program, year = "fee", title.group("program").strip(), title.group("year")
+                continue
+            title = ELIGIBILITY_TITLE.match(line)
+            if title:
+                kind, program, year = "eligibility", title.group("program").strip(), None
+                continue
+            if CALENDAR_TITLE.search(line):
+                kind, program = "date", None
+                continue
+
+            if kind == "fee":
+                match = FEE_LINE.match(line)
+                if match:
+                    period = match.group("period").strip(" .") or None
+                    facts.append({"kind": "fee", "program": program, "year": year,
+                                  "key": match.group("component").strip(),
+                                  "value": f"₹{match.group('amount')}" + (f" {period}" if period else ""),
+                                  "text": line, "source": source})
+            elif kind == "eligibility":
+                facts.append({"kind": "eligibility", "program": program, "key": _criterion_key(line),
+                              "value": line.split(":", 1)[-1].strip(), "text": line, "source": source})
+            elif kind == "date":
+                match = DATE_FIRST.match(line) or EVENT_FIRST.match(line)
+                if match:
+                    facts.append({"kind": "date", "program": program, "key": match.group("event").strip(),
+                                  "value": match.group("date").strip(), "text": line, "source": source})
+                elif not re.search(r"[\d:]", line) and len(line.split()) <= 6:
+                    # A short heading such as "Holidays & Special Observances" starts a new section
+                    program = line
+    return facts
+
+
+class FactIndex:
+    """
+    Compact lookup table of fees, eligibility criteria and calendar dates, built at
+    indexing time. `answer(question)` answers exact-fact questions without the LLM,
+    citing the source file; it returns None when the question is not a clear match,
+    so the regular retrieval + generation path handles it.
+    """
+
+    def __init__(self, facts, program_aliases=None):
+        self.facts = facts
+        self.programs = sorted({fact["program"] for fact in facts if fact["kind"] in ("fee", "eligibility")})
+        self.program_words = {}
+        for program in self.programs:
+            names = [program] + list((program_aliases or {}).get(program, []))
+            short_name = " ".join(word for word in normalize_text(program).split() if word not in DEGREE_WORDS)
+            if short_name:
+                names.append(short_name)
+            self.program_words[program] = list(dict.fromkeys(normalize_text(name) for name in names))
+        self.known_words = (FEE_INTENT | ELIGIBILITY_INTENT | set(COMPONENT_WORDS) | set(CRITERION_WORDS)
+                            | GENERIC_WORDS | {word for names in self.program_words.values()
+                                               for name in names for word in name.split()})
+
+    def __len__(self):
+        return len(self.facts)
+
+    def _programs_in(self, question):
+        text = f" {normalize_text(question)} "
+        return [program for program, words in self.program_words.items()
+                if any(f" {word} " in text for word in words)]
+
+    def _program_answer(self, kind, question, words, selectors):
+        programs = self._programs_in(question)
+        if not programs:
+            return None
+        known = self.known_words | ADMISSION_WORDS if kind == "eligibility" else self.known_words
+        if any(word not in known and word not in STOPWORDS and not word.isdigit() for word in words):
+            # The question asks about something more than the table holds
+            return None
+        years = _years(words)
+        wanted = {selectors[word] for word in words if word in selectors}
+        selected = []
+        for program in programs:
+            facts = [fact for fact in self.facts if fact["kind"] == kind and fact["program"] == program]
+            if years and any(year not in (fact.get("year") or "") for fact in facts for year in years):
+                # Fees of another academic year than the one asked about
+                return None
+            picked = [fact for fact in facts if any(part in fact["key"].lower() or part in fact["text"].lower()
+                                                    for part in wanted)] if wanted else facts
+            if not picked and wanted:
+                # Asked for something this program's table does not have
+                return None
+            selected.extend(picked)
+        return selected or None
+
+    def _calendar_answer(self, question, words):
+        dates = [fact for fact in self.facts if fact["kind"] == "date"]
+        # A date in the question ("Is October 2 a holiday?") is matched directly
+        mentioned = re.findall(rf"({MONTH_PATTERN})\s+(\d{{1,2}})\b", question, flags=re.I)
+        if mentioned:
+            keys = {(month.lower(), int(day)) for month, day in mentioned}
+            matches = [fact for fact in dates if _month_day(fact["value"]) in keys]
+            return matches or None
+
+        years = _years(words)
+        question_words = _content_words(question) - CALENDAR_GENERIC - years
+        if not question_words:
+            return None
+        # Only an event named by exactly the question's words wins: "semester start" must not pick
+        # "Semester Examination Starts", and "holiday" alone names no single event
+        # (words in parentheses, e.g. "(National Holiday)", only describe the event)
+        matches = [fact for fact in dates
+                   if _content_words(re.sub(r"\([^)]*\)", " ", fact["key"])) - CALENDAR_GENERIC == question_words
+                   and all(year in fact["value"] for year in years)]
+        # The same event from two copies of the calendar is still one event
+        matches = list({(fact["key"], fact["value"]): fact for fact in reversed(matches)}.values())
+        if len(matches) != 1:
+            # No event or several: let the LLM read the calendar instead
+            return None
+        return matches
+
+    def lookup(self, question):
+        """The facts that answer the question, or None if it is not an unambiguous fact question."""
+        words = set(normalize_text(question).split())
+        if words & ELIGIBILITY_INTENT:
+            return self._program_answer("eligibility", question, words, CRITERION_WORDS)
+        if words & FEE_INTENT:
+            return self._program_answer("fee", question, words, COMPONENT_WORDS)
+        if words & CALENDAR_INTENT:
+            return self._calendar_answer(question, words)
+        return None
+
+    def answer(self, question):
+        """Returns (answer_text, source_labels), or None to fall back to the LLM."""
+        facts = self.lookup(question)
+        if not facts:
+            return None
+        lines, heading = [], None
+        for fact in facts:
+            if fact["kind"] == "date":
+                section = f" ({fact['program']})" if fact["program"] else ""
+                lines.append(f"- {fact['value']}: {fact['key']}{section}")
+                continue
+            title = fact["program"] + (f" fees ({fact['year']})" if fact["kind"] == "fee" and fact.get("year") else
+                                       " fees" if fact["kind"] == "fee" else " eligibility")
+            if title != heading:
+                lines.append(f"**{title}**")
+                heading = title
+            lines.append(f"- {fact['key']}: {fact['value']}" if fact["kind"] == "fee" else f"- {fact['text']}")
+        sources = list(dict.fromkeys(fact["source"] for fact in facts))
+        lines.append(f"\nSource: {', '.join(sources)}")
+        return "\n".join(lines), sources
+
+
+def save_facts(index_dir, facts):
+    """Writes the fact table atomically next to the vector index."""
+    path = os.path.join(index_dir, FACTS_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(facts, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+
+def load_fact_index(index_dir, program_aliases=None):
+    """Loads the fact table saved by the indexer (empty if there is none)."""
+    path = os.path.join(index_dir, FACTS_FILE)
+    facts = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            facts = json.load(f)
+    return FactIndex(facts, program_aliases)
@@ -0,0 +1,533 @@
+import os
+import sys
+import json
+import hashlib
+from langchain_core.documents import Document
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import config
+from utils.dedup_utils import documents_hash, dedup_chunks
+from utils.crawl_state import read_changeset
+from utils.bm25_index import BM25Index
+from utils.fact_index import extract_facts, save_facts, FACTS_FILE
+from utils.ann_index import (create_index, update_store, save_store, load_store, store_exists, index_kind,
+                             DOCSTORE_FILE, STORE_FILES)
+from models.embeddings import embed_array
+
+MANIFEST_FILE = "manifest.json"
+# Lexical (BM25) postings over the same chunks as the FAISS index
+LEXICAL_INDEX_FILE = "bm25.json"
+MANIFEST_VERSION = 5
+# Only these file types are picked up from the data folder
+SOURCE_EXTENSIONS = (".pdf", ".txt")
+
+
+class IndexOutOfSync(ValueError):
+    """Raised when the manifest references chunks the stored index does not hold."""
+
+
+class RebuildRequired(RuntimeError):
+    """Raised when the index needs a full rebuild but the caller only allows in-place updates."""
+
+
+def file_hash(path):
+    """Returns the SHA-256 hex digest of a file's raw bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def list_source_files(document_path):
+    """Lists all indexable files under the data folder, relative to it."""
+    found = []
+    for root, _, files in os.walk(document_path):
+        for name in files:
+            if name.lower().endswith(SOURCE_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(root, name), document_path).replace("\\", "/"))
+    return sorted(found)
+
+def load_source_file(path):
+    """Loads a single PDF or text file into LangChain documents."""
+    if path.lower().endswith(".pdf"):
+        return PyPDFLoader(path).load()
+    return TextLoader(path, encoding="utf-8").load()
+
+def load_manifest(index_dir):
+    """Reads the index manifest, or returns None if there is no usable one."""
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  [Index] Ignoring unreadable manifest: {e}")
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+def save_manifest(index_dir, manifest):
+    """Writes the manifest atomically so a crash never leaves a half-written file."""
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def index_version(index_dir):
+    """
+    Short hash of the indexed content and settings.
+    It changes whenever a sync adds, changes or removes a file, so caches built
+    on top of the index can tell when they are stale.
+    """
+    manifest = load_manifest(index_dir)
+    if not manifest:
+        return None
+    fingerprint = {
+        "settings": manifest["settings"],
+        "files": {rel_path: entry["hash"] for rel_path, entry in manifest["files"].items()},
+    }
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def resident_size_mb(index_dir):
+    """
+    Estimated memory held by a loaded index: the FAISS index and the ID/offset tables
+    (mapped pages count once they are searched) plus the BM25 postings.
+    Chunk texts are read on demand from the docstore file and are not counted.
+    """
+    names = [name for name in STORE_FILES if name != DOCSTORE_FILE] + [LEXICAL_INDEX_FILE]
+    paths = [os.path.join(index_dir, name) for name in names]
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path)) / (1024 * 1024)
+
+def index_settings(embedding_model_name, chunk_size, chunk_overlap, add_start_index=True, index_type="flat", index_params=None):
+    """Settings that invalidate every stored vector when they change."""
+    return {
+        "embedding_model": embedding_model_name,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        # Chunk offsets let the context builder merge overlapping chunks
+        "start_index": add_start_index,
+        # ANN index type and its build-time parameters (query-time ones are not stored)
+        "index_type": index_type,
+        "index_params": index_params or {},
+    }
+
+def scan_changes(document_path, manifest, changeset=None):
+    """
+    Compares the data folder against the manifest.
+    If the crawler left a changeset, files it did not report are trusted as unchanged.
+    Sources the crawler streamed into the index without a data file are kept
+    until a changeset reports them deleted.
+    Returns (added, changed, deleted, unchanged) where the first three hold
+    relative paths and `unchanged` maps paths to their refreshed manifest entries.
+    """
+    previous = manifest["files"] if manifest else {}
+    reported = set(changeset["changed"]) if changeset else None
+    added, changed, unchanged = [], [], {}
+
+    for rel_path in list_source_files(document_path):
+        full_path = os.path.join(document_path, rel_path)
+        entry = previous.get(rel_path)
+
+        if entry is None:
+            added.append(rel_path)
+            continue
+        if reported is not None and rel_path not in reported:
+            unchanged[rel_path] = entry
+            continue
+        stat = os.stat(full_path)
+        # Cheap check first: same size and mtime means the file was not touched
+        if entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            unchanged[rel_path] = entry
+            continue
+        if entry["hash"] == file_hash(full_path):
+            unchanged[rel_path] = dict(entry, size=stat.st_size, mtime=stat.st_mtime)
+            unchanged[rel_path].pop("streamed", None)
+        else:
+            changed.append(rel_path)
+
+    reported_deleted = set(changeset["deleted"]) if changeset else set()
+    for rel_path, entry in previous.items():
+        if entry.get("streamed") and rel_path not in unchanged and rel_path not in reported_deleted:
+            unchanged.setdefault(rel_path, entry)
+
+    current = set(added) | set(changed) | set(unchanged)
+    deleted = [rel_path for rel_path in previous if rel_path not in current]
+    return added, changed, deleted, unchanged
+
+def build_lexical_index(vector_store):
+    """Builds the BM25 index from the chunks still stored in the FAISS docstore."""
+    lexical_index = BM25Index()
+    for chunk_id in vector_store.index_to_docstore_id.values():
+        lexical_index.add(chunk_id, vector_store.docstore.search(chunk_id).page_content)
+    return lexical_index
+
+def load_lexical_index(index_dir, vector_store):
+    """Loads the persisted BM25 index, rebuilding it if it is missing or unreadable."""
+    lexical_path = os.path.join(index_dir, LEXICAL_INDEX_FILE)
+    if os.path.exists(lexical_path):
+        try:
+            return BM25Index.load(lexical_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  [Index] Rebuilding unreadable lexical index: {e}")
+    return build_lexical_index(vector_store)
+
+def consume_changeset(changeset_path, changeset):
+    """Removes the crawler's changeset once the index reflects it."""
+    if changeset is not None and os.path.exists(changeset_path):
+        os.remove(changeset_path)
+
+def file_state(path):
+    """Hash, size and mtime of a data file, as stored in its manifest entry."""
+    stat = os.stat(path)
+    return {"hash": file_hash(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+def chunk_documents(documents, text_splitter):
+    """
+    Splits the documents of one source.
+    Returns (manifest_entry, chunks) where the entry's chunk IDs are content hashes;
+    the caller adds where the source lives (file state or the streamed marker).
+    """
+    chunks, chunk_ids, dropped = dedup_chunks(text_splitter.split_documents(documents))
+    entry = {
+        "content_hash": documents_hash(documents),
+        "chunk_ids": chunk_ids,
+        "duplicate_chunks": dropped,
+        # Fees, eligibility criteria and calendar dates for the no-LLM fast path
+        "facts": extract_facts(documents),
+    }
+    return entry, chunks
+
+def chunk_file(document_path, rel_path, text_splitter):
+    """Loads and splits one data file. Returns (manifest_entry, chunks)."""
+    full_path = os.path.join(document_path, rel_path)
+    entry, chunks = chunk_documents(load_source_file(full_path), text_splitter)
+    entry.update(file_state(full_path))
+    return entry, chunks
+
+def add_entry(files, content_owners, new_chunks, rel_path, entry, chunks):
+    """
+    Records a freshly chunked source in `files`. A source with the same text as
+    an already indexed one is kept out of the index as its duplicate.
+    """
+    owner = content_owners.get(entry["content_hash"])
+    if owner is not None and owner != rel_path:
+        entry["duplicate_of"] = owner
+        entry["chunk_ids"] = []
+        entry["duplicate_chunks"] = 0
+        entry["facts"] = []
+    else:
+        content_owners[entry["content_hash"]] = rel_path
+        for chunk_id, chunk in zip(entry["chunk_ids"], chunks):
+            new_chunks.setdefault(chunk_id, chunk)
+    files[rel_path] = entry
+
+def collect_facts(files):
+    """All structured facts of the indexed files, in file order."""
+    return [fact for rel_path in sorted(files) for fact in files[rel_path].get("facts", [])]
+
+def dedup_report(files):
+    """Counts duplicate documents and chunks that the index did not have to embed."""
+    duplicate_documents = sum(1 for entry in files.values() if entry.get("duplicate_of"))
+    chunk_refs = sum(len(entry["chunk_ids"]) for entry in files.values())
+    unique_chunks = len({chunk_id for entry in files.values() for chunk_id in entry["chunk_ids"]})
+    # Repeats inside a single file were already dropped while chunking it
+    within_files = sum(entry.get("duplicate_chunks", 0) for entry in files.values())
+    return {"duplicate_documents": duplicate_documents, "duplicate_chunks": chunk_refs - unique_chunks + within_files}
+
+def sync_index(document_path, index_dir, embedding_model, text_splitter, settings, search_params=None, use_mmap=True,
+               allow_rebuild=True):
+    """
+    Brings the on-disk FAISS index in line with the data folder.
+    Unchanged files are loaded from disk as-is; only added or changed files are
+    re-chunked. Documents and chunks are keyed by normalized content hash, so
+    duplicate files (e.g. a PDF and its extracted text) and repeated chunks are
+    embedded once, and only chunks no file references any more are removed.
+    A flat index is updated in place; an HNSW or IVF-PQ index, a new index and one
+    built with other settings are rebuilt from the embedding cache, which only
+    happens with `allow_rebuild` (build_index.py). Without it, RebuildRequired is
+    raised if there is no usable index, and an HNSW or IVF-PQ index is served as
+    it is until the next rebuild.
+    The BM25 lexical index is updated with exactly the same chunk additions and removals.
+    The saved index is opened memory-mapped (see utils/ann_index.py), and the
+    structured facts of every file are written to the fact table (utils/fact_index.py).
+    Returns the up-to-date (FAISS vector store, BM25 lexical index).
+    """
+    manifest = load_manifest(index_dir)
+    index_exists = store_exists(index_dir)
+    changeset_path = os.path.join(document_path, config.CHANGESET_FILE)
+    changeset = read_changeset(changeset_path)
+
+    if manifest and manifest.get("settings") != settings:
+        if not allow_rebuild:
+            raise RebuildRequired(f"The index in '{index_dir}' was built with other embedding, splitter or index settings; "
+                                  "rebuild it with `python build_index.py`.")
+        print("  [Index] Embedding or splitter settings changed, rebuilding from scratch.")
+        streamed = sum(1 for entry in manifest["files"].values() if entry.get("streamed"))
+        if streamed:
+            print(f"  [Index] {streamed} sources were streamed in without data files; re-run `scraper.py --index` without --incremental to index them again.")
+        manifest = None
+    if manifest and not index_exists:
+        manifest = None
+    if not manifest and not allow_rebuild:
+        raise RebuildRequired(f"There is no usable index in '{index_dir}'; build it with `python build_index.py`.")
+
+    added, changed, deleted, unchanged = scan_changes(document_path, manifest, changeset if manifest else None)
+    print(f"  [Index] {len(unchanged)} unchanged, {len(added)} added, {len(changed)} changed, {len(deleted)} deleted.")
+
+    vector_store, lexical_index = None, BM25Index()
+    in_place = False
+    if manifest:
+        vector_store = load_store(index_dir, embedding_model, use_mmap, search_params)
+        lexical_index = load_lexical_index(index_dir, vector_store)
+        if not (added or changed or deleted):
+            if not os.path.exists(os.path.join(index_dir, FACTS_FILE)):
+                save_facts(index_dir, collect_facts(manifest["files"]))
+            consume_changeset(changeset_path, changeset)
+            return vector_store, lexical_index
+        in_place = index_kind(vector_store.index) == "flat"
+        if not in_place and not allow_rebuild:
+            print(f"  [Index] The {index_kind(vector_store.index)} index is only rebuilt by `python build_index.py`; "
+                  "serving it without these changes until then.")
+            return vector_store, lexical_index
+
+    # Duplicates of a changed or deleted file have to be re-checked, they may now be the only copy
+    to_process = added + changed
+    files = {}
+    for rel_path, entry in unchanged.items():
+        if entry.get("duplicate_of") in to_process or entry.get("duplicate_of") in deleted:
+            to_process.append(rel_path)
+        else:
+            files[rel_path] = entry
+
+    content_owners = {entry["content_hash"]: rel_path for rel_path, entry in files.items() if not entry.get("duplicate_of")}
+    new_chunks = {}
+    for rel_path in sorted(to_process):
+        entry, chunks = chunk_file(document_path, rel_path, text_splitter)
+        add_entry(files, content_owners, new_chunks, rel_path, entry, chunks)
+
+    try:
+        # An in-place update only appends the new chunks, a rebuild writes all of them again
+        resolve_chunks(files, new_chunks, vector_store, load=not in_place)
+    except IndexOutOfSync as e:
+        if not allow_rebuild:
+            raise RebuildRequired(f"{e} Rebuild it with `python build_index.py`.") from e
+        # The manifest cannot be trusted: rebuild everything from the data folder
+        print(f"  [Index] {e} Rebuilding from scratch.")
+        vector_store = None
+        os.remove(os.path.join(index_dir, MANIFEST_FILE))
+        return sync_index(document_path, index_dir, embedding_model, text_splitter, settings, search_params, use_mmap)
+    # Release the memory-mapped files before they are replaced
+    vector_store = None
+    write_index(index_dir, manifest, files, new_chunks, lexical_index, embedding_model, settings, in_place)
+    consume_changeset(changeset_path, changeset)
+    # Serve from the saved files, exactly like the next start will
+    return load_store(index_dir, embedding_model, use_mmap, search_params), lexical_index
+
+def resolve_chunks(files, chunk_docs, vector_store, load=True):
+    """
+    Checks that the stored index holds every chunk `files` references but that was
+    not re-chunked and, with `load`, adds its stored document to `chunk_docs`.
+    Raises IndexOutOfSync if the stored index lacks any of them.
+    """
+    missing = []
+    for chunk_id in sorted({chunk_id for entry in files.values() for chunk_id in entry["chunk_ids"]}):
+        if chunk_id not in chunk_docs:
+            # The docstore returns a "not found" string rather than raising
+            doc = vector_store.docstore.search(chunk_id) if vector_store is not None else None
+            if not isinstance(doc, Document):
+                missing.append(chunk_id)
+            elif load:
+                chunk_docs[chunk_id] = doc
+    if missing:
+        raise IndexOutOfSync(f"The stored index is missing {len(missing)} chunks listed in the manifest.")
+
+def write_index(index_dir, manifest, files, chunk_docs, lexical_index, embedding_model, settings, in_place=False):
+    """
+    Applies the chunk additions and removals implied by `files` to the lexical index
+    and to the ANN index, in place or by rebuilding it, and saves the index files,
+    the fact table and the manifest. `chunk_docs` maps every new chunk ID (every
+    referenced one for a rebuild) to its document (see resolve_chunks).
+    Vectors come from the embedding cache as float32 batches; only the new chunks
+    actually go through the model.
+    """
+    # The index holds exactly one vector per distinct chunk referenced by the manifest
+    stored_ids = {chunk_id for entry in (manifest["files"].values() if manifest else []) for chunk_id in entry["chunk_ids"]}
+    referenced_ids = {chunk_id for entry in files.values() for chunk_id in entry["chunk_ids"]}
+    stale_ids = sorted(stored_ids - referenced_ids)
+    add_ids = sorted(referenced_ids - stored_ids)
+
+    for chunk_id in stale_ids:
+        lexical_index.remove(chunk_id)
+    for chunk_id in add_ids:
+        lexical_index.add(chunk_id, chunk_docs[chunk_id].page_content)
+
+    if not referenced_ids:
+        raise ValueError(f"No indexable documents found for '{index_dir}'.")
+
+    if in_place:
+        # Re-chunked chunks that are already stored are written again: the same text may now
+        # come from another file (a duplicate took over) or sit at another offset
+        write_ids = add_ids + sorted(set(chunk_docs) & stored_ids & referenced_ids)
+        docs = [chunk_docs[chunk_id] for chunk_id in write_ids]
+        dead_rows = update_store(index_dir, stale_ids, docs, write_ids,
+                                 lambda positions: embed_array(embedding_model, [docs[i].page_content for i in positions]))
+        if dead_rows > len(referenced_ids):
+            print(f"  [Index] {dead_rows} removed chunks are still kept on disk; compact them with `python build_index.py --rebuild`.")
+    else:
+        all_ids = sorted(referenced_ids)
+        docs = [chunk_docs[chunk_id] for chunk_id in all_ids]
+        index = create_index(len(all_ids), lambda rows: embed_array(embedding_model, [docs[i].page_content for i in rows]),
+                             settings["index_type"], settings["index_params"])
+        save_store(index_dir, index, docs, all_ids)
+
+    report = dedup_report(files)
+    lexical_index.save(os.path.join(index_dir, LEXICAL_INDEX_FILE))
+    facts = collect_facts(files)
+    save_facts(index_dir, facts)
+    # Pickled docstore of the previous index format
+    legacy_docstore = os.path.join(index_dir, "index.pkl")
+    if os.path.exists(legacy_docstore):
+        os.remove(legacy_docstore)
+    save_manifest(index_dir, {"version": MANIFEST_VERSION, "settings": settings, "files": files, "dedup": report})
+    print(f"  [Index] Embedded {len(add_ids)} new chunks, removed {len(stale_ids)} stale chunks.")
+    print(f"  [Index] Dedup dropped {report['duplicate_documents']} duplicate documents and {report['duplicate_chunks']} duplicate chunks.")
+    if in_place:
+        print(f"  [Index] Updated the flat index in place, {len(referenced_ids)} chunks.")
+    else:
+        print(f"  [Index] Built a {settings['index_type']} index over {len(referenced_ids)} chunks.")
+    print(f"  [Index] Extracted {len(facts)} structured facts (fees, eligibility, calendar).")
+
+
+class StreamingIndexer:
+    """
+    Indexes sources handed over by the crawler while it is still running, instead
+    of re-reading them from the data folder afterwards (see utils/ingest_pipeline.py).
+    Each source is split and deduplicated on arrival and its new chunk texts are
+    returned for embedding; finish() adds the rest of the data folder, drops deleted
+    sources and writes the index exactly like sync_index. Sources without a data
+    file are marked "streamed" in the manifest.
+    Only the ingest thread may call add_source and drop_source.
+    """
+
+    def __init__(self, document_path, index_dir, embedding_model, text_splitter, settings):
+        self.document_path = document_path
+        self.index_dir = index_dir
+        self.embedding_model = embedding_model
+        self.text_splitter = text_splitter
+        self.settings = settings
+        self.manifest = load_manifest(index_dir)
+        if self.manifest and (self.manifest.get("settings") != settings or not store_exists(index_dir)):
+            self.manifest = None
+        self.previous = self.manifest["files"] if self.manifest else {}
+        self.stored_ids = {chunk_id for entry in self.previous.values() for chunk_id in entry["chunk_ids"]}
+        self.files = {}
+        self.content_owners = {}
+        self.new_chunks = {}
+
+    def _locate(self, rel_path, entry):
+        """Adds the data file's state to an entry, or marks it as streamed if none was written."""
+        for key in ("hash", "size", "mtime", "streamed"):
+            entry.pop(key, None)
+        full_path = os.path.join(self.document_path, rel_path)
+        if os.path.exists(full_path):
+            entry.update(file_state(full_path))
+        else:
+            entry.update(hash=entry["content_hash"], streamed=True)
+        return entry
+
+    def add_source(self, rel_path, documents):
+        """Indexes one crawled source (e.g. a page or all pages of a PDF). Returns the chunk texts still to embed."""
+        previous = self.previous.get(rel_path)
+        content = documents_hash(documents)
+        if previous and not previous.get("duplicate_of") and previous["content_hash"] == content \
+                and content not in self.content_owners:
+            # Same text as last time: its chunks are already in the index
+            self.content_owners[content] = rel_path
+            self.files[rel_path] = self._locate(rel_path, dict(previous))
+            return []
+
+        entry, chunks = chunk_documents(documents, self.text_splitter)
+        known = set(self.new_chunks)
+        add_entry(self.files, self.content_owners, self.new_chunks, rel_path, self._locate(rel_path, entry), chunks)
+        return [self.new_chunks[chunk_id].page_content for chunk_id in entry["chunk_ids"]
+                if chunk_id not in known and chunk_id not in self.stored_ids]
+
+    def drop_source(self, rel_path):
+        """Forgets a source added earlier in this crawl, e.g. a PDF whose text now belongs to a duplicate."""
+        entry = self.files.pop(rel_path, None)
+        if entry is None:
+            return
+        if self.content_owners.get(entry["content_hash"]) == rel_path:
+            del self.content_owners[entry["content_hash"]]
+        # Chunks only this source had; its successor adds them again with its own metadata
+        referenced = {chunk_id for other in self.files.values() for chunk_id in other["chunk_ids"]}
+        for chunk_id in entry["chunk_ids"]:
+            if chunk_id not in referenced:
+                self.new_chunks.pop(chunk_id, None)
+
+    def finish(self, search_params=None, use_mmap=True):
+        """
+        Completes the index once the crawl is over and its changeset is written.
+        Previously indexed sources that were neither streamed again nor reported deleted
+        are kept; other files in the data folder are synced as usual, and the changeset
+        is consumed. Returns the up-to-date (FAISS vector store, BM25 lexical index).
+        """
+        changeset_path = os.path.join(self.document_path, config.CHANGESET_FILE)
+        changeset = read_changeset(changeset_path)
+        deleted = set(changeset["deleted"]) if changeset else set()
+        rest = {"files": {rel_path: entry for rel_path, entry in self.previous.items()
+                          if rel_path not in self.files and rel_path not in deleted}}
+        added, changed, _, unchanged = scan_changes(self.document_path, rest)
+        to_process = [rel_path for rel_path in added + changed if rel_path not in self.files and rel_path not in deleted]
+        for rel_path, entry in sorted(unchanged.items()):
+            owner = entry.get("duplicate_of")
+            owner_entry = self.files.get(owner) or unchanged.get(owner)
+            if owner and (not owner_entry or owner_entry["content_hash"] != entry["content_hash"]):
+                # Its original changed or is gone; only a data file can be re-chunked
+                if entry.get("streamed"):
+                    print(f"  [Index] Dropped streamed duplicate {rel_path}; re-run `scraper.py --index` without --incremental to index it again.")
+                else:
+                    to_process.append(rel_path)
+            elif not owner and entry["content_hash"] in self.content_owners:
+                add_entry(self.files, self.content_owners, self.new_chunks, rel_path, dict(entry), [])
+            else:
+                self.files[rel_path] = entry
+                if not owner:
+                    self.content_owners[entry["content_hash"]] = rel_path
+        for rel_path in sorted(to_process):
+            entry, chunks = chunk_file(self.document_path, rel_path, self.text_splitter)
+            add_entry(self.files, self.content_owners, self.new_chunks, rel_path, entry, chunks)
+
+        changes = len(to_process) + len(deleted & set(self.previous))
+        unchanged_index = self.manifest is not None and changes == 0 and all(
+            self.previous.get(rel_path, {}).get("chunk_ids") == entry["chunk_ids"] for rel_path, entry in self.files.items()
+        ) and set(self.files) == set(self.previous)
+        print(f"  [Index] {len(self.files)} sources after the crawl, {len(to_process)} re-read from the data folder, "
+              f"{len(deleted & set(self.previous))} deleted.")
+
+        vector_store, lexical_index = None, BM25Index()
+        in_place = False
+        if self.manifest:
+            vector_store = load_store(self.index_dir, self.embedding_model, use_mmap, search_params)
+            lexical_index = load_lexical_index(self.index_dir, vector_store)
+            if unchanged_index:
+                # Entries may have switched between data file and streamed
+                save_manifest(self.index_dir, dict(self.manifest, files=self.files))
+                consume_changeset(changeset_path, changeset)
+                return vector_store, lexical_index
+            in_place = index_kind(vector_store.index) == "flat"
+            try:
+                resolve_chunks(self.files, self.new_chunks, vector_store, load=not in_place)
+            except IndexOutOfSync as e:
+                # Streamed sources that were skipped this time cannot be re-read from disk
+                raise IndexOutOfSync(f"{e} Re-run `scraper.py --index` without --incremental to rebuild it.") from e
+            # Release the memory-mapped files before they are replaced
+            vector_store = None
+        write_index(self.index_dir, self.manifest, self.files, self.new_chunks, lexical_index, self.embedding_model,
+                    self.settings, in_place)
+        consume_changeset(changeset_path, changeset)
+        return load_store(self.index_dir, self.embedding_model, use_mmap, search_params), lexical_index
@@ -0,0 +1,150 @@
+import re
+import time
+import queue
+import threading
+from langchain_core.documents import Document
+from utils.trace_utils import registry
+from models.embeddings import embed_array
+
+# Marks the end of the crawl on the source queue
+_END = object()
+
+# Spaces and tabs inside a line (PDF text is full of runs of them); newlines are kept for the fact extractor
+INLINE_SPACE = re.compile(r"[ \t\u00a0]+")
+BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def clean_text(text):
+    """Normalizes line endings and inline whitespace and drops runs of blank lines."""
+    lines = [INLINE_SPACE.sub(" ", line).strip() for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+def clean_sources(sources):
+    """
+    Cleans every document of every (name, documents) source; sources left without text are skipped.
+    Drops (documents None) are passed through.
+    """
+    for name, documents in sources:
+        if documents is None:
+            yield name, None
+            continue
+        cleaned = [Document(page_content=clean_text(doc.page_content), metadata=doc.metadata) for doc in documents]
+        cleaned = [doc for doc in cleaned if doc.page_content]
+        if cleaned:
+            yield name, cleaned
+
+def chunk_sources(sources, indexer):
+    """Splits and deduplicates each source in the indexer; yields the chunk texts that still need a vector."""
+    for name, documents in sources:
+        if documents is None:
+            indexer.drop_source(name)
+        else:
+            yield from indexer.add_source(name, documents)
+
+def batched(items, size):
+    """Groups an iterable into lists of `size` (the last one may be shorter)."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def embed_batches(batches, embedding_model):
+    """Embeds each batch (the vectors land in the embedding cache); yields the batch sizes."""
+    for batch in batches:
+        embed_array(embedding_model, batch)
+        yield len(batch)
+
+
+class SourceQueue:
+    """
+    Bounded hand-over from the crawl workers to the ingest thread.
+    put() blocks while `max_sources` sources are waiting, so a crawl that outruns
+    the embedding model is slowed down instead of piling documents up in memory.
+    """
+
+    def __init__(self, max_sources):
+        self.queue = queue.Queue(maxsize=max_sources)
+        self.blocked_sec = 0.0
+        self.lock = threading.Lock()
+
+    def put(self, name, documents):
+        start = time.perf_counter()
+        self.queue.put((name, documents))
+        waited = time.perf_counter() - start
+        with self.lock:
+            self.blocked_sec += waited
+        registry.observe("rag_ingest_queue_wait_seconds", waited)
+
+    def close(self):
+        self.queue.put(_END)
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is _END:
+                return
+            yield item
+
+
+class IngestPipeline:
+    """
+    Streams crawled sources into the index while the crawl is still running:
+    source queue -> clean -> split/dedup (StreamingIndexer) -> batched embedding,
+    as one chain of generators in a background thread. Only one batch of chunk
+    texts and at most `max_queued_sources` sources are in flight at a time; the
+    split chunks themselves are held by the indexer until finish() writes the index.
+    """
+
+    def __init__(self, indexer, embedding_model, max_queued_sources=8, batch_size=64):
+        self.indexer = indexer
+        self.embedding_model = embedding_model
+        self.batch_size = batch_size
+        self.sources = SourceQueue(max_queued_sources)
+        self.stats = {"sources": 0, "chunks_embedded": 0}
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="ingest", daemon=True)
+        self.thread.start()
+
+    def _counted(self, sources):
+        for item in sources:
+            if item[1] is not None:
+                self.stats["sources"] += 1
+            yield item
+
+    def _run(self):
+        try:
+            chunks = chunk_sources(clean_sources(self._counted(self.sources)), self.indexer)
+            for count in embed_batches(batched(chunks, self.batch_size), self.embedding_model):
+                self.stats["chunks_embedded"] += count
+        except Exception as e:
+            print(f"  [Ingest] Pipeline failed: {e}")
+            self.error = e
+            # Keep draining so crawl workers blocked on the queue can finish
+            for _ in self.sources:
+                pass
+
+    def put(self, name, documents):
+        """Hands one source (e.g. a page, or all pages of a PDF) to the pipeline; blocks while it is full."""
+        self.sources.put(name, documents)
+
+    def drop(self, name):
+        """Takes back a source put earlier in this crawl, in order with the other sources."""
+        self.sources.put(name, None)
+
+    def finish(self, search_params=None, use_mmap=True):
+        """
+        Waits for the queued sources to be embedded, then writes the index.
+        Call it after the crawl state has written its changeset.
+        Returns the up-to-date (FAISS vector store, BM25 lexical index).
+        """
+        self.sources.close()
+        self.thread.join()
+        if self.error is not None:
+            raise RuntimeError(f"Ingest pipeline failed: {self.error}") from self.error
+        print(f"  [Ingest] {self.stats['sources']} sources streamed, {self.stats['chunks_embedded']} chunks embedded "
+              f"during the crawl (crawl waited {self.sources.blocked_sec:.1f}s on the indexer).")
+        return self.indexer.finish(search_params, use_mmap)
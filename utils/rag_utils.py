@@ -1,10 +1,19 @@
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader, TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain.retrievers.multi_query import MultiQueryRetriever
-from langchain.prompts import PromptTemplate
+import re
+import math
+from contextlib import nullcontext
+from typing import Any, List, Optional
+import numpy as np
+from langchain_core.prompts import PromptTemplate
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_community.vectorstores.utils import DistanceStrategy
 from models.embeddings import get_embedding_model
 from models.llm import get_chatgroq_model
+from utils.index_store import sync_index, index_settings, StreamingIndexer
+from utils.ann_index import NORMALIZE_L2
+from utils.bm25_index import STOPWORDS, reciprocal_rank_fusion
+from utils.trace_utils import span
+from config import config
 
 QUERY_PROMPT_TEMPLATE = """You are an AI language model assistant for the Global University of Innovation helpdesk.
 Your task is to generate 3 different versions of the given user question to retrieve relevant documents from a vector database.
@@ -18,44 +27,273 @@ QUERY_PROMPT = PromptTemplate(
     template=QUERY_PROMPT_TEMPLATE,
 )
 
-def setup_rag_pipeline(document_path="data/"):
+# Campus abbreviations and the words the documents actually use for them,
+# used by the local (no-LLM) query expansion
+LOCAL_EXPANSIONS = {
+    "cs": "computer science",
+    "cse": "computer science",
+    "ba": "business administration",
+    "bba": "business administration",
+    "mba": "business administration",
+    "bio": "biosciences",
+    "biotech": "biosciences biotechnology",
+    "fee": "fee structure tuition",
+    "fees": "fee structure tuition",
+    "eligibility": "eligibility criteria admission",
+    "exam": "examination semester exams",
+    "exams": "examination semester exams",
+    "holiday": "holidays public holiday",
+    "semester": "semester academic calendar",
+    "hostel": "hostel accommodation campus life",
+    "library": "library rules books",
+    "scholarship": "scholarships financial aid",
+}
+
+
+def query_matrix(vectors, normalize=NORMALIZE_L2):
+    """Query vectors as a float32 matrix, L2-normalized if the index stores normalized vectors."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if normalize:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+    return matrix
+
+def relevance_score(distance, distance_strategy):
     """
-    Sets up the final, robust RAG pipeline.
+    Converts a raw FAISS distance into the 0-1 relevance scale that SCORE_THRESHOLD
+    uses (the same conversion as LangChain's `similarity_score_threshold` search).
     """
-    try:
-        # Load and split documents 
-        pdf_loader = DirectoryLoader(document_path, glob="**/*.pdf", loader_cls=PyPDFLoader, show_progress=True)
-        txt_loader = DirectoryLoader(document_path, glob="**/*.txt", loader_cls=TextLoader, show_progress=True)
-        all_documents = pdf_loader.load() + txt_loader.load()
+    if distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT:
+        return 1.0 - distance if distance > 0 else -distance
+    if distance_strategy == DistanceStrategy.COSINE:
+        return 1.0 - distance
+    return 1.0 - distance / math.sqrt(2)
 
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=750, chunk_overlap=150)
-        texts = text_splitter.split_documents(all_documents)
+def search_by_vectors(vector_store, vectors, k):
+    """
+    Runs one batched FAISS search for several query vectors.
+    Returns one list of (document, relevance_score, chunk_id) per vector,
+    with relevance scores on the same 0-1 scale as `similarity_score_threshold`.
+    """
+    distances, indices = vector_store.index.search(query_matrix(vectors), k)
 
-        embedding_model = get_embedding_model()
-        vector_store = FAISS.from_documents(texts, embedding_model)
+    results = []
+    for row_distances, row_indices in zip(distances, indices):
+        hits = []
+        for distance, i in zip(row_distances, row_indices):
+            if i == -1:
+                # This happens when not enough docs are returned.
+                continue
+            chunk_id = vector_store.index_to_docstore_id[i]
+            hits.append((vector_store.docstore.search(chunk_id),
+                         relevance_score(float(distance), vector_store.distance_strategy), chunk_id))
+        results.append(hits)
+    return results
 
-        # 1. Create a strict base retriever with a similarity score threshold.
-        base_retriever = vector_store.as_retriever(
-            search_type="similarity_score_threshold",
-            search_kwargs={'score_threshold': 0.3, 'k': 5}
-        )
+def expand_query_locally(query):
+    """
+    Builds up to 3 alternative queries without calling an LLM:
+    a keyword-only version, one with campus abbreviations spelled out,
+    and a natural-sounding question built from the keywords.
+    """
+    words = re.findall(r"\w+", query.lower())
+    keywords = [w for w in words if w not in STOPWORDS]
+    if not keywords:
+        return []
+
+    variants = [" ".join(keywords)]
+    expanded = [LOCAL_EXPANSIONS.get(w, w) for w in keywords]
+    if expanded != keywords:
+        variants.append(" ".join(expanded))
+    variants.append(f"Information about {' '.join(expanded)} at the Global University of Innovation")
+
+    seen = {query.strip().lower()}
+    unique = []
+    for variant in variants:
+        if variant.lower() not in seen:
+            seen.add(variant.lower())
+            unique.append(variant)
+    return unique[:3]
+
+def expand_query_with_llm(llm, query):
+    """Asks the LLM for 3 paraphrases of the question, one per line."""
+    response = llm.invoke(QUERY_PROMPT.format(question=query))
+    lines = [line.strip(" -*0123456789.").strip() for line in response.content.split("\n")]
+    return [line for line in lines if line][:3]
+
+
+class AdaptiveRetriever(BaseRetriever):
+    """
+    Hybrid score-threshold retriever that only expands the query when it has to.
+    The original question is searched in FAISS and, if a lexical index is set,
+    in BM25; the ranked lists are merged with reciprocal-rank fusion.
+    Paraphrases are generated (by the LLM or locally) only when the results are
+    weak, then embedded in one batch and searched in one FAISS call.
+    """
+
+    vector_store: Any
+    lexical_index: Optional[Any] = None
+    llm: Optional[Any] = None
+    k: int = 5
+    score_threshold: float = 0.3
+    # "adaptive" expands on weak results, "always" on every query, "never" disables expansion
+    expansion: str = "adaptive"
+    # "llm" asks the chat model for paraphrases, "local" needs no LLM call
+    expander: str = "llm"
+    strong_score: float = 0.5
+    min_hits: int = 2
+    # A lexical hit must contain at least this fraction of the query's terms
+    lexical_min_coverage: float = 0.5
+    rrf_k: int = 60
+    # Fused chunks beyond this many are dropped before the context builder sees them
+    pool_size: int = 8
+    # Shared AdmissionController; when the LLM has no free slot, the local expansion is used
+    admission: Optional[Any] = None
+
+    def _is_weak(self, vector_hits, lexical_hits):
+        # Every query term found verbatim (a course code, an amount, a date) is a strong match
+        if any(coverage == 1.0 for _, _, coverage in lexical_hits):
+            return False
+        return not vector_hits or len(vector_hits) < self.min_hits or vector_hits[0][1] < self.strong_score
+
+    def _lexical_search(self, query):
+        if self.lexical_index is None:
+            return []
+        return [hit for hit in self.lexical_index.search(query, self.k) if hit[2] >= self.lexical_min_coverage]
+
+    def expand(self, query):
+        """Alternative phrasings of the query from the configured expander (the LLM falls back to local rules)."""
+        if self.expander == "llm" and self.llm is not None:
+            try:
+                with self.admission.slot(block=False) if self.admission is not None else nullcontext():
+                    return expand_query_with_llm(self.llm, query)
+            except Exception as e:
+                print(f"  [Retriever] LLM query expansion failed, using local expansion: {e}")
+        return expand_query_locally(query)
 
-        # 2. Get the LLM to power the query generation
-        llm = get_chatgroq_model()
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        embedding_model = self.vector_store.embedding_function
+        with span("vector_search") as stage:
+            query_vector = embedding_model.embed_query(query)
+            vector_hits = [hit for hit in search_by_vectors(self.vector_store, [query_vector], self.k)[0]
+                           if hit[1] >= self.score_threshold]
+            stage.set(hits=len(vector_hits), top_score=round(vector_hits[0][1], 4) if vector_hits else None)
+        with span("lexical_search") as stage:
+            lexical_hits = self._lexical_search(query)
+            stage.set(hits=len(lexical_hits), top_coverage=round(lexical_hits[0][2], 4) if lexical_hits else None)
 
-        # 3. Create the Multi-Query Retriever using the STRICT base retriever
-        multi_query_retriever = MultiQueryRetriever.from_llm(
-            retriever=base_retriever, 
+        ranked_lists = [[chunk_id for _, _, chunk_id in vector_hits], [chunk_id for chunk_id, _, _ in lexical_hits]]
+        docs = {chunk_id: doc for doc, _, chunk_id in vector_hits}
+
+        weak = self._is_weak(vector_hits, lexical_hits)
+        if self.expansion == "always" or (self.expansion == "adaptive" and weak):
+            with span("query_expansion", expander=self.expander) as stage:
+                sub_queries = self.expand(query)
+                stage.set(sub_queries=len(sub_queries))
+            if sub_queries:
+                with span("expanded_search") as stage:
+                    # One embedding batch and one FAISS search for all sub-queries
+                    sub_vectors = embedding_model.embed_documents(sub_queries)
+                    for sub_hits in search_by_vectors(self.vector_store, sub_vectors, self.k):
+                        sub_hits = [hit for hit in sub_hits if hit[1] >= self.score_threshold]
+                        ranked_lists.append([chunk_id for _, _, chunk_id in sub_hits])
+                        docs.update((chunk_id, doc) for doc, _, chunk_id in sub_hits)
+                    stage.set(hits=sum(len(ranked) for ranked in ranked_lists[2:]))
+
+        fused = reciprocal_rank_fusion(ranked_lists, self.rrf_k)[:self.pool_size]
+        # Lexical-only hits are read from the docstore, and only if they made the pool
+        return [docs[chunk_id] if chunk_id in docs else self.vector_store.docstore.search(chunk_id)
+                for chunk_id, _ in fused]
+
+def index_setup(embedding_model=None):
+    """The embedding model, text splitter and index settings configured in config. Returns all three."""
+    # Imported on first load rather than with this module, it is slow to import
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=config.CHUNK_SIZE, chunk_overlap=config.CHUNK_OVERLAP, add_start_index=True
+    )
+    embedding_model = embedding_model or get_embedding_model()
+    settings = index_settings(
+        embedding_model.model_id, config.CHUNK_SIZE, config.CHUNK_OVERLAP,
+        index_type=config.INDEX_TYPE, index_params=config.INDEX_PARAMS[config.INDEX_TYPE],
+    )
+    return embedding_model, text_splitter, settings
+
+def load_index(document_path="data/", index_dir=config.INDEX_DIR, embedding_model=None, allow_rebuild=True):
+    """
+    Loads the persisted index and re-embeds only added or changed documents.
+    The index type and its parameters come from config. Without `allow_rebuild`
+    only in-place updates are made (see sync_index). Returns (vector_store, lexical_index).
+    """
+    embedding_model, text_splitter, settings = index_setup(embedding_model)
+    return sync_index(
+        document_path, index_dir, embedding_model, text_splitter, settings,
+        search_params=config.INDEX_SEARCH_PARAMS, use_mmap=config.INDEX_MMAP, allow_rebuild=allow_rebuild,
+    )
+
+def start_ingest(document_path="data/", index_dir=config.INDEX_DIR, embedding_model=None):
+    """
+    Starts streaming crawled sources into the index (see utils/ingest_pipeline.py).
+    Returns the IngestPipeline; the crawler puts sources into it and calls
+    finish(config.INDEX_SEARCH_PARAMS, config.INDEX_MMAP) once its changeset is written.
+    """
+    from utils.ingest_pipeline import IngestPipeline
+
+    embedding_model, text_splitter, settings = index_setup(embedding_model)
+    indexer = StreamingIndexer(document_path, index_dir, embedding_model, text_splitter, settings)
+    return IngestPipeline(indexer, embedding_model, config.INGEST_QUEUE_MAX_SOURCES, config.EMBEDDING_BATCH_SIZE)
+
+def setup_rag_pipeline(document_path="data/", index_dir=config.INDEX_DIR, llm=None, embedding_model=None, admission=None):
+    """
+    Sets up the final, robust RAG pipeline.
+    The FAISS index is persisted in `index_dir` and only re-embeds files that changed;
+    full rebuilds are left to build_index.py.
+    `embedding_model` defaults to the shared model; `admission` guards LLM query expansion.
+    """
+    try:
+        vector_store, lexical_index = load_index(document_path, index_dir, embedding_model, allow_rebuild=False)
+
+        # The LLM is only needed when paraphrases are generated by it
+        if llm is None and config.QUERY_EXPANDER == "llm" and config.QUERY_EXPANSION != "never":
+            llm = get_chatgroq_model()
+
+        # Strict score threshold plus BM25 first, query expansion only for weak results
+        retriever = AdaptiveRetriever(
+            vector_store=vector_store,
+            lexical_index=lexical_index if config.HYBRID_SEARCH else None,
             llm=llm,
-            prompt=QUERY_PROMPT
+            k=config.RETRIEVAL_K,
+            score_threshold=config.SCORE_THRESHOLD,
+            expansion=config.QUERY_EXPANSION,
+            expander=config.QUERY_EXPANDER,
+            strong_score=config.EXPANSION_STRONG_SCORE,
+            min_hits=config.EXPANSION_MIN_HITS,
+            lexical_min_coverage=config.LEXICAL_MIN_COVERAGE,
+            rrf_k=config.RRF_K,
+            pool_size=config.RETRIEVAL_POOL_SIZE,
+            admission=admission,
         )
-        print("Final Multi-Query Retriever with score threshold is complete.")
-        return multi_query_retriever
+        print(f"Adaptive retriever ready (expansion: {config.QUERY_EXPANSION}, expander: {config.QUERY_EXPANDER}).")
+        return retriever
 
     except Exception as e:
         print(f"Error setting up RAG pipeline: {e}")
         raise
 
+def is_likely_miss(retriever, query: str):
+    """
+    Cheap guess, before searching, that the campus documents won't answer the query:
+    most of its terms never occur in the indexed chunks.
+    """
+    lexical_index = getattr(retriever, "lexical_index", None)
+    if lexical_index is None:
+        return False
+    return lexical_index.vocabulary_coverage(query) < config.LIKELY_MISS_MAX_COVERAGE
+
 def query_rag_pipeline(retriever, query: str):
     """Queries the RAG pipeline to retrieve relevant document chunks."""
-    return retriever.invoke(query)
\ No newline at end of file
+    with span("retrieval") as stage:
+        docs = retriever.invoke(query)
+        stage.set(chunks=len(docs))
+    return docs
@@ -1,27 +1,104 @@
 import os
-from langchain_community.tools.tavily_search import TavilySearchResults
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import sys
-import streamlit as st
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from config import config
+from utils.cache_utils import TTLCache
+from utils.dedup_utils import normalize_text
+from utils.trace_utils import span
 
-# Set the Tavily API key as an environment variable for the tool
-os.environ["TAVILY_API_KEY"] = st.secrets["TAVILY_API_KEY"]
+SEARCH_ERROR_RESPONSE = "Sorry, the web search failed. Please check the API key and network connection."
+
+# Web results keyed by normalized query, so repeated off-campus questions skip the network
+search_cache = TTLCache(max_entries=config.WEB_SEARCH_CACHE_MAX_ENTRIES, ttl_seconds=config.WEB_SEARCH_CACHE_TTL_SEC)
+
+_search_client = None
+_search_client_lock = threading.Lock()
+_search_backend = None
+# Own pool rather than asyncio's default executor, so a discarded search never delays the caller
+_search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="web-search")
+
+
+def get_search_client():
+    """Returns the shared Tavily client, creating it on first use."""
+    global _search_client
+    with _search_client_lock:
+        if _search_client is None:
+            # Imported and configured on first use, so importing this module stays cheap
+            import streamlit as st
+            from langchain_community.tools.tavily_search import TavilySearchResults
+            # Set the Tavily API key as an environment variable for the tool
+            os.environ["TAVILY_API_KEY"] = st.secrets["TAVILY_API_KEY"]
+            # max_results=3 means it will return the top 3 search results
+            _search_client = TavilySearchResults(max_results=3)
+        return _search_client
+
+def tavily_search(query: str):
+    """Default search backend: returns a list of result dicts with a "content" key."""
+    return get_search_client().invoke({"query": query})
+
+def set_search_backend(backend):
+    """
+    Replaces the search backend, e.g. with a local stub in tests and benchmarks.
+    `backend(query)` must return a list of dicts with a "content" key; pass None to restore Tavily.
+    """
+    global _search_backend
+    _search_backend = backend
+    search_cache.clear()
 
 def perform_web_search(query: str):
     """
     Performs a real-time web search using the Tavily API.
+    Results are cached for WEB_SEARCH_CACHE_TTL_SEC; failed searches are not cached.
     """
-    print(f"Performing web search for: {query}")
+    with span("web_search") as stage:
+        cache_key = normalize_text(query)
+        cached = search_cache.get(cache_key)
+        stage.set(cache_hit=cached is not None)
+        if cached is not None:
+            print(f"Web search cache hit for: {query}")
+            return cached
+
+        print(f"Performing web search for: {query}")
+        try:
+            backend = _search_backend or tavily_search
+            results = backend(query)
+            stage.set(results=len(results))
+
+            # Format the results into a single string for the context
+            formatted_results = "\n\n".join([res["content"] for res in results])
+            search_cache.set(cache_key, formatted_results)
+            return formatted_results
+        except Exception as e:
+            print(f"Error during web search: {e}")
+            stage.status = "error"
+            stage.set(error=str(e))
+            return SEARCH_ERROR_RESPONSE
+
+async def retrieve_with_speculative_search(retrieve_fn, query: str):
+    """
+    Runs local retrieval and the web search concurrently.
+    If campus documents answer the question, the web search is cancelled (or its
+    result discarded, it still warms the cache); otherwise its result is awaited.
+    Returns (relevant_docs, web_context) where web_context is None if it was not needed.
+    """
+    loop = asyncio.get_running_loop()
+    # Run the search in a copy of this context so its span lands in the caller's trace
+    web_task = loop.run_in_executor(_search_executor, contextvars.copy_context().run, perform_web_search, query)
     try:
-        # k=3 means it will return the top 3 search results
-        search_tool = TavilySearchResults(k=3)
-        results = search_tool.invoke({"query": query})
-
-        # Format the results into a single string for the context
-        formatted_results = "\n\n".join([res["content"] for res in results])
-        return formatted_results
-    except Exception as e:
-        print(f"Error during web search: {e}")
-        return "Sorry, the web search failed. Please check the API key and network connection."
\ No newline at end of file
+        relevant_docs = await asyncio.to_thread(retrieve_fn, query)
+    except Exception:
+        web_task.cancel()
+        raise
+    if relevant_docs:
+        web_task.cancel()
+        return relevant_docs, None
+    return relevant_docs, await web_task
+
+def speculative_retrieve(retrieve_fn, query: str):
+    """Synchronous wrapper around `retrieve_with_speculative_search` for the Streamlit script."""
+    return asyncio.run(retrieve_with_speculative_search(retrieve_fn, query))
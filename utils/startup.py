@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import threading
+import importlib
+
+# Set when the app first imports this module, i.e. close to process start
+PROCESS_START = time.perf_counter()
+
+_lock = threading.Lock()
+_import_ms = {}
+_milestones_ms = {}
+_warmup = {"thread": None, "steps_ms": {}, "error": None}
+
+
+def timed_import(module_name):
+    """Imports a module and records how long the first import took."""
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    with _lock:
+        _import_ms.setdefault(module_name, round((time.perf_counter() - start) * 1000, 1))
+    return module
+
+def mark(milestone):
+    """Records the first time a milestone (e.g. "first_answer") is reached. Returns True the first time."""
+    with _lock:
+        if milestone in _milestones_ms:
+            return False
+        _milestones_ms[milestone] = round((time.perf_counter() - PROCESS_START) * 1000, 1)
+        return True
+
+def start_warmup(steps):
+    """
+    Runs the (name, fn) warm-up steps once per process in a background thread,
+    so slow loads happen while the UI is already on screen.
+    A failing step is reported and stops the warm-up; the step is retried on first use.
+    """
+    def run():
+        for name, fn in steps:
+            start = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                print(f"  [Startup] Warm-up step '{name}' failed: {e}")
+                _warmup["error"] = f"{name}: {e}"
+                return
+            _warmup["steps_ms"][name] = round((time.perf_counter() - start) * 1000, 1)
+        mark("warmup_done")
+        print(f"  [Startup] Warm-up finished: {_warmup['steps_ms']}")
+
+    with _lock:
+        if _warmup["thread"] is not None:
+            return
+        _warmup["thread"] = threading.Thread(target=run, name="warmup", daemon=True)
+    _warmup["thread"].start()
+
+def startup_report():
+    """Import times, warm-up steps and milestones (ms since process start)."""
+    with _lock:
+        return {
+            "imports_ms": dict(_import_ms),
+            "warmup_ms": dict(_warmup["steps_ms"]),
+            "warmup_error": _warmup["error"],
+            "milestones_ms": dict(_milestones_ms),
+        }
+
+def write_startup_report(path):
+    """Writes the report as JSON (atomically), for CI or later inspection."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(startup_report(), f, indent=2)
+    os.replace(tmp_path, path)
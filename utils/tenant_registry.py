@@ -0,0 +1,136 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from utils.trace_utils import registry
+
+
+class UnknownTenant(KeyError):
+    """Raised for a tenant that is not configured."""
+
+
+class TenantRegistry:
+    """
+    One loaded value (a ChatCore) per tenant, loaded lazily on first use.
+    Concurrent first requests for a tenant share a single load. When the loaded
+    tenants together exceed `memory_budget_mb`, the least recently used ones are
+    dropped; they are loaded again from disk the next time they are asked for.
+    `loader(tenant)` builds a tenant's value and `size_of(tenant, value)` estimates
+    its resident size in MB. If given, `is_stale(tenant, value)` is asked at most every
+    `stale_check_sec` seconds whether a resident value is out of date (e.g. its index
+    was rebuilt by another process); a stale tenant is unloaded and loaded again.
+    """
+
+    def __init__(self, tenants, loader, size_of, memory_budget_mb=1024, is_stale=None, stale_check_sec=5):
+        self.tenants = tenants
+        self.loader = loader
+        self.size_of = size_of
+        self.memory_budget_mb = memory_budget_mb
+        self.is_stale = is_stale
+        self.stale_check_sec = stale_check_sec
+        self.checked = {}             # tenant -> time.monotonic() of the last staleness check
+        self.loaded = OrderedDict()   # tenant -> (value, size_mb), least recently used first
+        self.loading = {}             # tenant -> Future shared by everyone waiting for the load
+        self.tenant_stats = {tenant: {"hits": 0, "misses": 0, "loads": 0, "evictions": 0, "load_ms": None}
+                             for tenant in tenants}
+        self.lock = threading.Lock()
+
+    def get(self, tenant):
+        """Returns the tenant's value, loading it (once) if it is not resident."""
+        if tenant not in self.tenants:
+            raise UnknownTenant(tenant)
+        if self.is_stale is not None:
+            self._drop_if_stale(tenant)
+        with self.lock:
+            if tenant in self.loaded:
+                self.loaded.move_to_end(tenant)
+                self.tenant_stats[tenant]["hits"] += 1
+                registry.inc("rag_tenant_lookups_total", tenant=tenant, result="hit")
+                return self.loaded[tenant][0]
+            self.tenant_stats[tenant]["misses"] += 1
+            registry.inc("rag_tenant_lookups_total", tenant=tenant, result="miss")
+            future = self.loading.get(tenant)
+            owner = future is None
+            if owner:
+                future = self.loading[tenant] = Future()
+
+        if not owner:
+            # Someone else is already loading this tenant
+            return future.result()
+
+        start = time.perf_counter()
+        try:
+            value = self.loader(tenant)
+            size_mb = self.size_of(tenant, value)
+        except Exception as e:
+            with self.lock:
+                del self.loading[tenant]
+            future.set_exception(e)
+            raise
+        load_sec = time.perf_counter() - start
+
+        with self.lock:
+            del self.loading[tenant]
+            self.loaded[tenant] = (value, size_mb)
+            self.checked[tenant] = time.monotonic()
+            self.tenant_stats[tenant]["loads"] += 1
+            self.tenant_stats[tenant]["load_ms"] = round(load_sec * 1000, 1)
+            self._evict(keep=tenant)
+        registry.observe("rag_tenant_load_seconds", load_sec, tenant=tenant)
+        print(f"  [Tenants] Loaded '{tenant}' in {load_sec:.2f}s ({size_mb:.1f} MB).")
+        future.set_result(value)
+        return value
+
+    def _drop_if_stale(self, tenant):
+        """Unloads a resident tenant whose value `is_stale`, checking at most every `stale_check_sec`."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.loaded.get(tenant)
+            if entry is None or now - self.checked.get(tenant, 0.0) < self.stale_check_sec:
+                return
+            self.checked[tenant] = now
+        # Outside the lock: the check may read files, and other tenants should not wait for it
+        if self.is_stale(tenant, entry[0]):
+            print(f"  [Tenants] '{tenant}' is out of date, reloading it.")
+            self.evict(tenant)
+
+    def _evict(self, keep):
+        """Drops least recently used tenants until the rest fit the budget (call with the lock held)."""
+        while self.resident_mb() > self.memory_budget_mb and len(self.loaded) > 1:
+            tenant = next(name for name in self.loaded if name != keep)
+            _, size_mb = self.loaded.pop(tenant)
+            self.tenant_stats[tenant]["evictions"] += 1
+            registry.inc("rag_tenant_evictions_total", tenant=tenant)
+            # Requests still holding the value finish normally; it is freed once they are done
+            print(f"  [Tenants] Evicted '{tenant}' ({size_mb:.1f} MB) to stay within {self.memory_budget_mb} MB.")
+
+    def evict(self, tenant):
+        """Unloads a tenant, e.g. after its documents were re-indexed."""
+        with self.lock:
+            if self.loaded.pop(tenant, None) is not None:
+                self.tenant_stats[tenant]["evictions"] += 1
+                registry.inc("rag_tenant_evictions_total", tenant=tenant)
+
+    def peek(self, tenant):
+        """The tenant's value if it is resident, without loading it or counting a lookup."""
+        with self.lock:
+            entry = self.loaded.get(tenant)
+        return entry[0] if entry else None
+
+    def resident_mb(self):
+        return sum(size_mb for _, size_mb in self.loaded.values())
+
+    def stats(self):
+        """Per-tenant load time, hit rate and resident size, plus the totals."""
+        with self.lock:
+            tenants = {}
+            for tenant, counts in self.tenant_stats.items():
+                lookups = counts["hits"] + counts["misses"]
+                tenants[tenant] = {
+                    **counts,
+                    "hit_rate": round(counts["hits"] / lookups, 4) if lookups else None,
+                    "loaded": tenant in self.loaded,
+                    "resident_mb": round(self.loaded[tenant][1], 2) if tenant in self.loaded else 0.0,
+                }
+            return {"memory_budget_mb": self.memory_budget_mb, "resident_mb": round(self.resident_mb(), 2),
+                    "tenants": tenants}
@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class MetricsRegistry:
+    """
+    In-process counters and latency histograms, keyed by metric name and labels.
+    Exported in Prometheus text format or as a JSON snapshot.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counters = {}      # (name, labels) -> value
+        self.histograms = {}    # (name, labels) -> {"counts": per-bucket counts, "sum": ..., "count": ...}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        """Adds `amount` to a counter."""
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Records one value (in seconds) in a histogram."""
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def snapshot(self):
+        """All metrics as plain data (one JSON-serializable dict)."""
+        with self.lock:
+            return {
+                "timestamp": time.time(),
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "buckets": list(self.buckets),
+                     "counts": list(h["counts"]), "sum": h["sum"], "count": h["count"]}
+                    for (name, labels), h in sorted(self.histograms.items())
+                ],
+            }
+
+    def to_prometheus(self):
+        """Renders the metrics in the Prometheus text exposition format."""
+        def escape_label(value):
+            # Label values may come from requests (tenant, mode); quotes or newlines would break the format
+            return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in pairs) + "}"
+
+        lines = []
+        with self.lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{label_text(labels)} {value}")
+            for (name, labels), h in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(self.buckets, h["counts"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{label_text(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{label_text(labels, [('le', '+Inf')])} {h['count']}")
+                lines.append(f"{name}_sum{label_text(labels)} {h['sum']}")
+                lines.append(f"{name}_count{label_text(labels)} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+
+class Span:
+    """One timed stage of a request, with free-form attributes (counts, scores, cache hits...)."""
+
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+        self.status = "ok"
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self, trace_start=None):
+        data = {"name": self.name, "parent": self.parent, "status": self.status,
+                "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+                "attributes": self.attributes}
+        if trace_start is not None:
+            data["start_ms"] = round((self.started - trace_start) * 1000, 3)
+        return data
+
+
+class Trace:
+    """All spans recorded while handling one request (e.g. one chat turn)."""
+
+    def __init__(self, name, **attributes):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attributes = attributes
+        self.status = "ok"
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+    def to_dict(self):
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span.started)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "spans": [span.to_dict(self.started) for span in spans],
+        }
+
+
+# Shared by the whole process; the Streamlit app and any other entry point report into it
+registry = MetricsRegistry()
+
+# The trace and span being recorded in this context (copied into threads started with the context)
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+def _record_span_metrics(span):
+    registry.observe("rag_stage_duration_seconds", span.duration, stage=span.name)
+    registry.inc("rag_stage_total", stage=span.name, status=span.status)
+    if "cache_hit" in span.attributes:
+        registry.inc("rag_cache_lookups_total", stage=span.name,
+                     result="hit" if span.attributes["cache_hit"] else "miss")
+    for attribute in ("input_tokens", "output_tokens"):
+        if span.attributes.get(attribute):
+            registry.inc("rag_tokens_total", span.attributes[attribute], kind=attribute.split("_")[0])
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Times a pipeline stage. Attributes can be added while it runs with `span.set(...)`.
+    The span is added to the current trace (if any) and always feeds the metrics registry.
+    """
+    parent = _current_span.get()
+    current = Span(name, parent=parent.name if parent else None, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.status = "error"
+        current.set(error=str(e))
+        raise
+    finally:
+        _current_span.reset(token)
+        current.duration = time.perf_counter() - current.started
+        _record_span_metrics(current)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(current)
+
+@contextmanager
+def start_trace(name, log_path=None, **attributes):
+    """
+    Records every span opened inside the block as one trace.
+    The finished trace is appended to `log_path` as one JSON line, if given.
+    """
+    trace = Trace(name, **attributes)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    except Exception:
+        trace.status = "error"
+        raise
+    finally:
+        _current_trace.reset(token)
+        trace.duration = time.perf_counter() - trace.started
+        registry.observe("rag_request_duration_seconds", trace.duration, kind=name)
+        registry.inc("rag_requests_total", kind=name, status=trace.status)
+        if log_path:
+            export_trace(trace, log_path)
+
+def export_trace(trace, path):
+    """Appends a finished trace as one JSON line."""
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(trace.to_dict(), default=str) + "\n")
+    except OSError as e:
+        print(f"  [Tracing] Could not write trace: {e}")
+
+def write_prometheus(path):
+    """Writes the current metrics in Prometheus text format (for a textfile collector) atomically."""
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(registry.to_prometheus())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"  [Tracing] Could not write metrics: {e}")